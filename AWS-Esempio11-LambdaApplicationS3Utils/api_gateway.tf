@@ -10,6 +10,9 @@ resource "aws_api_gateway_rest_api" "main" {
     types = ["REGIONAL"]
   }
 
+  # CSV gzip di read_from_rds (format=csv): restituito come binario alle richieste con Accept: text/csv
+  binary_media_types = ["text/csv"]
+
   tags = local.common_tags
 }
 
@@ -197,12 +200,69 @@ resource "aws_api_gateway_integration" "read_from_rds" {
   uri                     = aws_lambda_function.read_from_rds.invoke_arn
 }
 
+# Resource /export-from-rds
+resource "aws_api_gateway_resource" "export_from_rds" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_rest_api.main.root_resource_id
+  path_part   = "export-from-rds"
+}
+
+resource "aws_api_gateway_method" "export_from_rds_post" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.export_from_rds.id
+  http_method   = "POST"
+  authorization = "NONE"
+}
+
+resource "aws_api_gateway_integration" "export_from_rds" {
+  rest_api_id             = aws_api_gateway_rest_api.main.id
+  resource_id             = aws_api_gateway_resource.export_from_rds.id
+  http_method             = aws_api_gateway_method.export_from_rds_post.http_method
+  integration_http_method = "POST"
+  type                    = "AWS_PROXY"
+  uri                     = aws_lambda_function.export_from_rds.invoke_arn
+}
+
+# Resource /jobs/{job_id}
+resource "aws_api_gateway_resource" "jobs" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_rest_api.main.root_resource_id
+  path_part   = "jobs"
+}
+
+resource "aws_api_gateway_resource" "job" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.jobs.id
+  path_part   = "{job_id}"
+}
+
+resource "aws_api_gateway_method" "job_get" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.job.id
+  http_method   = "GET"
+  authorization = "NONE"
+
+  request_parameters = {
+    "method.request.path.job_id" = true
+  }
+}
+
+resource "aws_api_gateway_integration" "job" {
+  rest_api_id             = aws_api_gateway_rest_api.main.id
+  resource_id             = aws_api_gateway_resource.job.id
+  http_method             = aws_api_gateway_method.job_get.http_method
+  integration_http_method = "POST"
+  type                    = "AWS_PROXY"
+  uri                     = aws_lambda_function.get_job.invoke_arn
+}
+
 # Deployment
 resource "aws_api_gateway_deployment" "main" {
   rest_api_id = aws_api_gateway_rest_api.main.id
 
   triggers = {
     redeployment = sha1(jsonencode([
+      aws_api_gateway_rest_api.main.binary_media_types,
       aws_api_gateway_resource.presigned_url.id,
       aws_api_gateway_method.presigned_url_post.id,
       aws_api_gateway_integration.presigned_url.id,
@@ -235,6 +295,15 @@ resource "aws_api_gateway_deployment" "main" {
       aws_api_gateway_method.read_from_rds_get.id,
       aws_api_gateway_integration.read_from_rds.id,
       aws_api_gateway_method.read_from_rds_options.id,
+      aws_api_gateway_resource.export_from_rds.id,
+      aws_api_gateway_method.export_from_rds_post.id,
+      aws_api_gateway_integration.export_from_rds.id,
+      aws_api_gateway_method.export_from_rds_options.id,
+      aws_api_gateway_resource.jobs.id,
+      aws_api_gateway_resource.job.id,
+      aws_api_gateway_method.job_get.id,
+      aws_api_gateway_integration.job.id,
+      aws_api_gateway_method.job_options.id,
     ]))
   }
 
@@ -74,3 +74,122 @@ resource "aws_dynamodb_table" "scan" {
 
   tags = local.common_tags
 }
+
+# Tabella Jobs
+# Stato delle elaborazioni distribuite/asincrone (es. extract_zip in modalità fan-out,
+# richieste con "async": true). Lo stream alimenta le EventBridge Pipes verso le code SQS.
+# Gli item scadono automaticamente tramite TTL su expires_at.
+resource "aws_dynamodb_table" "jobs" {
+  name             = local.dynamodb_jobs_table_name
+  billing_mode     = var.dynamodb_billing_mode
+  hash_key         = "job_id"
+  stream_enabled   = true
+  stream_view_type = "NEW_IMAGE"
+
+  attribute {
+    name = "job_id"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  point_in_time_recovery {
+    enabled = true
+  }
+
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = local.common_tags
+}
+
+# Tabella Conversions
+# Cache di excel_to_csv: chiave file + foglio + formato, valida finché l'ETag del file Excel non cambia.
+# Gli item scadono automaticamente tramite TTL su expires_at.
+resource "aws_dynamodb_table" "conversions" {
+  name         = local.dynamodb_conversions_table_name
+  billing_mode = var.dynamodb_billing_mode
+  hash_key     = "cache_key"
+
+  attribute {
+    name = "cache_key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  point_in_time_recovery {
+    enabled = true
+  }
+
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = local.common_tags
+}
+
+# Tabella Imports
+# Checkpoint degli import paralleli di upload_to_rds: piano dei chunk (range di byte) e
+# chunk già committati, per riprendere un import fallito senza righe duplicate.
+# Gli item "table#<tabella>" registrano l'ultimo import di ogni tabella (read-your-writes).
+# Gli item scadono automaticamente tramite TTL su expires_at.
+resource "aws_dynamodb_table" "imports" {
+  name         = local.dynamodb_imports_table_name
+  billing_mode = var.dynamodb_billing_mode
+  hash_key     = "import_id"
+
+  attribute {
+    name = "import_id"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  point_in_time_recovery {
+    enabled = true
+  }
+
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = local.common_tags
+}
+
+# Tabella Results (opzionale, var.read_from_rds_shared_cache)
+# Cache dei risultati di read_from_rds condivisa tra le istanze Lambda: la chiave contiene
+# la versione della tabella MySQL, quindi le voci non diventano mai vecchie; il TTL su
+# expires_at elimina quelle delle versioni superate.
+resource "aws_dynamodb_table" "results" {
+  count        = var.read_from_rds_shared_cache ? 1 : 0
+  name         = local.dynamodb_results_table_name
+  billing_mode = var.dynamodb_billing_mode
+  hash_key     = "cache_key"
+
+  attribute {
+    name = "cache_key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = local.common_tags
+}
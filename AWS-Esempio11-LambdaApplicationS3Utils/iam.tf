@@ -34,7 +34,8 @@ resource "aws_iam_role_policy" "lambda_s3" {
           "s3:GetObject",
           "s3:PutObject",
           "s3:DeleteObject",
-          "s3:ListBucket"
+          "s3:ListBucket",
+          "s3:AbortMultipartUpload"
         ]
         Resource = [
           aws_s3_bucket.main.arn,
@@ -63,12 +64,55 @@ resource "aws_iam_role_policy" "lambda_dynamodb" {
           "dynamodb:Query",
           "dynamodb:Scan"
         ]
-        Resource = [
+        Resource = concat([
           aws_dynamodb_table.logs.arn,
           "${aws_dynamodb_table.logs.arn}/index/*",
           aws_dynamodb_table.scan.arn,
-          "${aws_dynamodb_table.scan.arn}/index/*"
+          "${aws_dynamodb_table.scan.arn}/index/*",
+          aws_dynamodb_table.jobs.arn,
+          aws_dynamodb_table.conversions.arn,
+          aws_dynamodb_table.imports.arn
+        ], aws_dynamodb_table.results[*].arn)
+      }
+    ]
+  })
+}
+
+# Policy per auto-invocazione asincrona di extract_zip (modalità distribuita: un'invocazione per shard)
+resource "aws_iam_role_policy" "lambda_invoke_extract_zip" {
+  name = "lambda-invoke-extract-zip"
+  role = aws_iam_role.lambda_execution.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "lambda:InvokeFunction"
+        ]
+        Resource = aws_lambda_function.extract_zip.arn
+      }
+    ]
+  })
+}
+
+# Policy per le code SQS dei job asincroni (event source mapping)
+resource "aws_iam_role_policy" "lambda_sqs_jobs" {
+  name = "sqs-jobs-access"
+  role = aws_iam_role.lambda_execution.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
         ]
+        Resource = [for queue in aws_sqs_queue.jobs : queue.arn]
       }
     ]
   })
@@ -68,6 +68,19 @@ data "archive_file" "read_from_rds" {
   }
 }
 
+data "archive_file" "export_from_rds" {
+  type        = "zip"
+  output_path = "${path.module}/lambda_export_from_rds.zip"
+  source {
+    content  = file("${path.module}/lambda_functions/export_from_rds.py")
+    filename = "export_from_rds.py"
+  }
+  source {
+    content  = file("${path.module}/lambda_functions/utils.py")
+    filename = "utils.py"
+  }
+}
+
 data "archive_file" "sftp_send" {
   type        = "zip"
   output_path = "${path.module}/lambda_sftp_send.zip"
@@ -107,6 +120,19 @@ data "archive_file" "list_files" {
   }
 }
 
+data "archive_file" "get_job" {
+  type        = "zip"
+  output_path = "${path.module}/lambda_get_job.zip"
+  source {
+    content  = file("${path.module}/lambda_functions/get_job.py")
+    filename = "get_job.py"
+  }
+  source {
+    content  = file("${path.module}/lambda_functions/utils.py")
+    filename = "utils.py"
+  }
+}
+
 data "archive_file" "search_files" {
   type        = "zip"
   output_path = "${path.module}/lambda_search_files.zip"
@@ -146,7 +172,7 @@ resource "aws_lambda_function" "presigned_url" {
   depends_on = [aws_cloudwatch_log_group.lambda_presigned_url]
 }
 
-# Lambda 2: Extract ZIP
+# Lambda 2: Extract ZIP (anche tar/tar.gz/tar.bz2/tar.xz; .tar.zst richiede un layer con zstandard)
 resource "aws_lambda_function" "extract_zip" {
   filename         = data.archive_file.extract_zip.output_path
   function_name    = "${var.project_name}-extract-zip"
@@ -156,11 +182,17 @@ resource "aws_lambda_function" "extract_zip" {
   runtime          = var.lambda_runtime
   timeout          = var.lambda_timeout
   memory_size      = var.lambda_memory_size
+  layers           = var.lambda_layer_arns_extract
 
   environment {
     variables = {
-      BUCKET_NAME         = aws_s3_bucket.main.id
-      DYNAMODB_LOGS_TABLE = aws_dynamodb_table.logs.name
+      BUCKET_NAME                = aws_s3_bucket.main.id
+      DYNAMODB_LOGS_TABLE        = aws_dynamodb_table.logs.name
+      DYNAMODB_JOBS_TABLE        = aws_dynamodb_table.jobs.name
+      EXTRACT_UPLOAD_WORKERS     = tostring(var.extract_zip_upload_workers)
+      EXTRACT_MAX_INFLIGHT_BYTES = tostring(var.extract_zip_max_inflight_mb * 1024 * 1024)
+      EXTRACT_FANOUT_MIN_ENTRIES = tostring(var.extract_zip_fanout_min_entries)
+      EXTRACT_SHARD_MAX_ENTRIES  = tostring(var.extract_zip_shard_max_entries)
     }
   }
 
@@ -181,10 +213,17 @@ resource "aws_lambda_function" "excel_to_csv" {
   memory_size      = var.lambda_memory_size
   layers           = var.lambda_layer_arns_excel
 
+  ephemeral_storage {
+    size = var.excel_to_csv_ephemeral_storage_mb
+  }
+
   environment {
     variables = {
-      BUCKET_NAME         = aws_s3_bucket.main.id
-      DYNAMODB_LOGS_TABLE = aws_dynamodb_table.logs.name
+      BUCKET_NAME                = aws_s3_bucket.main.id
+      DYNAMODB_LOGS_TABLE        = aws_dynamodb_table.logs.name
+      DYNAMODB_CONVERSIONS_TABLE = aws_dynamodb_table.conversions.name
+      DYNAMODB_JOBS_TABLE        = aws_dynamodb_table.jobs.name
+      EXCEL_CACHE_TTL_DAYS       = tostring(var.excel_to_csv_cache_ttl_days)
     }
   }
 
@@ -212,13 +251,20 @@ resource "aws_lambda_function" "upload_to_rds" {
 
   environment {
     variables = {
-      BUCKET_NAME         = aws_s3_bucket.main.id
-      DYNAMODB_LOGS_TABLE = aws_dynamodb_table.logs.name
-      DB_HOST             = var.create_rds ? aws_rds_cluster.main[0].endpoint : ""
-      DB_USERNAME         = "admin"
-      DB_PASSWORD         = var.create_rds ? random_password.rds_password[0].result : ""
-      DB_DATABASE         = var.rds_database_name
-      DB_PORT             = "3306"
+      BUCKET_NAME            = aws_s3_bucket.main.id
+      DYNAMODB_LOGS_TABLE    = aws_dynamodb_table.logs.name
+      DYNAMODB_JOBS_TABLE    = aws_dynamodb_table.jobs.name
+      DYNAMODB_IMPORTS_TABLE = aws_dynamodb_table.imports.name
+      DB_HOST                = var.create_rds ? aws_rds_cluster.main[0].endpoint : ""
+      DB_USERNAME            = "admin"
+      DB_PASSWORD            = var.create_rds ? random_password.rds_password[0].result : ""
+      DB_DATABASE            = var.rds_database_name
+      DB_PORT                = "3306"
+      RDS_BULK_CHUNK_MB      = tostring(var.upload_to_rds_bulk_chunk_mb)
+      RDS_IMPORT_WORKERS     = tostring(var.upload_to_rds_import_workers)
+      RDS_IMPORT_CHUNK_MB    = tostring(var.upload_to_rds_import_chunk_mb)
+      RDS_INFER_SCHEMA       = tostring(var.upload_to_rds_infer_schema)
+      RDS_SCHEMA_SAMPLE_ROWS = tostring(var.upload_to_rds_schema_sample_rows)
     }
   }
 
@@ -246,13 +292,19 @@ resource "aws_lambda_function" "read_from_rds" {
 
   environment {
     variables = {
-      BUCKET_NAME         = aws_s3_bucket.main.id
-      DYNAMODB_LOGS_TABLE = aws_dynamodb_table.logs.name
-      DB_HOST             = var.create_rds ? aws_rds_cluster.main[0].endpoint : ""
-      DB_USERNAME         = "admin"
-      DB_PASSWORD         = var.create_rds ? random_password.rds_password[0].result : ""
-      DB_DATABASE         = var.rds_database_name
-      DB_PORT             = "3306"
+      BUCKET_NAME                  = aws_s3_bucket.main.id
+      DYNAMODB_LOGS_TABLE          = aws_dynamodb_table.logs.name
+      DYNAMODB_RESULTS_TABLE       = var.read_from_rds_shared_cache ? aws_dynamodb_table.results[0].name : ""
+      DYNAMODB_IMPORTS_TABLE       = aws_dynamodb_table.imports.name
+      DB_HOST                      = var.create_rds ? aws_rds_cluster.main[0].endpoint : ""
+      DB_READER_HOSTS              = join(",", aws_rds_cluster_instance.reader[*].endpoint)
+      DB_USERNAME                  = "admin"
+      DB_PASSWORD                  = var.create_rds ? random_password.rds_password[0].result : ""
+      DB_DATABASE                  = var.rds_database_name
+      DB_PORT                      = "3306"
+      RDS_METADATA_TTL_SECONDS     = tostring(var.read_from_rds_metadata_ttl_seconds)
+      RDS_RESULT_CACHE_ENTRIES     = tostring(var.read_from_rds_result_cache_entries)
+      RDS_READ_YOUR_WRITES_SECONDS = tostring(var.rds_read_your_writes_seconds)
     }
   }
 
@@ -260,6 +312,46 @@ resource "aws_lambda_function" "read_from_rds" {
   depends_on = [aws_cloudwatch_log_group.lambda_read_from_rds]
 }
 
+# Lambda 4c: Export from RDS
+# NOTA: richiede Lambda Layer con pymysql (e pyarrow per il formato parquet). Specificare l'ARN in var.lambda_layer_arns_rds
+resource "aws_lambda_function" "export_from_rds" {
+  filename         = data.archive_file.export_from_rds.output_path
+  function_name    = "${var.project_name}-export-from-rds"
+  role             = aws_iam_role.lambda_execution.arn
+  handler          = "export_from_rds.lambda_handler"
+  source_code_hash = data.archive_file.export_from_rds.output_base64sha256
+  runtime          = var.lambda_runtime
+  timeout          = var.lambda_timeout
+  memory_size      = var.lambda_memory_size
+  layers           = var.lambda_layer_arns_rds
+
+  vpc_config {
+    subnet_ids         = var.create_rds ? data.aws_subnets.default.ids : []
+    security_group_ids = var.create_rds ? [aws_security_group.lambda[0].id] : []
+  }
+
+  environment {
+    variables = {
+      BUCKET_NAME                  = aws_s3_bucket.main.id
+      DYNAMODB_LOGS_TABLE          = aws_dynamodb_table.logs.name
+      DYNAMODB_JOBS_TABLE          = aws_dynamodb_table.jobs.name
+      DYNAMODB_IMPORTS_TABLE       = aws_dynamodb_table.imports.name
+      DB_HOST                      = var.create_rds ? aws_rds_cluster.main[0].endpoint : ""
+      DB_READER_HOSTS              = join(",", aws_rds_cluster_instance.reader[*].endpoint)
+      DB_USERNAME                  = "admin"
+      DB_PASSWORD                  = var.create_rds ? random_password.rds_password[0].result : ""
+      DB_DATABASE                  = var.rds_database_name
+      DB_PORT                      = "3306"
+      RDS_EXPORT_FETCH_ROWS        = tostring(var.export_from_rds_fetch_rows)
+      RDS_EXPORT_PART_MB           = tostring(var.export_from_rds_part_mb)
+      RDS_READ_YOUR_WRITES_SECONDS = tostring(var.rds_read_your_writes_seconds)
+    }
+  }
+
+  tags       = local.common_tags
+  depends_on = [aws_cloudwatch_log_group.lambda_export_from_rds]
+}
+
 # Lambda 5: SFTP Send
 # NOTA: richiede Lambda Layer con paramiko. Specificare l'ARN in var.lambda_layer_arns_sftp
 resource "aws_lambda_function" "sftp_send" {
@@ -277,6 +369,7 @@ resource "aws_lambda_function" "sftp_send" {
     variables = {
       BUCKET_NAME            = aws_s3_bucket.main.id
       DYNAMODB_LOGS_TABLE    = aws_dynamodb_table.logs.name
+      DYNAMODB_JOBS_TABLE    = aws_dynamodb_table.jobs.name
       SFTP_PRIVATE_KEY_PARAM = var.sftp_private_key_ssm_parameter
     }
   }
@@ -298,9 +391,12 @@ resource "aws_lambda_function" "s3_scan" {
 
   environment {
     variables = {
-      BUCKET_NAME         = aws_s3_bucket.main.id
-      DYNAMODB_SCAN_TABLE = aws_dynamodb_table.scan.name
-      DYNAMODB_LOGS_TABLE = aws_dynamodb_table.logs.name
+      BUCKET_NAME          = aws_s3_bucket.main.id
+      DYNAMODB_SCAN_TABLE  = aws_dynamodb_table.scan.name
+      DYNAMODB_LOGS_TABLE  = aws_dynamodb_table.logs.name
+      S3_SCAN_MODE         = var.s3_scan_mode
+      S3_SCAN_LIST_WORKERS = tostring(var.s3_scan_list_workers)
+      S3_SCAN_PREFIX_DEPTH = tostring(var.s3_scan_prefix_depth)
     }
   }
 
@@ -352,6 +448,28 @@ resource "aws_lambda_function" "search_files" {
   depends_on = [aws_cloudwatch_log_group.lambda_search_files]
 }
 
+# Lambda 9: Stato job asincroni API
+resource "aws_lambda_function" "get_job" {
+  filename         = data.archive_file.get_job.output_path
+  function_name    = "${var.project_name}-get-job"
+  role             = aws_iam_role.lambda_execution.arn
+  handler          = "get_job.lambda_handler"
+  source_code_hash = data.archive_file.get_job.output_base64sha256
+  runtime          = var.lambda_runtime
+  timeout          = 30
+  memory_size      = 256
+
+  environment {
+    variables = {
+      DYNAMODB_JOBS_TABLE = aws_dynamodb_table.jobs.name
+      DYNAMODB_LOGS_TABLE = aws_dynamodb_table.logs.name
+    }
+  }
+
+  tags       = local.common_tags
+  depends_on = [aws_cloudwatch_log_group.lambda_get_job]
+}
+
 # ====================================
 # LAMBDA PERMISSIONS
 # ====================================
@@ -421,6 +539,22 @@ resource "aws_lambda_permission" "apigw_read_from_rds" {
   source_arn    = "${aws_api_gateway_rest_api.main.execution_arn}/*/*"
 }
 
+resource "aws_lambda_permission" "apigw_export_from_rds" {
+  statement_id  = "AllowAPIGatewayInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.export_from_rds.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_api_gateway_rest_api.main.execution_arn}/*/*"
+}
+
+resource "aws_lambda_permission" "apigw_get_job" {
+  statement_id  = "AllowAPIGatewayInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.get_job.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_api_gateway_rest_api.main.execution_arn}/*/*"
+}
+
 # Permission per EventBridge
 resource "aws_lambda_permission" "eventbridge_s3_scan" {
   statement_id  = "AllowEventBridgeInvoke"
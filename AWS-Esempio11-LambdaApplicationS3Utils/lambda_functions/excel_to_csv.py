@@ -3,38 +3,482 @@ import boto3
 import os
 import csv
 import io
+import re
+import datetime
+import tempfile
+import multiprocessing
+import zipfile
+from datetime import datetime as dt, timedelta
 
-from utils import log_operation, api_response
+from botocore.exceptions import ClientError
+
+from utils import (
+    log_operation, api_response, S3MultipartWriter,
+    enqueue_job, is_job_queue_event, run_queued_jobs
+)
 
 s3_client = boto3.client('s3')
+dynamodb = boto3.resource('dynamodb')
 
 BUCKET_NAME = os.environ['BUCKET_NAME']
 LOGS_TABLE = os.environ['DYNAMODB_LOGS_TABLE']
+JOBS_TABLE = os.environ.get('DYNAMODB_JOBS_TABLE', '')
+
+# Cache delle conversioni (ETag sorgente + foglio + formato → output): vuoto = disabilitata
+CONVERSIONS_TABLE = os.environ.get('DYNAMODB_CONVERSIONS_TABLE', '')
+CONVERSION_CACHE_TTL_DAYS = int(os.environ.get('EXCEL_CACHE_TTL_DAYS', '30'))
 
 ALLOWED_EXTENSIONS = ('.xlsx', '.xls')
 
+# Formati di output supportati → estensione del file prodotto
+OUTPUT_FORMATS = {'csv': '.csv', 'parquet': '.parquet'}
+
+# Directory per il file Excel scaricato (storage effimero della Lambda)
+SPOOL_DIR = os.environ.get('EXCEL_SPOOL_DIR', '/tmp')
+
+# Multipart upload del CSV: dimensione parte e parti in volo (memoria max ~ part * (concurrency + 1))
+CSV_PART_SIZE = int(os.environ.get('EXCEL_CSV_PART_SIZE', str(8 * 1024 * 1024)))
+CSV_UPLOAD_CONCURRENCY = int(os.environ.get('EXCEL_CSV_UPLOAD_CONCURRENCY', '4'))
+CSV_WRITE_BUFFER_SIZE = 256 * 1024
+
+# Modalità all_sheets: processi worker per convertire i fogli in parallelo
+# (i vCPU della Lambda crescono con la memoria configurata)
+SHEET_WORKERS = int(os.environ.get('EXCEL_SHEET_WORKERS', str(os.cpu_count() or 1)))
+
+# Output Parquet (richiede pyarrow): righe per row group e codec di compressione
+PARQUET_ROW_GROUP_ROWS = int(os.environ.get('EXCEL_PARQUET_ROW_GROUP_ROWS', '100000'))
+PARQUET_COMPRESSION = os.environ.get('EXCEL_PARQUET_COMPRESSION', 'snappy')
+
+
+def write_sheet_csv(sheet, bucket: str, csv_key: str) -> tuple:
+    """
+    Scrive le righe di un foglio in CSV direttamente in un multipart upload S3.
+
+    Con openpyxl in modalità read_only l'XML del foglio viene letto con un parser
+    incrementale e iter_rows restituisce una riga alla volta: nessuna copia completa
+    del foglio o del CSV resta in memoria. In caso di errore l'upload viene annullato.
+
+    Args:
+        sheet: Foglio openpyxl (ReadOnlyWorksheet)
+        bucket: Bucket di destinazione
+        csv_key: Key del CSV
+
+    Returns:
+        Tupla (numero di righe dati scritte, intestazione esclusa; ETag del CSV)
+    """
+    rows = 0
+    with S3MultipartWriter(s3_client, bucket, csv_key, part_size=CSV_PART_SIZE,
+                           max_concurrency=CSV_UPLOAD_CONCURRENCY,
+                           ContentType='text/csv') as upload:
+        text = io.TextIOWrapper(
+            io.BufferedWriter(upload, buffer_size=CSV_WRITE_BUFFER_SIZE),
+            encoding='utf-8', newline=''
+        )
+        writer = csv.writer(text)
+        for row in sheet.iter_rows(values_only=True):
+            writer.writerow(row)
+            rows += 1
+        # Svuota i buffer e restituisce lo stream a S3MultipartWriter, che completa l'upload
+        text.detach().detach()
+    # La prima riga è l'intestazione: come per il Parquet si contano solo le righe dati
+    return max(rows - 1, 0), upload.etag
+
+
+# infer_columns, parquet_column_type e parquet_value sono replicate in
+# AWS-Esempio12-GlueJob/lambda/excel2csv.py: ogni esempio si installa da solo
+def infer_columns(sheet) -> tuple:
+    """
+    Prima lettura del foglio: ricava nomi e tipi delle colonne per l'output Parquet.
+
+    La prima riga è l'intestazione; per ogni colonna vengono raccolti i tipi Python
+    dei valori (openpyxl restituisce bool, int, float, str e datetime). Il foglio
+    viene letto in streaming, quindi la memoria non dipende dal numero di righe.
+
+    Returns:
+        Tupla (nomi colonne, lista di set con i tipi trovati per colonna)
+    """
+    rows = sheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return [], []
+    kinds = [set() for _ in header]
+    for row in rows:
+        if len(row) > len(kinds):
+            kinds.extend(set() for _ in range(len(row) - len(kinds)))
+        for index, value in enumerate(row):
+            if value is None or value == '':
+                continue
+            if isinstance(value, bool):
+                kinds[index].add('bool')
+            elif isinstance(value, int):
+                kinds[index].add('int')
+            elif isinstance(value, float):
+                kinds[index].add('float')
+            elif isinstance(value, datetime.datetime):
+                kinds[index].add('date' if value.time() == datetime.time(0) else 'datetime')
+            else:
+                kinds[index].add('str')
+
+    names = []
+    for index in range(len(kinds)):
+        name = header[index] if index < len(header) else None
+        name = str(name).strip() if name is not None else ''
+        name = name or f"col_{index + 1}"
+        while name in names:
+            name = f"{name}_{index + 1}"
+        names.append(name)
+    return names, kinds
+
+
+def parquet_column_type(pa, kinds: set):
+    """Tipo Arrow di una colonna dai tipi dei valori; se misti la colonna diventa stringa."""
+    if not kinds or 'str' in kinds:
+        return pa.string()
+    if kinds == {'bool'}:
+        return pa.bool_()
+    if kinds == {'int'}:
+        return pa.int64()
+    if kinds <= {'int', 'float'}:
+        return pa.float64()
+    if kinds == {'date'}:
+        return pa.date32()
+    if kinds <= {'date', 'datetime'}:
+        return pa.timestamp('ms')
+    return pa.string()
+
+
+def parquet_value(value, column_type):
+    """Converte un valore della cella nel tipo Python atteso dalla colonna Arrow."""
+    if value is None or value == '':
+        return None
+    if column_type == 'string':
+        return value if isinstance(value, str) else str(value)
+    if column_type == 'double':
+        return float(value)
+    if column_type == 'date32[day]':
+        return value.date()
+    return value
+
+
+def write_sheet_parquet(sheet, bucket: str, key: str) -> tuple:
+    """
+    Scrive un foglio in Parquet tipizzato e compresso direttamente in un multipart upload S3.
+
+    Il foglio viene letto due volte in streaming: la prima per ricavare i tipi delle
+    colonne (infer_columns), la seconda per scrivere i dati a row group da
+    PARQUET_ROW_GROUP_ROWS righe. In memoria resta un solo row group alla volta;
+    le statistiche min/max per row group permettono a Spark/Athena il pushdown dei filtri.
+
+    Returns:
+        Tupla (numero di righe dati scritte, intestazione esclusa; ETag del file)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    names, kinds = infer_columns(sheet)
+    schema = pa.schema([
+        pa.field(name, parquet_column_type(pa, column_kinds))
+        for name, column_kinds in zip(names, kinds)
+    ])
+    type_names = [str(field.type) for field in schema]
+
+    rows = 0
+    with S3MultipartWriter(s3_client, bucket, key, part_size=CSV_PART_SIZE,
+                           max_concurrency=CSV_UPLOAD_CONCURRENCY,
+                           ContentType='application/vnd.apache.parquet') as upload:
+        writer = pq.ParquetWriter(pa.PythonFile(upload, mode='w'), schema,
+                                  compression=PARQUET_COMPRESSION)
+        columns = [[] for _ in names]
+
+        def flush_row_group():
+            if columns and columns[0]:
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                for values in columns:
+                    values.clear()
+
+        data_rows = sheet.iter_rows(values_only=True)
+        next(data_rows, None)  # intestazione
+        for row in data_rows:
+            for index, values in enumerate(columns):
+                value = row[index] if index < len(row) else None
+                values.append(parquet_value(value, type_names[index]))
+            rows += 1
+            if rows % PARQUET_ROW_GROUP_ROWS == 0:
+                flush_row_group()
+        flush_row_group()
+        writer.close()
+    return rows, upload.etag
+
+
+def write_sheet(sheet, bucket: str, key: str, output_format: str) -> tuple:
+    """Scrive il foglio nel formato richiesto ('csv' o 'parquet'); restituisce (righe, ETag)."""
+    if output_format == 'parquet':
+        return write_sheet_parquet(sheet, bucket, key)
+    return write_sheet_csv(sheet, bucket, key)
+
+
+def sheet_output_key(output_prefix: str, sheet_name: str, extension: str, used_keys: set) -> str:
+    """
+    Costruisce la key del file di output di un foglio sotto output_prefix.
+
+    I caratteri non ammessi nel nome del foglio vengono sostituiti con '_'; se due
+    fogli producono lo stesso nome viene aggiunto un suffisso numerico.
+    """
+    base_name = re.sub(r'[^\w\-. ]', '_', sheet_name).strip() or 'sheet'
+    output_key = f"{output_prefix}{base_name}{extension}"
+    counter = 1
+    while output_key in used_keys:
+        counter += 1
+        output_key = f"{output_prefix}{base_name}_{counter}{extension}"
+    used_keys.add(output_key)
+    return output_key
+
+
+def convert_sheets(workbook, assignments: list, bucket: str, output_format: str) -> list:
+    """
+    Converte un gruppo di fogli del workbook già aperto (openpyxl read_only).
+
+    Args:
+        workbook: Workbook openpyxl aperto in modalità read_only
+        assignments: Lista di tuple (sheet_name, output_key)
+        bucket: Bucket di destinazione
+        output_format: 'csv' o 'parquet'
+
+    Returns:
+        Lista di dizionari {sheet_name, output_key, rows, etag} oppure {sheet_name, output_key, error}
+    """
+    results = []
+    for sheet_name, output_key in assignments:
+        try:
+            rows, etag = write_sheet(workbook[sheet_name], bucket, output_key, output_format)
+            results.append({
+                'sheet_name': sheet_name, 'output_key': output_key, 'rows': rows, 'etag': etag
+            })
+        except Exception as e:
+            print(f"Conversione fallita per il foglio {sheet_name}: {e}")
+            results.append({'sheet_name': sheet_name, 'output_key': output_key, 'error': str(e)})
+    return results
+
+
+def sheet_worker(workbook, path: str, assignments: list, bucket: str, output_format: str, conn) -> None:
+    """
+    Entry point del processo worker: converte i fogli assegnati e invia i risultati sulla pipe.
+
+    Il workbook (shared strings, stili, elenco fogli) è quello già letto dal processo padre,
+    ereditato con fork senza copie né nuovo parsing; il worker legge in streaming solo l'XML
+    dei propri fogli.
+    """
+    global s3_client
+    # Il client del processo padre non va condiviso tra processi (connessioni HTTP)
+    s3_client = boto3.client('s3')
+    # Dopo fork il file descriptor dell'archivio condivide la posizione con gli altri
+    # processi: ogni worker riapre lo zip per leggere i fogli in modo indipendente
+    workbook._archive = zipfile.ZipFile(path)
+    try:
+        conn.send(convert_sheets(workbook, assignments, bucket, output_format))
+    except Exception as e:
+        conn.send([
+            {'sheet_name': sheet_name, 'output_key': output_key, 'error': str(e)}
+            for sheet_name, output_key in assignments
+        ])
+    finally:
+        conn.close()
+
+
+def convert_all_sheets(workbook, path: str, bucket: str, output_prefix: str,
+                       output_format: str = 'csv') -> list:
+    """
+    Converte tutti i fogli in parallelo, un file per foglio sotto output_prefix.
+
+    Il file viene scaricato e il workbook aperto una sola volta dal processo padre; i
+    fogli sono distribuiti a rotazione su SHEET_WORKERS processi creati con fork, che
+    ereditano il workbook già letto (pagine condivise copy-on-write) e leggono ognuno solo
+    i propri fogli. Si usano Process e Pipe perché nell'ambiente Lambda manca /dev/shm,
+    richiesto da multiprocessing.Pool e Queue.
+
+    Returns:
+        Manifest: lista di {sheet_name, output_key, rows} (o error) nell'ordine dei fogli
+    """
+    sheet_names = workbook.sheetnames
+    used_keys = set()
+    extension = OUTPUT_FORMATS[output_format]
+    assignments = [
+        (name, sheet_output_key(output_prefix, name, extension, used_keys)) for name in sheet_names
+    ]
+    workers = max(1, min(SHEET_WORKERS, len(assignments)))
+    if workers == 1:
+        return convert_sheets(workbook, assignments, bucket, output_format)
+
+    context = multiprocessing.get_context('fork')
+    groups = [assignments[i::workers] for i in range(workers)]
+    processes = []
+    for group in groups:
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(target=sheet_worker, args=(workbook, path, group, bucket, output_format, child_conn))
+        process.start()
+        child_conn.close()
+        processes.append((process, parent_conn, group))
+
+    results = {}
+    for process, parent_conn, group in processes:
+        try:
+            # Legge prima di join: un risultato grande bloccherebbe il worker sulla pipe
+            for result in parent_conn.recv():
+                results[result['sheet_name']] = result
+        except EOFError:
+            for sheet_name, output_key in group:
+                results[sheet_name] = {
+                    'sheet_name': sheet_name, 'output_key': output_key,
+                    'error': 'Processo worker terminato in modo anomalo'
+                }
+        finally:
+            parent_conn.close()
+            process.join()
+    return [results[sheet_name] for sheet_name in sheet_names]
+
+
+def conversion_cache_key(excel_key: str, sheet_name, output_format: str, all_sheets: bool) -> str:
+    """Chiave della cache: file sorgente, foglio (nome o indice) e formato di output."""
+    if all_sheets:
+        sheet_part = '*'
+    elif isinstance(sheet_name, str):
+        sheet_part = f"name:{sheet_name}"
+    else:
+        sheet_part = f"index:{sheet_name}"
+    return f"{excel_key}|{sheet_part}|{output_format}"
+
+
+def get_cached_conversion(cache_key: str, source_etag: str):
+    """
+    Cerca una conversione già eseguita per la stessa versione del file Excel.
+
+    La voce è valida solo se l'ETag del sorgente coincide (file non modificato) e se
+    ogni file prodotto esiste ancora con lo stesso ETag (non cancellato né sovrascritto,
+    ad esempio da una conversione di un altro foglio sulla stessa key).
+
+    Returns:
+        Risultato della conversione salvato in cache, oppure None
+    """
+    if not CONVERSIONS_TABLE:
+        return None
+    try:
+        item = dynamodb.Table(CONVERSIONS_TABLE).get_item(Key={'cache_key': cache_key}).get('Item')
+    except Exception as e:
+        print(f"Errore lettura cache conversioni: {e}")
+        return None
+    if not item or item.get('source_etag') != source_etag:
+        return None
+    for output in item.get('outputs', []):
+        try:
+            head = s3_client.head_object(Bucket=BUCKET_NAME, Key=output['output_key'])
+        except ClientError:
+            return None
+        if head.get('ETag') != output['etag']:
+            return None
+    return item['result']
+
+
+def store_cached_conversion(cache_key: str, source_etag: str, result: dict, outputs: list) -> None:
+    """Salva il risultato della conversione in cache (sovrascrive la voce della versione precedente)."""
+    if not CONVERSIONS_TABLE:
+        return
+    try:
+        dynamodb.Table(CONVERSIONS_TABLE).put_item(Item={
+            'cache_key': cache_key,
+            'source_etag': source_etag,
+            'outputs': outputs,
+            'result': result,
+            'converted_at': dt.now().isoformat(),
+            'expires_at': int((dt.now() + timedelta(days=CONVERSION_CACHE_TTL_DAYS)).timestamp())
+        })
+    except Exception as e:
+        print(f"Errore scrittura cache conversioni: {e}")
+
+
+def all_sheets_result(excel_key: str, output_prefix: str, output_format: str, manifest: list) -> dict:
+    """Registra il log e costruisce il risultato della modalità all_sheets."""
+    failed = [item for item in manifest if 'error' in item]
+    total_rows = sum(item.get('rows', 0) for item in manifest)
+    log_operation(
+        LOGS_TABLE,
+        'excel_to_csv',
+        {
+            'excel_key': excel_key,
+            'output_prefix': output_prefix,
+            'format': output_format,
+            'sheets': len(manifest),
+            'failed_sheets': [item['sheet_name'] for item in failed],
+            'rows': total_rows
+        },
+        'error' if failed else 'success'
+    )
+    return {
+        'message': f"Excel convertito in {output_format.upper()} con successo" if not failed
+        else f"Conversione completata con {len(failed)} fogli non convertiti",
+        'output_prefix': output_prefix,
+        'format': output_format,
+        'sheets': manifest,
+        'count': len(manifest) - len(failed),
+        'failed_count': len(failed),
+        'rows': total_rows
+    }
+
 
 def lambda_handler(event, context):
     """
-    Converte file Excel (.xlsx / .xls) in CSV.
+    Converte file Excel (.xlsx / .xls) in CSV o Parquet.
+
+    Il file viene scaricato su disco (SPOOL_DIR) e non in memoria; il foglio è letto
+    in streaming e le righe CSV sono caricate con un multipart upload, quindi la
+    memoria usata non dipende dal numero di righe.
 
     NOTA: Richiede Lambda Layer con openpyxl installato.
     Vedi variabile Terraform: lambda_layer_arns_excel
 
+    Con "all_sheets": true tutti i fogli vengono convertiti in parallelo (un file per
+    foglio sotto "<excel_key senza estensione>/") e la risposta contiene il manifest
+    con key e numero di righe di ogni file.
+
+    Con "format": "parquet" l'output è Parquet tipizzato e compresso (richiede pyarrow
+    nel layer): la prima riga del foglio è l'intestazione e i tipi delle colonne sono
+    ricavati dai valori delle celle.
+
     Input (body JSON):
     {
         "excel_key": "path/to/file.xlsx",
-        "sheet_name": "Sheet1"  # opzionale, default primo foglio
+        "sheet_name": "Sheet1",  # opzionale, default primo foglio
+        "all_sheets": false,     # opzionale, converte tutti i fogli
+        "format": "csv",         # opzionale, 'csv' (default) o 'parquet'
+        "force": false,          # opzionale, ignora la cache e riconverte
+        "async": false           # opzionale, esegue come job e risponde 202 con job_id
     }
+
+    Le conversioni sono memorizzate nella tabella DynamoDB CONVERSIONS_TABLE con
+    chiave file + foglio + formato: se l'ETag del file Excel non è cambiato la
+    risposta viene restituita dalla cache ("cached": true) senza scaricare il file.
     """
+    if is_job_queue_event(event):
+        return run_queued_jobs(event, context, JOBS_TABLE, lambda_handler)
+
     try:
         body = json.loads(event.get('body', '{}'))
         excel_key = body.get('excel_key')
         sheet_name = body.get('sheet_name', 0)  # Default: primo foglio
+        all_sheets = bool(body.get('all_sheets', False))
+        output_format = str(body.get('format', 'csv')).lower()
+        force = bool(body.get('force', False))
 
         if not excel_key:
             return api_response(400, {'error': 'excel_key is required'})
 
+        if output_format not in OUTPUT_FORMATS:
+            return api_response(400, {
+                'error': f"Formato non supportato: '{output_format}'. Consentiti: {list(OUTPUT_FORMATS)}"
+            })
+
         # Valida estensione
         _, ext = os.path.splitext(excel_key.lower())
         if ext not in ALLOWED_EXTENSIONS:
@@ -42,9 +486,19 @@ def lambda_handler(event, context):
                 'error': f"Estensione non supportata: '{ext}'. Consentite: {ALLOWED_EXTENSIONS}"
             })
 
-        # Scarica Excel da S3
-        excel_obj = s3_client.get_object(Bucket=BUCKET_NAME, Key=excel_key)
-        excel_data = excel_obj['Body'].read()
+        if body.get('async') and JOBS_TABLE:
+            return enqueue_job(JOBS_TABLE, 'excel_to_csv', body)
+
+        # Cache: con lo stesso ETag del sorgente restituisce l'output già prodotto senza download
+        source_etag = s3_client.head_object(Bucket=BUCKET_NAME, Key=excel_key)['ETag']
+        cache_key = conversion_cache_key(excel_key, sheet_name, output_format, all_sheets)
+        cached = None if force else get_cached_conversion(cache_key, source_etag)
+        if cached is not None:
+            log_operation(LOGS_TABLE, 'excel_to_csv', {
+                'excel_key': excel_key, 'cache_key': cache_key, 'cached': True
+            })
+            cached['cached'] = True
+            return api_response(200, cached)
 
         try:
             import openpyxl
@@ -56,48 +510,82 @@ def lambda_handler(event, context):
                 'suggestion': 'Creare un layer con: pip install openpyxl -t python/ && zip -r layer.zip python/; poi impostare TF_VAR_lambda_layer_arns_excel=["arn:..."] e rieseguire terraform apply.'
             })
 
-        workbook = openpyxl.load_workbook(io.BytesIO(excel_data), read_only=True, data_only=True)
-
-        # Seleziona sheet
-        if isinstance(sheet_name, str):
-            if sheet_name not in workbook.sheetnames:
-                return api_response(400, {
-                    'error': f"Sheet '{sheet_name}' non trovato. Disponibili: {workbook.sheetnames}"
+        if output_format == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                error_msg = 'pyarrow non trovato. Aggiungere un Lambda Layer con pyarrow installato.'
+                log_operation(LOGS_TABLE, 'excel_to_csv', {'error': error_msg}, 'error')
+                return api_response(500, {
+                    'error': error_msg,
+                    'suggestion': 'Usare il layer pubblico AWS SDK for pandas (contiene pyarrow) oppure creare un layer con: pip install pyarrow -t python/; poi aggiungere l\'ARN a TF_VAR_lambda_layer_arns_excel e rieseguire terraform apply.'
                 })
-            sheet = workbook[sheet_name]
-        else:
-            sheet = workbook.worksheets[sheet_name]
 
-        # Converti in CSV
-        csv_buffer = io.StringIO()
-        writer = csv.writer(csv_buffer)
-        for row in sheet.iter_rows(values_only=True):
-            writer.writerow(row)
+        # Costruisci nome del file di output sostituendo l'estensione originale
+        output_key = excel_key[:excel_key.rfind('.')] + OUTPUT_FORMATS[output_format]
 
-        # Costruisci nome CSV sostituendo l'estensione originale
-        csv_key = excel_key[:excel_key.rfind('.')] + '.csv'
+        # Scarica Excel da S3 su disco (il file temporaneo viene rimosso alla chiusura);
+        # IfMatch garantisce che venga convertita la versione con l'ETag registrato in cache
+        with tempfile.NamedTemporaryFile(dir=SPOOL_DIR, suffix=ext) as spool:
+            s3_client.download_fileobj(BUCKET_NAME, excel_key, spool,
+                                       ExtraArgs={'IfMatch': source_etag})
+            spool.flush()
 
-        s3_client.put_object(
-            Bucket=BUCKET_NAME,
-            Key=csv_key,
-            Body=csv_buffer.getvalue().encode('utf-8'),
-            ContentType='text/csv'
-        )
+            workbook = openpyxl.load_workbook(spool.name, read_only=True, data_only=True)
+            if all_sheets:
+                output_prefix = excel_key[:excel_key.rfind('.')] + '/'
+                try:
+                    manifest = convert_all_sheets(workbook, spool.name, BUCKET_NAME, output_prefix,
+                                                  output_format)
+                finally:
+                    workbook.close()
+                result = all_sheets_result(excel_key, output_prefix, output_format, manifest)
+                if not result['failed_count']:
+                    store_cached_conversion(cache_key, source_etag, result, [
+                        {'output_key': item['output_key'], 'etag': item['etag']} for item in manifest
+                    ])
+                result['cached'] = False
+                return api_response(200, result)
+            try:
+                # Seleziona sheet
+                if isinstance(sheet_name, str):
+                    if sheet_name not in workbook.sheetnames:
+                        return api_response(400, {
+                            'error': f"Sheet '{sheet_name}' non trovato. Disponibili: {workbook.sheetnames}"
+                        })
+                    sheet = workbook[sheet_name]
+                else:
+                    sheet = workbook.worksheets[sheet_name]
+
+                rows, output_etag = write_sheet(sheet, BUCKET_NAME, output_key, output_format)
+            finally:
+                workbook.close()
 
         log_operation(
             LOGS_TABLE,
             'excel_to_csv',
             {
                 'excel_key': excel_key,
-                'csv_key': csv_key,
-                'sheet_name': str(sheet_name)
+                'output_key': output_key,
+                'format': output_format,
+                'sheet_name': str(sheet_name),
+                'rows': rows
             }
         )
 
-        return api_response(200, {
-            'message': 'Excel convertito in CSV con successo',
-            'csv_key': csv_key
-        })
+        response = {
+            'message': f"Excel convertito in {output_format.upper()} con successo",
+            'output_key': output_key,
+            'format': output_format,
+            'rows': rows
+        }
+        if output_format == 'csv':
+            # Campo storico mantenuto per i client esistenti
+            response['csv_key'] = output_key
+        store_cached_conversion(cache_key, source_etag, response,
+                                [{'output_key': output_key, 'etag': output_etag}])
+        response['cached'] = False
+        return api_response(200, response)
 
     except Exception as e:
         log_operation(LOGS_TABLE, 'excel_to_csv', {'error': str(e)}, 'error')
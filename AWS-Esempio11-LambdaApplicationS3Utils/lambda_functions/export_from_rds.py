@@ -0,0 +1,373 @@
+import base64
+import csv
+import gzip
+import io
+import json
+import boto3
+import os
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from utils import (
+    log_operation, api_response, validate_table_name, validate_s3_key,
+    enqueue_job, is_job_queue_event, run_queued_jobs,
+    acquire_read_connection, release_mysql_connection, table_written_within, S3MultipartWriter
+)
+
+s3_client = boto3.client('s3')
+
+BUCKET_NAME = os.environ['BUCKET_NAME']
+LOGS_TABLE = os.environ['DYNAMODB_LOGS_TABLE']
+JOBS_TABLE = os.environ.get('DYNAMODB_JOBS_TABLE', '')
+
+# Credenziali RDS passate come variabili d'ambiente Lambda (criptate at-rest)
+DB_HOST = os.environ.get('DB_HOST', '')
+DB_USERNAME = os.environ.get('DB_USERNAME', '')
+DB_PASSWORD = os.environ.get('DB_PASSWORD', '')
+DB_DATABASE = os.environ.get('DB_DATABASE', '')
+DB_PORT = int(os.environ.get('DB_PORT', '3306'))
+
+# Repliche Aurora in lettura (host separati da virgola, vuoto = solo writer) e finestra
+# read-your-writes: per RDS_READ_YOUR_WRITES_SECONDS dopo un import la tabella si legge dal writer
+DB_READER_HOSTS = [host for host in os.environ.get('DB_READER_HOSTS', '').split(',') if host]
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('RDS_READ_YOUR_WRITES_SECONDS', '10'))
+IMPORTS_TABLE = os.environ.get('DYNAMODB_IMPORTS_TABLE', '')
+
+# Formati di export → estensione del file e Content-Type
+EXPORT_FORMATS = {
+    'ndjson': ('.ndjson', 'application/x-ndjson'),
+    'csv': ('.csv', 'text/csv'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+# Righe lette per fetchmany dal cursore server-side e dimensione delle parti S3
+EXPORT_FETCH_ROWS = int(os.environ.get('RDS_EXPORT_FETCH_ROWS', '10000'))
+EXPORT_PART_SIZE = int(os.environ.get('RDS_EXPORT_PART_MB', '16')) * 1024 * 1024
+EXPORT_UPLOAD_CONCURRENCY = int(os.environ.get('RDS_EXPORT_UPLOAD_CONCURRENCY', '4'))
+GZIP_LEVEL = 6
+
+# Output Parquet (richiede pyarrow): righe per row group e codec di compressione
+PARQUET_ROW_GROUP_ROWS = int(os.environ.get('RDS_EXPORT_PARQUET_ROW_GROUP_ROWS', '100000'))
+PARQUET_COMPRESSION = os.environ.get('RDS_EXPORT_PARQUET_COMPRESSION', 'snappy')
+
+# Secondi concessi al server per inviare un blocco di risultati: con un cursore
+# unbuffered il server attende che il client legga mentre le parti vanno su S3
+NET_WRITE_TIMEOUT_SECONDS = 600
+NO_SUCH_TABLE_ERROR = 1146
+
+# Tipi MySQL con valori binari: nella descrizione del cursore hanno lo stesso codice
+# dei tipi testuali, si distinguono con DATA_TYPE di information_schema.COLUMNS
+BINARY_DATA_TYPES = ('binary', 'varbinary', 'tinyblob', 'blob', 'mediumblob', 'longblob', 'bit')
+
+
+def json_value(value):
+    """Serializzatore JSON dei tipi MySQL: i DECIMAL restano stringhe per non perdere precisione."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, timedelta)):
+        return str(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f"Tipo non serializzabile: {type(value)}")
+
+
+def write_ndjson(batches, names: list, output) -> int:
+    """Una riga JSON per record ({colonna: valore}); restituisce le righe scritte."""
+    rows = 0
+    text = io.TextIOWrapper(output, encoding='utf-8', newline='\n', write_through=True)
+    for batch in batches:
+        text.write(''.join(
+            json.dumps(dict(zip(names, row)), default=json_value, ensure_ascii=False) + '\n'
+            for row in batch
+        ))
+        rows += len(batch)
+    text.flush()
+    text.detach()
+    return rows
+
+
+def write_csv(batches, names: list, output) -> int:
+    """CSV con intestazione, NULL come campo vuoto; restituisce le righe scritte."""
+    rows = 0
+    text = io.TextIOWrapper(output, encoding='utf-8', newline='', write_through=True)
+    writer = csv.writer(text)
+    writer.writerow(names)
+    for batch in batches:
+        writer.writerows(
+            [[base64.b64encode(value).decode('ascii') if isinstance(value, bytes) else value
+              for value in row] for row in batch]
+        )
+        rows += len(batch)
+    text.flush()
+    text.detach()
+    return rows
+
+
+def binary_columns(connection, table_name: str) -> set:
+    """Nomi delle colonne binarie della tabella (BINARY_DATA_TYPES)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table_name,)
+        )
+        return {name for name, data_type in cursor.fetchall() if data_type.lower() in BINARY_DATA_TYPES}
+
+
+def parquet_schema(pa, FIELD_TYPE, description, binary_names: set):
+    """
+    Schema Arrow dalla descrizione del cursore. Le colonne testuali e binarie hanno lo
+    stesso codice di tipo in MySQL: le binarie sono quelle in binary_names.
+    """
+    integers = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.INT24,
+                FIELD_TYPE.LONGLONG, FIELD_TYPE.YEAR}
+    floats = {FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE}
+    decimals = {FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL}
+    timestamps = {FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP}
+    fields = []
+    for column in description:
+        name, type_code, scale = column[0], column[1], column[5] or 0
+        if type_code in integers:
+            arrow_type = pa.int64()
+        elif type_code in floats:
+            arrow_type = pa.float64()
+        elif type_code in decimals and scale <= 38:
+            arrow_type = pa.decimal128(38, scale)
+        elif type_code == FIELD_TYPE.DATE:
+            arrow_type = pa.date32()
+        elif type_code in timestamps:
+            arrow_type = pa.timestamp('us')
+        else:
+            arrow_type = pa.binary() if name in binary_names else pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def write_parquet(batches, description, binary_names: set, output) -> int:
+    """
+    Parquet tipizzato e compresso a row group da PARQUET_ROW_GROUP_ROWS righe:
+    in memoria resta un solo row group alla volta.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pymysql.constants import FIELD_TYPE
+
+    schema = parquet_schema(pa, FIELD_TYPE, description, binary_names)
+    convert = [
+        (lambda value: value if value is None or isinstance(value, str) else str(value))
+        if field.type == pa.string() else None
+        for field in schema
+    ]
+    writer = pq.ParquetWriter(pa.PythonFile(output, mode='w'), schema, compression=PARQUET_COMPRESSION)
+    columns = [[] for _ in schema]
+    rows = 0
+
+    def flush_row_group():
+        if columns[0]:
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            for values in columns:
+                values.clear()
+
+    for batch in batches:
+        for row in batch:
+            for values, converter, value in zip(columns, convert, row):
+                values.append(converter(value) if converter else value)
+        rows += len(batch)
+        if len(columns[0]) >= PARQUET_ROW_GROUP_ROWS:
+            flush_row_group()
+    flush_row_group()
+    writer.close()
+    return rows
+
+
+def fetch_batches(cursor):
+    """Blocchi di EXPORT_FETCH_ROWS righe dal cursore server-side."""
+    while True:
+        batch = cursor.fetchmany(EXPORT_FETCH_ROWS)
+        if not batch:
+            return
+        yield batch
+
+
+def export_table(connection, SSCursor, table_name: str, output_format: str,
+                 compression: str, output_key: str) -> dict:
+    """
+    Esporta l'intera tabella su S3 con un solo SELECT su cursore unbuffered (SSCursor):
+    le righe arrivano dal server a blocchi, vengono codificate e caricate in un
+    multipart upload mentre la lettura prosegue. La memoria resta costante (un blocco
+    di righe e le parti S3 in volo); la SELECT è una lettura consistente di InnoDB,
+    quindi l'export è una fotografia della tabella all'avvio.
+
+    Returns:
+        Dizionario con rows e bytes scritti
+    """
+    content_type = EXPORT_FORMATS[output_format][1]
+    writer = write_ndjson if output_format == 'ndjson' else write_csv
+    binary_names = binary_columns(connection, table_name) if output_format == 'parquet' else set()
+    # net_write_timeout viene alzato solo per questa SELECT: la connessione torna nel pool
+    with connection.cursor() as session:
+        session.execute("SELECT @@SESSION.net_write_timeout")
+        previous_timeout = int(session.fetchone()[0])
+    cursor = connection.cursor(SSCursor)
+    try:
+        cursor.execute(f"SET SESSION net_write_timeout = {NET_WRITE_TIMEOUT_SECONDS}")
+        cursor.execute(f"SELECT * FROM `{table_name}`")
+        names = [column[0] for column in cursor.description]
+        batches = fetch_batches(cursor)
+
+        with S3MultipartWriter(s3_client, BUCKET_NAME, output_key, part_size=EXPORT_PART_SIZE,
+                               max_concurrency=EXPORT_UPLOAD_CONCURRENCY,
+                               ContentType=content_type) as upload:
+            if output_format == 'parquet':
+                rows = write_parquet(batches, cursor.description, binary_names, upload)
+            elif compression == 'gzip':
+                with gzip.GzipFile(fileobj=upload, mode='wb', compresslevel=GZIP_LEVEL) as gz:
+                    rows = writer(batches, names, gz)
+            else:
+                rows = writer(batches, names, upload)
+    except Exception:
+        # Chiudere il cursore leggerebbe tutte le righe rimanenti: si chiude la connessione
+        connection.close()
+        raise
+    cursor.close()
+    try:
+        with connection.cursor() as session:
+            session.execute(f"SET SESSION net_write_timeout = {previous_timeout}")
+    except Exception:
+        # Timeout non ripristinato: la connessione non deve tornare nel pool
+        connection.close()
+    return {'rows': rows, 'bytes': upload.bytes_written}
+
+
+def lambda_handler(event, context):
+    """
+    Esporta un'intera tabella RDS Aurora MySQL in un file su S3 (NDJSON, CSV o Parquet).
+
+    NOTA: Richiede Lambda Layer con pymysql (e pyarrow per Parquet).
+    Vedi variabile Terraform: lambda_layer_arns_rds
+
+    Input (body JSON):
+    {
+        "table_name": "imported_data",   # solo lettere, cifre, underscore
+        "format": "ndjson",              # opzionale, ndjson (default), csv o parquet
+        "compression": "gzip",           # opzionale, gzip (default) o none; Parquet usa il codec interno
+        "output_key": "exports/x.ndjson.gz",  # opzionale, default exports/<tabella>/<tabella>-<timestamp>.<ext>
+        "async": false                   # opzionale, esegue come job e risponde 202 con job_id
+    }
+
+    In NDJSON i DECIMAL sono stringhe (precisione esatta), date e timestamp ISO 8601,
+    i valori binari base64.
+    """
+    if is_job_queue_event(event):
+        return run_queued_jobs(event, context, JOBS_TABLE, lambda_handler)
+
+    try:
+        body = json.loads(event.get('body', '{}'))
+        table_name_raw = body.get('table_name', '')
+        output_format = body.get('format', 'ndjson')
+        compression = body.get('compression', 'gzip')
+
+        if not table_name_raw:
+            return api_response(400, {'error': 'table_name is required'})
+
+        # Valida nome tabella per prevenire SQL injection
+        try:
+            table_name = validate_table_name(table_name_raw)
+        except ValueError as e:
+            return api_response(400, {'error': str(e)})
+
+        if output_format not in EXPORT_FORMATS:
+            return api_response(400, {'error': f"format deve essere uno tra: {', '.join(EXPORT_FORMATS)}"})
+        if compression not in ('gzip', 'none'):
+            return api_response(400, {'error': 'compression deve essere gzip o none'})
+        if output_format == 'parquet':
+            compression = PARQUET_COMPRESSION
+
+        extension = EXPORT_FORMATS[output_format][0] + ('.gz' if compression == 'gzip' else '')
+        output_key = body.get('output_key') or (
+            f"exports/{table_name}/{table_name}-{datetime.now().strftime('%Y%m%dT%H%M%S')}{extension}"
+        )
+        try:
+            output_key = validate_s3_key(output_key)
+        except ValueError as e:
+            return api_response(400, {'error': str(e)})
+
+        if not DB_HOST:
+            return api_response(500, {'error': 'Credenziali RDS non configurate (DB_HOST vuoto). Impostare create_rds = true.'})
+
+        if body.get('async') and JOBS_TABLE:
+            return enqueue_job(JOBS_TABLE, 'export_from_rds', body)
+
+        try:
+            import pymysql
+        except ImportError:
+            error_msg = 'pymysql non trovato. Aggiungere un Lambda Layer con pymysql installato.'
+            log_operation(LOGS_TABLE, 'export_from_rds', {'error': error_msg}, 'error')
+            return api_response(500, {
+                'error': error_msg,
+                'suggestion': 'Creare un layer con: pip install pymysql -t python/ && zip -r layer.zip python/'
+            })
+
+        if output_format == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                error_msg = 'pyarrow non trovato. Aggiungere un Lambda Layer con pyarrow installato.'
+                log_operation(LOGS_TABLE, 'export_from_rds', {'error': error_msg}, 'error')
+                return api_response(500, {
+                    'error': error_msg,
+                    'suggestion': 'Usare il layer pubblico AWS SDK for pandas (contiene pyarrow) oppure creare un layer con: pip install pyarrow -t python/; poi aggiungere l\'ARN a TF_VAR_lambda_layer_arns_rds e rieseguire terraform apply.'
+                })
+
+        # L'export legge l'intera tabella: su una replica non rallenta gli import sul writer
+        reader_hosts = DB_READER_HOSTS
+        if reader_hosts and READ_YOUR_WRITES_SECONDS > 0 and IMPORTS_TABLE and \
+                table_written_within(IMPORTS_TABLE, table_name, READ_YOUR_WRITES_SECONDS):
+            reader_hosts = []
+        connection, db_host, db_role = acquire_read_connection(
+            pymysql,
+            reader_hosts,
+            host=DB_HOST,
+            user=DB_USERNAME,
+            password=DB_PASSWORD,
+            database=DB_DATABASE,
+            port=DB_PORT,
+            connect_timeout=10,
+            autocommit=True
+        )
+        started = time.monotonic()
+        try:
+            result = export_table(connection, pymysql.cursors.SSCursor, table_name,
+                                  output_format, compression, output_key)
+        except pymysql.MySQLError as e:
+            if e.args and e.args[0] == NO_SUCH_TABLE_ERROR:
+                return api_response(404, {
+                    'error': f"Tabella '{table_name}' non trovata nel database '{DB_DATABASE}'"
+                })
+            raise
+        finally:
+            release_mysql_connection(connection)
+        elapsed = time.monotonic() - started
+
+        summary = {
+            'table_name': table_name,
+            'output_key': output_key,
+            'format': output_format,
+            'compression': compression,
+            'rows': result['rows'],
+            'bytes': result['bytes'],
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(result['rows'] / elapsed) if elapsed > 0 else result['rows'],
+            'db_role': db_role,
+            'db_host': db_host
+        }
+        log_operation(LOGS_TABLE, 'export_from_rds', summary)
+        return api_response(200, dict(summary, message='Export completato'))
+
+    except Exception as e:
+        log_operation(LOGS_TABLE, 'export_from_rds', {'error': str(e)}, 'error')
+        return api_response(500, {'error': str(e)})
@@ -3,26 +3,844 @@ import boto3
 import os
 import zipfile
 import io
+import struct
+import tarfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-from utils import log_operation, api_response, safe_zip_extract_path
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
-s3_client = boto3.client('s3')
+from utils import (
+    log_operation, api_response, safe_zip_extract_path, S3MultipartWriter,
+    enqueue_job, is_job_queue_event, run_queued_jobs, current_job_id
+)
 
 BUCKET_NAME = os.environ['BUCKET_NAME']
 LOGS_TABLE = os.environ['DYNAMODB_LOGS_TABLE']
 
-# Dimensione massima ZIP accettata (100 MB)
-MAX_ZIP_SIZE_BYTES = 100 * 1024 * 1024
+# Stadio di upload concorrente: numero di worker e byte massimi in volo
+# (dati già decompressi in attesa di put_object)
+UPLOAD_WORKERS = int(os.environ.get('EXTRACT_UPLOAD_WORKERS', '16'))
+MAX_INFLIGHT_BYTES = int(os.environ.get('EXTRACT_MAX_INFLIGHT_BYTES', str(64 * 1024 * 1024)))
+
+# File estratti oltre questa soglia vengono decompressi a chunk direttamente in un
+# multipart upload, con MULTIPART_CONCURRENCY parti caricate in parallelo
+MULTIPART_THRESHOLD_BYTES = int(os.environ.get('EXTRACT_MULTIPART_THRESHOLD_BYTES', str(16 * 1024 * 1024)))
+MULTIPART_PART_SIZE = 16 * 1024 * 1024
+MULTIPART_CONCURRENCY = int(os.environ.get('EXTRACT_MULTIPART_CONCURRENCY', '8'))
+
+# Il pool di connessioni HTTP deve coprire tutti i worker (default botocore: 10)
+s3_client = boto3.client('s3', config=Config(max_pool_connections=UPLOAD_WORKERS + MULTIPART_CONCURRENCY))
+
+lambda_client = boto3.client('lambda')
+dynamodb = boto3.resource('dynamodb')
+
+# Modalità distribuita (fan-out): oltre FANOUT_MIN_ENTRIES file la Lambda fa da coordinatore,
+# divide l'archivio in shard contigui e invoca sé stessa in modo asincrono per ogni shard
+JOBS_TABLE = os.environ.get('DYNAMODB_JOBS_TABLE', '')
+FANOUT_MIN_ENTRIES = int(os.environ.get('EXTRACT_FANOUT_MIN_ENTRIES', '50000'))
+SHARD_MAX_ENTRIES = int(os.environ.get('EXTRACT_SHARD_MAX_ENTRIES', '10000'))
+SHARD_MAX_BYTES = int(os.environ.get('EXTRACT_SHARD_MAX_BYTES', str(10 * 1024 * 1024 * 1024)))
+MANIFEST_PREFIX = '_extract_zip_jobs'
+# Errori riportati per shard nel record finale (limite item DynamoDB 400 KB)
+SHARD_FAILED_SAMPLE = 5
+JOB_TTL_DAYS = 7
+
+# Archivi tar supportati (estrazione sequenziale dallo stream di get_object):
+# suffisso → compressione per tarfile ('zst' richiede il modulo zstandard)
+TAR_SUFFIXES = (
+    ('.tar.gz', 'gz'), ('.tgz', 'gz'),
+    ('.tar.bz2', 'bz2'), ('.tbz2', 'bz2'),
+    ('.tar.xz', 'xz'), ('.txz', 'xz'),
+    ('.tar.zst', 'zst'), ('.tzst', 'zst'),
+    ('.tar', '')
+)
+TAR_READ_CHUNK_SIZE = 1024 * 1024
+
+# Dimensione dei blocchi letti dall'archivio con GET ranged (8 MB).
+# In memoria è presente un solo blocco alla volta, indipendentemente dalla dimensione dello ZIP.
+RANGE_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Protezione zip bomb: rapporto massimo decompresso/compresso per singolo file
+# e volume massimo estraibile da un singolo archivio
+MAX_COMPRESSION_RATIO = int(os.environ.get('ZIP_MAX_COMPRESSION_RATIO', '100'))
+MAX_EXTRACTED_BYTES = int(os.environ.get('ZIP_MAX_EXTRACTED_BYTES', str(50 * 1024 * 1024 * 1024)))
+
+
+class S3RangeReader(io.RawIOBase):
+    """
+    File-like seekable in sola lettura su un oggetto S3, basato su GET ranged.
+
+    zipfile legge la central directory in coda all'archivio e poi i singoli file
+    tramite seek/read: questo reader scarica solo i blocchi richiesti e ne tiene
+    in memoria uno alla volta, quindi l'archivio non viene mai scaricato per intero.
+    """
+
+    def __init__(self, client, bucket: str, key: str, size: int, etag: str = None,
+                 block_size: int = RANGE_BLOCK_SIZE):
+        super().__init__()
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._size = size
+        # IfMatch garantisce che tutti i blocchi provengano dalla stessa versione dell'oggetto
+        self._etag = etag
+        self._block_size = block_size
+        self._block = b''
+        self._block_start = -1
+        self._pos = 0
+        self.range_requests = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._pos + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError(f"whence non valido: {whence}")
+        if position < 0:
+            raise ValueError("Posizione negativa non consentita")
+        self._pos = position
+        return position
+
+    def _fetch_block(self, position: int) -> None:
+        # Vicino alla fine dell'oggetto il blocco viene allineato alla coda, così la
+        # lettura della central directory (EOCD + record) richiede di solito un solo GET
+        start = min(position, max(0, self._size - self._block_size))
+        end = min(start + self._block_size, self._size) - 1
+        params = {'Bucket': self._bucket, 'Key': self._key, 'Range': f'bytes={start}-{end}'}
+        if self._etag:
+            params['IfMatch'] = self._etag
+        self._block = self._client.get_object(**params)['Body'].read()
+        self._block_start = start
+        self.range_requests += 1
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._size - self._pos
+        chunks = []
+        while size > 0 and self._pos < self._size:
+            offset = self._pos - self._block_start
+            if self._block_start < 0 or offset < 0 or offset >= len(self._block):
+                self._fetch_block(self._pos)
+                offset = self._pos - self._block_start
+            data = self._block[offset:offset + size]
+            chunks.append(data)
+            self._pos += len(data)
+            size -= len(data)
+        return b''.join(chunks)
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class CountingReader(io.RawIOBase):
+    """Wrapper su uno stream in lettura che conta i byte letti (dati compressi dello stream tar)."""
+
+    def __init__(self, stream):
+        super().__init__()
+        self._stream = stream
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class RatioLimitedStream(io.RawIOBase):
+    """
+    Wrapper sullo stream decompresso di un file dell'archivio che conta i byte
+    letti e interrompe la lettura se il rapporto di compressione o il volume
+    totale estratto superano i limiti (protezione zip bomb in streaming).
+
+    Args:
+        stream: Stream decompresso del file
+        name: Nome del file nell'archivio (per i messaggi di errore)
+        max_bytes: Byte massimi per il file (ZIP: compress_size * MAX_COMPRESSION_RATIO), None se non applicabile
+        already_extracted: Byte già estratti dall'archivio prima di questo file
+        compressed_source: CountingReader sui dati compressi (tar): il rapporto viene
+            verificato sull'intero archivio, decompresso totale / compresso letto
+    """
+
+    def __init__(self, stream, name: str, max_bytes: int, already_extracted: int,
+                 compressed_source: CountingReader = None):
+        super().__init__()
+        self._stream = stream
+        self._name = name
+        self._already_extracted = already_extracted
+        self._max_bytes = max_bytes
+        self._compressed_source = compressed_source
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        if self._max_bytes is not None and self.bytes_read > self._max_bytes:
+            raise ValueError(
+                f"Rapporto di compressione oltre il limite ({MAX_COMPRESSION_RATIO}:1) "
+                f"per il file: '{self._name}'"
+            )
+        if self._compressed_source is not None:
+            # Tolleranza di un blocco: all'inizio dello stream il decompressore legge in anticipo
+            compressed = max(self._compressed_source.bytes_read, RANGE_BLOCK_SIZE)
+            if self._already_extracted + self.bytes_read > compressed * MAX_COMPRESSION_RATIO:
+                raise ValueError(
+                    f"Rapporto di compressione dell'archivio oltre il limite ({MAX_COMPRESSION_RATIO}:1) "
+                    f"al file: '{self._name}'"
+                )
+        if self._already_extracted + self.bytes_read > MAX_EXTRACTED_BYTES:
+            raise ValueError(f"Volume estratto oltre il limite di {MAX_EXTRACTED_BYTES} byte")
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class UploadPool:
+    """
+    Stadio di upload concorrente per i file estratti.
+
+    Il thread principale decomprime i file e li accoda con submit(); i worker
+    eseguono put_object in parallelo. submit() si blocca finché i byte in volo
+    non rientrano nel budget, quindi la memoria resta limitata a MAX_INFLIGHT_BYTES
+    più il file in lettura. Gli errori di upload vengono raccolti per singolo file
+    senza interrompere l'estrazione.
+    """
+
+    def __init__(self, client, bucket: str, workers: int = UPLOAD_WORKERS,
+                 max_inflight_bytes: int = MAX_INFLIGHT_BYTES):
+        self._client = client
+        self._bucket = bucket
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._max_inflight_bytes = max_inflight_bytes
+        self._inflight_bytes = 0
+        self._budget = threading.Condition()
+        self._futures = []
+
+    def submit(self, file_name: str, key: str, data: bytes, metadata: dict = None) -> None:
+        size = len(data)
+        with self._budget:
+            # Un file più grande dell'intero budget viene accettato quando non c'è altro in volo
+            while self._inflight_bytes > 0 and self._inflight_bytes + size > self._max_inflight_bytes:
+                self._budget.wait()
+            self._inflight_bytes += size
+        self._futures.append(self._executor.submit(self._put, file_name, key, data, metadata or {}))
+
+    def _put(self, file_name: str, key: str, data: bytes, metadata: dict) -> tuple:
+        try:
+            self._client.put_object(Bucket=self._bucket, Key=key, Body=data, Metadata=metadata)
+            return file_name, key, None
+        except Exception as e:
+            return file_name, key, str(e)
+        finally:
+            with self._budget:
+                self._inflight_bytes -= len(data)
+                self._budget.notify_all()
+
+    def wait(self) -> tuple:
+        """
+        Attende il completamento di tutti gli upload.
+
+        Returns:
+            Tupla (extracted_files, failed_files) nell'ordine di sottomissione
+        """
+        extracted_files = []
+        failed_files = []
+        try:
+            for future in self._futures:
+                file_name, key, error = future.result()
+                if error is None:
+                    extracted_files.append(key)
+                else:
+                    print(f"Upload fallito per {file_name}: {error}")
+                    failed_files.append({'file': file_name, 'error': error})
+        finally:
+            self._executor.shutdown(wait=True)
+        return extracted_files, failed_files
+
+
+def member_metadata(zip_info: zipfile.ZipInfo) -> dict:
+    """Metadata S3 salvati su ogni file estratto: CRC32 e dimensione dichiarati nell'archivio."""
+    return {'zip-crc32': f"{zip_info.CRC:08x}", 'zip-size': str(zip_info.file_size)}
+
+
+def member_output_key(base_dir: str, file_name: str) -> str:
+    """Costruisce la key S3 di destinazione per un file dell'archivio (path già validato)."""
+    safe_name = os.path.normpath(file_name).lstrip('/').replace('..', '').lstrip('/')
+    return f"{base_dir}/{safe_name}"
+
+
+def find_unchanged_members(bucket: str, base_dir: str, members: list) -> set:
+    """
+    Individua i file già estratti da una precedente esecuzione e non modificati.
+
+    Un solo listing del prefisso di destinazione individua le key esistenti con la
+    stessa dimensione; solo per queste viene eseguito head_object (in parallelo)
+    per confrontare il CRC32 salvato nei metadata con quello della central directory.
+
+    Returns:
+        Insieme dei nomi file (ZipInfo.filename) da non ricaricare
+    """
+    expected = {}
+    for zip_info in members:
+        if zip_info.is_dir():
+            continue
+        try:
+            safe_zip_extract_path(base_dir, zip_info.filename)
+        except ValueError:
+            continue
+        expected[member_output_key(base_dir, zip_info.filename)] = zip_info
+
+    candidates = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"{base_dir}/"):
+        for obj in page.get('Contents', []):
+            zip_info = expected.get(obj['Key'])
+            if zip_info is not None and obj['Size'] == zip_info.file_size:
+                candidates.append((obj['Key'], zip_info))
+    if not candidates:
+        return set()
+
+    def is_unchanged(candidate: tuple) -> bool:
+        key, zip_info = candidate
+        try:
+            metadata = s3_client.head_object(Bucket=bucket, Key=key).get('Metadata', {})
+        except ClientError:
+            return False
+        return metadata == member_metadata(zip_info)
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+        results = executor.map(is_unchanged, candidates)
+        return {zip_info.filename for (_, zip_info), unchanged in zip(candidates, results) if unchanged}
+
+
+def upload_multipart(stream, bucket: str, key: str, size: int, metadata: dict = None) -> None:
+    """
+    Decomprime un file dell'archivio a chunk direttamente in un multipart upload.
+    In memoria restano al massimo MULTIPART_CONCURRENCY + 1 parti; in caso di errore
+    (anche del RatioLimitedStream) l'upload viene annullato senza lasciare parti orfane.
+    """
+    with S3MultipartWriter(s3_client, bucket, key, part_size=MULTIPART_PART_SIZE,
+                           max_concurrency=MULTIPART_CONCURRENCY,
+                           expected_size=size,
+                           Metadata=metadata or {}) as writer:
+        while True:
+            chunk = stream.read(MULTIPART_PART_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+
+
+def check_compression_ratio(zip_info: zipfile.ZipInfo) -> None:
+    """
+    Verifica preliminare sui valori dichiarati nella central directory.
+
+    Raises:
+        ValueError: Se il rapporto dichiarato supera MAX_COMPRESSION_RATIO
+    """
+    if zip_info.file_size > max(zip_info.compress_size, 1) * MAX_COMPRESSION_RATIO:
+        raise ValueError(
+            f"Rapporto di compressione dichiarato oltre il limite ({MAX_COMPRESSION_RATIO}:1) "
+            f"per il file: '{zip_info.filename}'"
+        )
+
+
+def open_member_at(reader: S3RangeReader, zip_info: zipfile.ZipInfo) -> zipfile.ZipExtFile:
+    """
+    Apre un file dell'archivio a partire dai dati del manifest, senza rileggere la
+    central directory: legge il local file header a header_offset e restituisce
+    lo stream decompresso (con verifica CRC) posizionato sui dati compressi.
+
+    Raises:
+        zipfile.BadZipFile: Se il local header non è valido
+        RuntimeError: Se il file è cifrato
+    """
+    if zip_info.flag_bits & 0x1:
+        raise RuntimeError(f"File cifrato, password richiesta: '{zip_info.filename}'")
+    reader.seek(zip_info.header_offset)
+    header = reader.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader:
+        raise zipfile.BadZipFile(f"Local header troncato per il file: '{zip_info.filename}'")
+    fields = struct.unpack(zipfile.structFileHeader, header)
+    if fields[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Local header non valido per il file: '{zip_info.filename}'")
+    # Salta nome file ed extra field del local header
+    reader.seek(fields[10] + fields[11], io.SEEK_CUR)
+    return zipfile.ZipExtFile(reader, 'r', zip_info)
+
+
+def extract_members(open_member, members: list, bucket: str, base_dir: str,
+                    extracted_offset: int = 0, force: bool = False) -> dict:
+    """
+    Estrae una lista di file dell'archivio su S3.
+
+    Args:
+        open_member: Funzione che riceve uno ZipInfo e restituisce lo stream decompresso
+        members: ZipInfo da estrarre, ordinati per header_offset
+        bucket: Bucket di destinazione
+        base_dir: Prefisso di destinazione (extracted/<nome_zip>)
+        extracted_offset: Byte già estratti da altri shard (limite MAX_EXTRACTED_BYTES)
+        force: Se True ricarica anche i file già presenti con lo stesso CRC32
+
+    Returns:
+        Dizionario con extracted_files, unchanged_files, skipped_files, failed_files, extracted_bytes
+    """
+    unchanged_members = set() if force else find_unchanged_members(bucket, base_dir, members)
+    extracted_files = []
+    unchanged_files = []
+    skipped_files = []
+    failed_files = []
+    extracted_bytes = extracted_offset
+    upload_pool = UploadPool(s3_client, bucket)
+
+    try:
+        for zip_info in members:
+            file_name = zip_info.filename
+            # Skip directory entries
+            if zip_info.is_dir():
+                continue
+
+            # Protezione Zip Slip: valida il path prima di estrarre
+            try:
+                safe_zip_extract_path(base_dir, file_name)
+            except ValueError as e:
+                print(f"Zip Slip rilevato, file ignorato: {file_name} — {e}")
+                skipped_files.append(file_name)
+                continue
+
+            # Protezione zip bomb sui valori dichiarati
+            try:
+                check_compression_ratio(zip_info)
+            except ValueError as e:
+                print(f"File ignorato: {e}")
+                skipped_files.append(file_name)
+                continue
+
+            # Costruisci output key sicuro
+            output_key = member_output_key(base_dir, file_name)
+
+            # Estrazione incrementale: file già presente con stesso CRC32 e dimensione
+            if file_name in unchanged_members:
+                unchanged_files.append(output_key)
+                continue
+
+            try:
+                with open_member(zip_info) as member:
+                    stream = RatioLimitedStream(
+                        member, file_name, max(zip_info.compress_size, 1) * MAX_COMPRESSION_RATIO,
+                        extracted_bytes
+                    )
+                    if zip_info.file_size <= MULTIPART_THRESHOLD_BYTES:
+                        upload_pool.submit(file_name, output_key, stream.read(), member_metadata(zip_info))
+                    else:
+                        upload_multipart(stream, bucket, output_key, zip_info.file_size,
+                                         member_metadata(zip_info))
+                        extracted_files.append(output_key)
+            except ValueError as e:
+                print(f"File ignorato: {e}")
+                skipped_files.append(file_name)
+                continue
+            except zipfile.BadZipFile as e:
+                # CRC errato o dati corrotti su un singolo file: l'archivio resta valido
+                failed_files.append({'file': file_name, 'error': str(e)})
+                continue
+            except Exception as e:
+                print(f"Upload fallito per {file_name}: {e}")
+                failed_files.append({'file': file_name, 'error': str(e)})
+                continue
+            extracted_bytes += stream.bytes_read
+    finally:
+        pooled_files, pooled_failures = upload_pool.wait()
+    extracted_files.extend(pooled_files)
+    failed_files.extend(pooled_failures)
+
+    return {
+        'extracted_files': extracted_files,
+        'unchanged_files': unchanged_files,
+        'skipped_files': skipped_files,
+        'failed_files': failed_files,
+        'extracted_bytes': extracted_bytes - extracted_offset
+    }
+
+
+def detect_tar_format(key: str):
+    """
+    Riconosce un archivio tar dal suffisso della key.
+
+    Returns:
+        Tupla (suffisso, compressione) oppure None se non è un archivio tar
+    """
+    lower_key = key.lower()
+    for suffix, compression in TAR_SUFFIXES:
+        if lower_key.endswith(suffix):
+            return suffix, compression
+    return None
+
+
+def extract_tar(bucket: str, key: str, base_dir: str, compression: str) -> dict:
+    """
+    Estrae un archivio tar leggendo in sequenza il body di get_object.
+
+    Il tar è un formato sequenziale: lo stream S3 passa dal decompressore a tarfile
+    in modalità stream ('r|'), senza accesso casuale né file temporanei. Ogni file
+    viene letto una sola volta e caricato con UploadPool o multipart upload, quindi la
+    memoria resta costante. Sono estratti solo i file regolari; link e device vengono
+    ignorati e riportati in skipped_files.
+
+    Returns:
+        Dizionario con lo stesso formato di extract_members
+    """
+    body = s3_client.get_object(Bucket=bucket, Key=key)['Body']
+    compressed = CountingReader(body)
+    if compression == 'zst':
+        import zstandard
+        source = zstandard.ZstdDecompressor().stream_reader(compressed)
+        mode = 'r|'
+    else:
+        source = compressed
+        mode = f"r|{compression}"
+
+    extracted_files = []
+    skipped_files = []
+    failed_files = []
+    extracted_bytes = 0
+    upload_pool = UploadPool(s3_client, bucket)
+
+    try:
+        with tarfile.open(fileobj=source, mode=mode) as tar:
+            for member in tar:
+                # In modalità stream tarfile accumula i TarInfo letti: svuota la lista
+                tar.members = []
+                if member.isdir():
+                    continue
+                if not member.isfile():
+                    print(f"Elemento non regolare ignorato: {member.name}")
+                    skipped_files.append(member.name)
+                    continue
+
+                # Protezione path traversal (stessa logica dello Zip Slip)
+                try:
+                    safe_zip_extract_path(base_dir, member.name)
+                except ValueError as e:
+                    print(f"Path non sicuro, file ignorato: {member.name} — {e}")
+                    skipped_files.append(member.name)
+                    continue
+
+                output_key = member_output_key(base_dir, member.name)
+                stream = RatioLimitedStream(
+                    tar.extractfile(member), member.name, None, extracted_bytes, compressed
+                )
+                try:
+                    if member.size <= MULTIPART_THRESHOLD_BYTES:
+                        upload_pool.submit(member.name, output_key, stream.read())
+                    else:
+                        upload_multipart(stream, bucket, output_key, member.size)
+                        extracted_files.append(output_key)
+                except ValueError:
+                    # Limite di rapporto/volume superato: l'archivio non è affidabile, stop
+                    print(f"Estrazione interrotta al file {member.name}: limite zip bomb superato")
+                    skipped_files.append(member.name)
+                    break
+                except Exception as e:
+                    print(f"Upload fallito per {member.name}: {e}")
+                    failed_files.append({'file': member.name, 'error': str(e)})
+                extracted_bytes += stream.bytes_read
+    finally:
+        pooled_files, pooled_failures = upload_pool.wait()
+    extracted_files.extend(pooled_files)
+    failed_files.extend(pooled_failures)
+
+    return {
+        'extracted_files': extracted_files,
+        'unchanged_files': [],
+        'skipped_files': skipped_files,
+        'failed_files': failed_files,
+        'extracted_bytes': extracted_bytes
+    }
+
+
+def plan_shards(members: list) -> list:
+    """
+    Divide i file (ordinati per offset) in shard contigui di al massimo
+    SHARD_MAX_ENTRIES file e SHARD_MAX_BYTES byte decompressi dichiarati.
+
+    Returns:
+        Lista di tuple (start, end, extracted_offset) con indici su members
+    """
+    shards = []
+    start = 0
+    shard_bytes = 0
+    offset = 0
+    for index, zip_info in enumerate(members):
+        if index > start and (index - start >= SHARD_MAX_ENTRIES
+                              or shard_bytes + zip_info.file_size > SHARD_MAX_BYTES):
+            shards.append((start, index, offset))
+            offset += shard_bytes
+            start = index
+            shard_bytes = 0
+        shard_bytes += zip_info.file_size
+    if start < len(members):
+        shards.append((start, len(members), offset))
+    return shards
+
+
+def start_fanout(context, bucket: str, zip_key: str, head: dict, members: list,
+                 force: bool = False) -> dict:
+    """
+    Modalità coordinatore: salva un manifest per shard su S3 (i dati della central
+    directory già letta), registra il job su DynamoDB e invoca la Lambda in modo
+    asincrono per ogni shard. L'ultimo shard completato registra il log unico.
+
+    Se l'estrazione è già un job asincrono (run_queued_jobs) il fan-out usa lo stesso
+    job_id, così GET /jobs/{job_id} mostra l'avanzamento degli shard.
+    """
+    job_id = current_job_id()
+    shards = plan_shards(members)
+    jobs_table = dynamodb.Table(JOBS_TABLE)
+    fanout_fields = {
+        'zip_key': zip_key,
+        'bucket': bucket,
+        'entries': len(members),
+        'shards_total': len(shards),
+        'shards_done': 0
+    }
+    if job_id:
+        # Item già creato da enqueue_job: si aggiungono i campi del fan-out. Un retry
+        # del messaggio dopo l'avvio degli shard non deve azzerarne l'avanzamento.
+        try:
+            jobs_table.update_item(
+                Key={'job_id': job_id},
+                UpdateExpression='SET ' + ', '.join(f"{name} = :{name}" for name in fanout_fields),
+                ConditionExpression='attribute_not_exists(shards_total)',
+                ExpressionAttributeValues={f":{name}": value for name, value in fanout_fields.items()}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return api_response(202, {'message': 'Estrazione distribuita già avviata', 'job_id': job_id})
+    else:
+        job_id = uuid.uuid4().hex
+        jobs_table.put_item(Item={
+            'job_id': job_id,
+            'operation': 'extract_zip',
+            'status': 'RUNNING',
+            **fanout_fields,
+            'created_at': datetime.now().isoformat(),
+            'expires_at': int((datetime.now() + timedelta(days=JOB_TTL_DAYS)).timestamp())
+        })
+
+    for shard_index, (start, end, extracted_offset) in enumerate(shards):
+        manifest_key = f"{MANIFEST_PREFIX}/{job_id}/shard-{shard_index:05d}.json"
+        manifest = [
+            [info.filename, info.header_offset, info.compress_size, info.file_size,
+             info.CRC, info.compress_type, info.flag_bits]
+            for info in members[start:end]
+        ]
+        s3_client.put_object(Bucket=bucket, Key=manifest_key, Body=json.dumps(manifest).encode('utf-8'))
+        lambda_client.invoke(
+            FunctionName=context.invoked_function_arn,
+            InvocationType='Event',
+            Payload=json.dumps({
+                'mode': 'shard',
+                'job_id': job_id,
+                'shard': shard_index,
+                'bucket': bucket,
+                'key': zip_key,
+                'size': head['ContentLength'],
+                'etag': head.get('ETag'),
+                'manifest_key': manifest_key,
+                'extracted_offset': extracted_offset,
+                'force': force
+            }).encode('utf-8')
+        )
+
+    print(f"Job {job_id}: {len(members)} file divisi in {len(shards)} shard")
+    return api_response(202, {
+        'message': 'Estrazione distribuita avviata',
+        'job_id': job_id,
+        'entries': len(members),
+        'shards': len(shards)
+    })
+
+
+def process_shard(event: dict) -> dict:
+    """
+    Modalità shard: estrae i file elencati nel manifest e aggiorna il job.
+    """
+    bucket = event['bucket']
+    zip_key = event['key']
+    base_dir = f"extracted/{os.path.basename(zip_key).replace('.zip', '')}"
+
+    try:
+        manifest_obj = s3_client.get_object(Bucket=bucket, Key=event['manifest_key'])
+    except ClientError as e:
+        # Il manifest viene rimosso a fine shard: un retry arrivato dopo non ha nulla da fare
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            print(f"Manifest {event['manifest_key']} non trovato, shard già elaborato")
+            return api_response(200, {'job_id': event['job_id'], 'shard': event['shard']}, cors=False)
+        raise
+    members = []
+    for filename, header_offset, compress_size, file_size, crc, compress_type, flag_bits in \
+            json.loads(manifest_obj['Body'].read()):
+        zip_info = zipfile.ZipInfo(filename)
+        zip_info.header_offset = header_offset
+        zip_info.compress_size = compress_size
+        zip_info.file_size = file_size
+        zip_info.CRC = crc
+        zip_info.compress_type = compress_type
+        zip_info.flag_bits = flag_bits
+        members.append(zip_info)
+
+    reader = S3RangeReader(s3_client, bucket, zip_key, event['size'], event.get('etag'))
+    try:
+        report = extract_members(
+            lambda info: open_member_at(reader, info), members, bucket, base_dir,
+            event.get('extracted_offset', 0), event.get('force', False)
+        )
+    except Exception as e:
+        # Lo shard viene comunque conteggiato, così il job può chiudersi
+        print(f"Shard {event['shard']} fallito: {e}")
+        report = {'extracted_files': [], 'unchanged_files': [], 'skipped_files': [], 'extracted_bytes': 0,
+                  'failed_files': [{'file': f"shard-{event['shard']}", 'error': str(e)}]}
+
+    merge_shard_result(event, report)
+    s3_client.delete_object(Bucket=bucket, Key=event['manifest_key'])
+    return api_response(200, {
+        'job_id': event['job_id'],
+        'shard': event['shard'],
+        'count': len(report['extracted_files']),
+        'unchanged': len(report['unchanged_files']),
+        'skipped': len(report['skipped_files']),
+        'failed': len(report['failed_files'])
+    }, cors=False)
+
+
+def merge_shard_result(event: dict, report: dict) -> None:
+    """
+    Somma in modo atomico il risultato dello shard nel job. La condizione su
+    completed_shards rende idempotenti i retry delle invocazioni asincrone; lo shard
+    che porta shards_done a shards_total registra l'unico log_operation del job.
+    """
+    jobs_table = dynamodb.Table(JOBS_TABLE)
+    try:
+        job = jobs_table.update_item(
+            Key={'job_id': event['job_id']},
+            UpdateExpression=(
+                'ADD shards_done :one, completed_shards :shard, extracted_count :extracted, '
+                'unchanged_count :unchanged, skipped_count :skipped, failed_count :failed, '
+                'extracted_bytes :bytes '
+                'SET failed_files = list_append(if_not_exists(failed_files, :empty), :failed_sample)'
+            ),
+            ConditionExpression='attribute_exists(job_id) AND NOT contains(completed_shards, :shard_id)',
+            ExpressionAttributeValues={
+                ':one': 1,
+                ':shard': {str(event['shard'])},
+                ':shard_id': str(event['shard']),
+                ':extracted': len(report['extracted_files']),
+                ':unchanged': len(report['unchanged_files']),
+                ':skipped': len(report['skipped_files']),
+                ':failed': len(report['failed_files']),
+                ':bytes': report['extracted_bytes'],
+                ':empty': [],
+                ':failed_sample': report['failed_files'][:SHARD_FAILED_SAMPLE]
+            },
+            ReturnValues='ALL_NEW'
+        )['Attributes']
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Shard {event['shard']} del job {event['job_id']} già conteggiato")
+            return
+        raise
+
+    if job['shards_done'] < job['shards_total']:
+        return
+
+    status = 'success' if job.get('failed_count', 0) == 0 else 'error'
+    jobs_table.update_item(
+        Key={'job_id': event['job_id']},
+        UpdateExpression='SET #status = :status, completed_at = :completed_at',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={':status': 'COMPLETED', ':completed_at': datetime.now().isoformat()}
+    )
+    log_operation(
+        LOGS_TABLE,
+        'extract_zip',
+        {
+            'zip_key': job['zip_key'],
+            'job_id': event['job_id'],
+            'mode': 'fanout',
+            'shards': job['shards_total'],
+            'count': job.get('extracted_count', 0),
+            'unchanged_count': job.get('unchanged_count', 0),
+            'skipped_count': job.get('skipped_count', 0),
+            'failed_count': job.get('failed_count', 0),
+            'failed': job.get('failed_files', []),
+            'extracted_bytes': job.get('extracted_bytes', 0)
+        },
+        status
+    )
 
 
 def lambda_handler(event, context):
     """
-    Estrae file ZIP da S3 e carica i contenuti nella stessa directory.
+    Estrae file ZIP (o archivi tar: .tar, .tar.gz/.tgz, .tar.bz2, .tar.xz, .tar.zst)
+    da S3 e carica i contenuti nella stessa directory.
+
+    L'archivio non viene scaricato: la central directory e i singoli file vengono
+    letti con GET ranged (S3RangeReader) e ogni file viene decompresso in streaming
+    verso S3, quindi la memoria usata non dipende dalla dimensione dello ZIP.
+    Gli upload avvengono in parallelo (UploadPool); i file oltre MULTIPART_THRESHOLD_BYTES
+    vengono caricati con multipart upload a parti parallele. I file il cui upload
+    fallisce sono riportati in failed_files senza interrompere l'estrazione.
+
+    L'estrazione è incrementale: ogni file caricato riporta nei metadata CRC32 e
+    dimensione dichiarati nell'archivio, e alla riesecuzione (retry EventBridge,
+    nuovo upload dello stesso ZIP) i file con CRC invariato non vengono ricaricati.
+
+    Gli archivi tar vengono estratti in streaming dal body di get_object (extract_tar);
+    estrazione incrementale e modalità distribuita sono disponibili solo per ZIP.
+
+    Archivi con più di FANOUT_MIN_ENTRIES file (o con "fanout": true) vengono estratti
+    in modalità distribuita: la risposta è 202 con il job_id e l'avanzamento è
+    registrato nella tabella DynamoDB dei job.
 
     Input da API Gateway (body JSON):
     {
-        "zip_key": "path/to/file.zip",
-        "bucket": "bucket-name"  # opzionale, default BUCKET_NAME
+        "zip_key": "path/to/file.zip",   # oppure .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz, .tar.zst
+        "bucket": "bucket-name",  # opzionale, default BUCKET_NAME
+        "fanout": true,           # opzionale, forza (true) o disabilita (false) il fan-out
+        "force": false,           # opzionale, ricarica anche i file non modificati
+        "async": false            # opzionale, esegue come job e risponde 202 con job_id
     }
 
     Input da EventBridge:
@@ -31,6 +849,11 @@ def lambda_handler(event, context):
         "key": "path/to/file.zip"
     }
     """
+    if event.get('mode') == 'shard':
+        return process_shard(event)
+    if is_job_queue_event(event):
+        return run_queued_jobs(event, context, JOBS_TABLE, lambda_handler)
+
     zip_key = None
     try:
         # Parse input — supporta sia API Gateway che EventBridge
@@ -38,55 +861,61 @@ def lambda_handler(event, context):
             body = json.loads(event['body'])
             bucket = body.get('bucket', BUCKET_NAME)
             zip_key = body.get('zip_key')
+            fanout = body.get('fanout')
+            force = bool(body.get('force', False))
         else:
             bucket = event.get('bucket', BUCKET_NAME)
             zip_key = event.get('key')
+            fanout = None
+            force = False
 
         if not zip_key:
             return api_response(400, {'error': 'zip_key is required'})
 
-        # Verifica dimensione prima di scaricare
-        head = s3_client.head_object(Bucket=bucket, Key=zip_key)
-        if head['ContentLength'] > MAX_ZIP_SIZE_BYTES:
-            return api_response(400, {
-                'error': f'File ZIP troppo grande. Massimo consentito: {MAX_ZIP_SIZE_BYTES // (1024*1024)} MB'
-            })
-
-        # Scarica ZIP da S3
-        zip_obj = s3_client.get_object(Bucket=bucket, Key=zip_key)
-        buffer = io.BytesIO(zip_obj['Body'].read())
-
-        # Directory di destinazione base (usata per la protezione Zip Slip)
-        base_dir = f"extracted/{os.path.basename(zip_key).replace('.zip', '')}"
+        if 'body' in event and body.get('async') and JOBS_TABLE:
+            return enqueue_job(JOBS_TABLE, 'extract_zip', body)
 
-        extracted_files = []
-        skipped_files = []
-
-        with zipfile.ZipFile(buffer) as zip_file:
-            for file_name in zip_file.namelist():
-                # Skip directory entries
-                if file_name.endswith('/'):
-                    continue
-
-                # Protezione Zip Slip: valida il path prima di estrarre
+        tar_format = detect_tar_format(zip_key)
+        if tar_format is not None:
+            suffix, compression = tar_format
+            base_dir = f"extracted/{os.path.basename(zip_key)[:-len(suffix)]}"
+            if compression == 'zst':
                 try:
-                    safe_zip_extract_path(base_dir, file_name)
-                except ValueError as e:
-                    print(f"Zip Slip rilevato, file ignorato: {file_name} — {e}")
-                    skipped_files.append(file_name)
-                    continue
+                    import zstandard  # noqa: F401
+                except ImportError:
+                    error_msg = 'zstandard non trovato. Aggiungere un Lambda Layer con zstandard installato.'
+                    log_operation(LOGS_TABLE, 'extract_zip', {'error': error_msg, 'zip_key': zip_key}, 'error')
+                    return api_response(500, {
+                        'error': error_msg,
+                        'suggestion': 'Creare un layer con: pip install zstandard -t python/ && zip -r layer.zip python/; poi impostare TF_VAR_lambda_layer_arns_extract=["arn:..."] e rieseguire terraform apply.'
+                    })
+            report = extract_tar(bucket, zip_key, base_dir, compression)
+            range_requests = 0
+        else:
+            head = s3_client.head_object(Bucket=bucket, Key=zip_key)
+            reader = S3RangeReader(s3_client, bucket, zip_key, head['ContentLength'], head.get('ETag'))
 
-                # Costruisci output key sicuro
-                safe_name = os.path.normpath(file_name).lstrip('/').replace('..', '').lstrip('/')
-                output_key = f"{base_dir}/{safe_name}"
+            # Directory di destinazione base (usata per la protezione Zip Slip)
+            base_dir = f"extracted/{os.path.basename(zip_key).replace('.zip', '')}"
 
-                file_data = zip_file.read(file_name)
-                s3_client.put_object(
-                    Bucket=bucket,
-                    Key=output_key,
-                    Body=file_data
+            with zipfile.ZipFile(reader) as zip_file:
+                # Ordina per offset nell'archivio: le letture ranged procedono in avanti
+                members = sorted(
+                    (info for info in zip_file.infolist() if not info.is_dir()),
+                    key=lambda info: info.header_offset
                 )
-                extracted_files.append(output_key)
+                if fanout is None:
+                    fanout = len(members) > FANOUT_MIN_ENTRIES
+                if fanout and JOBS_TABLE and context is not None:
+                    return start_fanout(context, bucket, zip_key, head, members, force)
+
+                report = extract_members(zip_file.open, members, bucket, base_dir, force=force)
+            range_requests = reader.range_requests
+
+        extracted_files = report['extracted_files']
+        unchanged_files = report['unchanged_files']
+        skipped_files = report['skipped_files']
+        failed_files = report['failed_files']
 
         log_operation(
             LOGS_TABLE,
@@ -95,7 +924,11 @@ def lambda_handler(event, context):
                 'zip_key': zip_key,
                 'extracted_files': extracted_files,
                 'count': len(extracted_files),
-                'skipped': skipped_files
+                'unchanged_count': len(unchanged_files),
+                'skipped': skipped_files,
+                'failed': failed_files,
+                'extracted_bytes': report['extracted_bytes'],
+                'range_requests': range_requests
             }
         )
 
@@ -103,12 +936,23 @@ def lambda_handler(event, context):
             'message': 'ZIP extracted successfully',
             'extracted_files': extracted_files,
             'count': len(extracted_files),
-            'skipped_files': skipped_files
+            'unchanged_files': unchanged_files,
+            'skipped_files': skipped_files,
+            'failed_files': failed_files,
+            'counts': {
+                'extracted': len(extracted_files),
+                'unchanged': len(unchanged_files),
+                'skipped': len(skipped_files),
+                'failed': len(failed_files)
+            }
         })
 
     except zipfile.BadZipFile:
         log_operation(LOGS_TABLE, 'extract_zip', {'error': 'Invalid ZIP file', 'zip_key': zip_key or 'unknown'}, 'error')
         return api_response(400, {'error': 'Invalid ZIP file'})
+    except tarfile.TarError as e:
+        log_operation(LOGS_TABLE, 'extract_zip', {'error': f'Invalid TAR archive: {e}', 'zip_key': zip_key or 'unknown'}, 'error')
+        return api_response(400, {'error': 'Invalid TAR archive'})
     except Exception as e:
         log_operation(LOGS_TABLE, 'extract_zip', {'error': str(e)}, 'error')
         return api_response(500, {'error': str(e)})
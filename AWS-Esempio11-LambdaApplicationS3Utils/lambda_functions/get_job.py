@@ -0,0 +1,46 @@
+import json
+import boto3
+import os
+
+from utils import log_operation, api_response
+
+dynamodb = boto3.resource('dynamodb')
+
+JOBS_TABLE = os.environ['DYNAMODB_JOBS_TABLE']
+LOGS_TABLE = os.environ['DYNAMODB_LOGS_TABLE']
+
+# Campi interni del job non restituiti al client
+HIDDEN_FIELDS = ('request', 'expires_at', 'completed_shards')
+
+
+def lambda_handler(event, context):
+    """
+    Restituisce lo stato di un job asincrono (GET /jobs/{job_id}).
+
+    Stati: QUEUED, RUNNING, COMPLETED, FAILED. A job concluso "result" contiene
+    il body che l'operazione avrebbe restituito in modalità sincrona.
+    """
+    try:
+        job_id = (event.get('pathParameters') or {}).get('job_id')
+        if not job_id:
+            return api_response(400, {'error': 'job_id is required'})
+
+        job = dynamodb.Table(JOBS_TABLE).get_item(Key={'job_id': job_id}).get('Item')
+        if not job:
+            return api_response(404, {'error': f'Job {job_id} non trovato'})
+
+        response = {}
+        for name, value in job.items():
+            if name in HIDDEN_FIELDS:
+                continue
+            if name == 'result':
+                value = json.loads(value)
+            elif isinstance(value, set):
+                value = sorted(value)
+            response[name] = value
+
+        return api_response(200, response)
+
+    except Exception as e:
+        log_operation(LOGS_TABLE, 'get_job', {'error': str(e)}, 'error')
+        return api_response(500, {'error': str(e)})
@@ -1,8 +1,23 @@
+import base64
+import csv
+import gzip
+import hashlib
+import io
 import json
 import boto3
 import os
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
-from utils import log_operation, api_response, validate_table_name
+from utils import (
+    log_operation, api_response, api_binary_response, validate_table_name, validate_column_name,
+    acquire_read_connection, release_mysql_connection, mysql_pool_stats, table_version,
+    table_written_within
+)
+
+dynamodb = boto3.resource('dynamodb')
 
 BUCKET_NAME = os.environ['BUCKET_NAME']
 LOGS_TABLE = os.environ['DYNAMODB_LOGS_TABLE']
@@ -14,10 +29,357 @@ DB_PASSWORD = os.environ.get('DB_PASSWORD', '')
 DB_DATABASE = os.environ.get('DB_DATABASE', '')
 DB_PORT = int(os.environ.get('DB_PORT', '3306'))
 
+# Repliche Aurora in lettura (host separati da virgola, vuoto = solo writer) e finestra
+# read-your-writes: per RDS_READ_YOUR_WRITES_SECONDS dopo un import la tabella si legge dal writer
+DB_READER_HOSTS = [host for host in os.environ.get('DB_READER_HOSTS', '').split(',') if host]
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('RDS_READ_YOUR_WRITES_SECONDS', '10'))
+IMPORTS_TABLE = os.environ.get('DYNAMODB_IMPORTS_TABLE', '')
+
+# Righe massime per pagina
+MAX_LIMIT = 1000
+
+# Versione del formato di next_cursor (token base64 opaco per il client)
+CURSOR_VERSION = 1
+
+# Metadati delle tabelle (esistenza, chiave primaria, righe stimate) riusati tra
+# invocazioni calde per RDS_METADATA_TTL_SECONDS; errore MySQL "tabella inesistente"
+METADATA_TTL_SECONDS = int(os.environ.get('RDS_METADATA_TTL_SECONDS', '300'))
+NO_SUCH_TABLE_ERROR = 1146
+COUNT_MODES = ('approx', 'exact', 'none')
+_table_metadata = {}
+
+# Filtri in query string: filter.<colonna>=<valore> (uguaglianza) oppure
+# filter.<colonna>.<operatore>=<valore>; operatore → operatore SQL
+FILTER_PREFIX = 'filter.'
+FILTER_OPERATORS = {'eq': '=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+MAX_FILTERS = 20
+BAD_FIELD_ERROR = 1054
+
+# Formati della risposta: righe JSON, JSON per colonne o CSV compresso gzip
+RESPONSE_FORMATS = ('rows', 'columns', 'csv')
+CSV_GZIP_LEVEL = 6
+
+# Tipi restituiti da pymysql già serializzabili in JSON
+JSON_NATIVE_TYPES = frozenset((str, int, float, bool, type(None)))
+
+# Cache dei risultati, valida finché la versione della tabella (incrementata da
+# upload_to_rds) non cambia: LRU in memoria per istanza Lambda e, se configurata, tabella
+# DynamoDB condivisa tra le istanze. RDS_RESULT_CACHE_ENTRIES = 0 disattiva la cache.
+RESULT_CACHE_ENTRIES = int(os.environ.get('RDS_RESULT_CACHE_ENTRIES', '64'))
+RESULTS_TABLE = os.environ.get('DYNAMODB_RESULTS_TABLE', '')
+RESULT_SHARED_MAX_BYTES = 300 * 1024
+RESULT_SHARED_TTL_HOURS = 24
+_result_cache = OrderedDict()
+
+
+def encode_cursor_value(value):
+    """Valore di una colonna nel cursore, con tipo esplicito per i tipi non JSON."""
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, timedelta):
+        return {'td': value.total_seconds()}
+    if isinstance(value, bytes):
+        return {'b': base64.b64encode(value).decode('ascii')}
+    return value
+
+
+def decode_cursor_value(value):
+    """Inverso di encode_cursor_value: il valore torna come parametro bind del tipo originale."""
+    if not isinstance(value, dict):
+        return value
+    (tag, raw), = value.items()
+    decoders = {
+        'dec': Decimal,
+        'dt': datetime.fromisoformat,
+        'd': date.fromisoformat,
+        'td': lambda seconds: timedelta(seconds=seconds),
+        'b': base64.b64decode,
+    }
+    return decoders[tag](raw)
+
+
+def encode_cursor(state: dict) -> str:
+    """Serializza lo stato della paginazione in un token opaco (base64 URL-safe)."""
+    raw = json.dumps(dict(state, v=CURSOR_VERSION), separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str, order_by: str, order_dir: str, filters_key: str = None) -> dict:
+    """
+    Decodifica un token di encode_cursor() emesso per lo stesso ordinamento e gli stessi filtri.
+
+    Raises:
+        ValueError: se il token non è valido o è stato emesso per un'altra query
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        state = json.loads(raw)
+        if state.get('v') != CURSOR_VERSION:
+            raise ValueError
+        if 'k' in state:
+            state['k'] = [decode_cursor_value(value) for value in state['k']]
+        elif not isinstance(state.get('o'), int) or state['o'] < 0:
+            raise ValueError
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError('cursor non valido')
+    if state.get('ob') != order_by or state.get('d') != order_dir:
+        raise ValueError('cursor emesso per un ordinamento diverso: ripetere order_by e order_dir della prima pagina')
+    if state.get('f') != filters_key:
+        raise ValueError('cursor emesso per filtri diversi: ripetere i filtri della prima pagina')
+    return state
+
+
+def parse_columns(raw: str) -> list:
+    """
+    Colonne della proiezione `columns` (separate da virgola), senza duplicati.
+
+    Raises:
+        ValueError: se un nome colonna non è valido o la lista è vuota
+    """
+    columns = []
+    for name in raw.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        try:
+            column = validate_column_name(name)
+        except ValueError:
+            raise ValueError(f"Colonna non valida in columns: '{name}'")
+        if column not in columns:
+            columns.append(column)
+    if not columns:
+        raise ValueError('columns deve contenere almeno una colonna')
+    return columns
+
+
+def parse_filters(params: dict) -> list:
+    """
+    Filtri dai parametri filter.<colonna>[.<operatore>]=<valore>, in ordine stabile:
+    la stessa query produce sempre la stessa lista (e lo stesso filters_key del cursore).
+
+    Returns:
+        Lista di tuple (colonna, operatore, valore)
+
+    Raises:
+        ValueError: se colonna o operatore non sono validi
+    """
+    filters = []
+    for name, value in params.items():
+        if not name.startswith(FILTER_PREFIX):
+            continue
+        column, _, operator = name[len(FILTER_PREFIX):].partition('.')
+        operator = operator or 'eq'
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Operatore non valido in '{name}': usare uno tra {', '.join(FILTER_OPERATORS)}")
+        try:
+            column = validate_column_name(column)
+        except ValueError:
+            raise ValueError(f"Colonna non valida nel filtro '{name}'")
+        filters.append((column, operator, value))
+    if len(filters) > MAX_FILTERS:
+        raise ValueError(f'Massimo {MAX_FILTERS} filtri per richiesta')
+    return sorted(filters)
+
+
+def filter_conditions(filters: list) -> tuple:
+    """
+    Condizioni WHERE dei filtri: i nomi colonna sono validati, i valori passano solo
+    come parametri bind. MySQL converte la stringa nel tipo della colonna, quindi
+    gli indici restano utilizzabili anche per numeri e date.
+
+    Returns:
+        Tupla (lista di condizioni SQL, parametri)
+    """
+    conditions = [f"`{column}` {FILTER_OPERATORS[operator]} %s" for column, operator, _ in filters]
+    return conditions, [value for _, _, value in filters]
+
+
+def filters_key(filters: list):
+    """Impronta dei filtri salvata nel cursore (None senza filtri)."""
+    if not filters:
+        return None
+    return hashlib.sha256(json.dumps(filters).encode('utf-8')).hexdigest()[:16]
+
+
+def json_columns(columns: list) -> list:
+    """
+    Rende serializzabili in JSON i valori colonna per colonna: le colonne con soli tipi
+    nativi (la maggior parte) passano invariate, nelle altre DECIMAL, date, timestamp
+    e binari diventano stringhe.
+    """
+    converted = []
+    for values in columns:
+        if JSON_NATIVE_TYPES.issuperset(map(type, values)):
+            converted.append(list(values))
+        else:
+            converted.append([v if type(v) in JSON_NATIVE_TYPES else str(v) for v in values])
+    return converted
+
+
+def result_cache_key(table_name: str, version: int, query: str, params: list, count_query: str) -> str:
+    """
+    Chiave della cache: la query normalizzata (SQL generato dai parametri già validati e
+    ordinati, con i valori bind tipizzati) e la versione della tabella. Dopo un import la
+    versione cambia e le voci precedenti non vengono più lette.
+    """
+    normalized = json.dumps(
+        [DB_DATABASE, table_name, version, query, [encode_cursor_value(p) for p in params], count_query],
+        separators=(',', ':')
+    )
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def remember_result(cache_key: str, result) -> None:
+    """Inserisce il risultato nella LRU in memoria, eliminando le voci meno recenti oltre il limite."""
+    _result_cache[cache_key] = result
+    _result_cache.move_to_end(cache_key)
+    while len(_result_cache) > RESULT_CACHE_ENTRIES:
+        _result_cache.popitem(last=False)
+
+
+def cached_result(cache_key: str) -> tuple:
+    """
+    Cerca il risultato nella LRU in memoria, poi nella tabella condivisa (se configurata);
+    un risultato trovato nella tabella condivisa viene copiato nella LRU.
+
+    Returns:
+        Tupla (risultato (names, rows, total) o None, livello: memory, shared o miss)
+    """
+    result = _result_cache.get(cache_key)
+    if result is not None:
+        _result_cache.move_to_end(cache_key)
+        return result, 'memory'
+    if RESULTS_TABLE:
+        try:
+            item = dynamodb.Table(RESULTS_TABLE).get_item(Key={'cache_key': cache_key}).get('Item')
+        except Exception as e:
+            print(f"Errore lettura cache risultati: {e}")
+            item = None
+        if item:
+            result = json.loads(gzip.decompress(bytes(item['result'])), object_hook=decode_cursor_value)
+            remember_result(cache_key, result)
+            return result, 'shared'
+    return None, 'miss'
+
+
+def store_result(cache_key: str, table_name: str, version: int, result) -> None:
+    """
+    Salva il risultato nella LRU e nella tabella condivisa, se configurata. Nella tabella
+    condivisa va compresso (item DynamoDB max 400 KB): i risultati più grandi di
+    RESULT_SHARED_MAX_BYTES restano solo in memoria. Il TTL serve solo a eliminare
+    le voci di versioni superate.
+    """
+    remember_result(cache_key, result)
+    if not RESULTS_TABLE:
+        return
+    try:
+        data = gzip.compress(
+            json.dumps(result, default=encode_cursor_value, separators=(',', ':')).encode('utf-8')
+        )
+        if len(data) > RESULT_SHARED_MAX_BYTES:
+            return
+        dynamodb.Table(RESULTS_TABLE).put_item(
+            Item={
+                'cache_key': cache_key,
+                'table_name': table_name,
+                'version': version,
+                'result': data,
+                'expires_at': int((datetime.now() + timedelta(hours=RESULT_SHARED_TTL_HOURS)).timestamp())
+            }
+        )
+    except Exception as e:
+        print(f"Errore scrittura cache risultati: {e}")
+
+
+def gzip_csv(names: list, rows) -> bytes:
+    """CSV con intestazione compresso gzip; i NULL diventano campi vuoti."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=CSV_GZIP_LEVEL) as compressed:
+        text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(names)
+        writer.writerows(rows)
+        text.flush()
+        text.detach()
+    return buffer.getvalue()
+
+
+def table_metadata(cursor, table_name: str):
+    """
+    Metadati della tabella con cache in memoria (TTL METADATA_TTL_SECONDS): una sola
+    query su information_schema invece di una per richiesta. Le tabelle inesistenti
+    non vengono messe in cache, così una tabella appena creata è subito visibile.
+
+    Returns:
+        Dizionario {primary_key: [colonne], approx_rows: stima di InnoDB} o None
+    """
+    cached = _table_metadata.get(table_name)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    cursor.execute(
+        "SELECT t.TABLE_ROWS AS approx_rows, s.COLUMN_NAME AS pk_column "
+        "FROM information_schema.TABLES t "
+        "LEFT JOIN information_schema.STATISTICS s ON s.TABLE_SCHEMA = t.TABLE_SCHEMA "
+        "AND s.TABLE_NAME = t.TABLE_NAME AND s.INDEX_NAME = 'PRIMARY' "
+        "WHERE t.TABLE_SCHEMA = %s AND t.TABLE_NAME = %s "
+        "ORDER BY s.SEQ_IN_INDEX",
+        (DB_DATABASE, table_name)
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        _table_metadata.pop(table_name, None)
+        return None
+    metadata = {
+        'primary_key': [row['pk_column'] for row in rows if row['pk_column']],
+        'approx_rows': int(rows[0]['approx_rows'] or 0)
+    }
+    _table_metadata[table_name] = (time.monotonic() + METADATA_TTL_SECONDS, metadata)
+    return metadata
+
+
+def seek_condition(key_columns: list, order_dir: str, last_values: list) -> tuple:
+    """
+    Condizione WHERE che seleziona le righe successive a last_values nell'ordinamento
+    (key_columns, order_dir): la colonna order_by seguita dalla chiave primaria.
+
+    MySQL ordina i NULL come i valori più piccoli (primi in ASC, ultimi in DESC); solo
+    la prima colonna può essere NULL, le colonne della chiave primaria no.
+
+    Returns:
+        Tupla (condizione SQL, parametri)
+    """
+    op = '>' if order_dir == 'ASC' else '<'
+    first, rest = key_columns[0], key_columns[1:]
+    first_value, rest_values = last_values[0], list(last_values[1:])
+    tie_sql = None
+    if rest:
+        columns = ', '.join([f"`{c}`" for c in rest])
+        placeholders = ', '.join(['%s'] * len(rest))
+        tie_sql = f"({columns}) {op} ({placeholders})"
+
+    if first_value is None:
+        if order_dir == 'ASC':
+            return f"((`{first}` IS NULL AND {tie_sql}) OR `{first}` IS NOT NULL)", rest_values
+        return f"(`{first}` IS NULL AND {tie_sql})", rest_values
+
+    conditions = [f"`{first}` {op} %s"]
+    params = [first_value]
+    if tie_sql:
+        conditions.append(f"(`{first}` = %s AND {tie_sql})")
+        params += [first_value] + rest_values
+    if order_dir == 'DESC':
+        conditions.append(f"`{first}` IS NULL")
+    return f"({' OR '.join(conditions)})", params
+
 
 def lambda_handler(event, context):
     """
-    Legge i dati da una tabella RDS Aurora MySQL e li restituisce in JSON.
+    Legge i dati da una tabella RDS Aurora MySQL e li restituisce in JSON o CSV.
 
     NOTA: Richiede Lambda Layer con pymysql. Specificare l'ARN in var.lambda_layer_arns_rds
     La Lambda deve essere in VPC per raggiungere RDS Aurora.
@@ -25,30 +387,52 @@ def lambda_handler(event, context):
     Query parameters:
     - table_name: nome della tabella da leggere (required, solo alfanumerico + underscore)
     - limit:      numero massimo di righe (default: 100, max: 1000)
-    - offset:     offset per paginazione (default: 0)
+    - cursor:     next_cursor della pagina precedente (paginazione keyset)
+    - offset:     offset per paginazione (solo retrocompatibilità, lento sulle pagine profonde)
     - order_by:   colonna per ordinamento (opzionale, default: id)
     - order_dir:  direzione ordinamento: ASC o DESC (default: DESC)
+    - count:      total_rows stimato dalle statistiche InnoDB (approx, default),
+                  COUNT(*) esatto (exact) o omesso (none)
+    - columns:    colonne da restituire separate da virgola (default: tutte)
+    - filter.<colonna>[.<op>]: filtro sulla colonna, op tra eq (default), gt, gte, lt, lte
+    - format:     rows (default, lista di oggetti), columns (un array per colonna)
+                  o csv (CSV gzip, metadati di paginazione negli header X-*)
+
+    Senza offset la paginazione è keyset: le pagine successive partono dall'ultima
+    riga restituita (order_by più chiave primaria) invece di scartare `offset` righe,
+    quindi il costo non cresce con la profondità della pagina. next_cursor è null
+    sull'ultima pagina.
     """
     try:
         params = event.get('queryStringParameters', {}) or {}
         table_name_raw = params.get('table_name', '')
-        limit = min(int(params.get('limit', 100)), 1000)
+        limit_raw = params.get('limit', '100')
         offset = max(int(params.get('offset', 0)), 0)
+        cursor_token = params.get('cursor')
         order_by_raw = params.get('order_by', 'id')
         order_dir = params.get('order_dir', 'DESC').upper()
+        count_mode = params.get('count', 'approx').lower()
+        response_format = params.get('format', 'rows').lower()
 
         if not table_name_raw:
             return api_response(400, {'error': 'Il parametro "table_name" è obbligatorio'})
 
+        try:
+            limit = int(limit_raw)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_LIMIT:
+            return api_response(400, {'error': f"limit deve essere un intero tra 1 e {MAX_LIMIT}"})
+
         # Valida nome tabella per prevenire SQL injection
         try:
             table_name = validate_table_name(table_name_raw)
         except ValueError as e:
             return api_response(400, {'error': str(e)})
 
-        # Valida order_by (solo alfanumerico + underscore, come i nomi colonna)
+        # Valida order_by (solo alfanumerico + underscore)
         try:
-            order_by = validate_table_name(order_by_raw)
+            order_by = validate_column_name(order_by_raw)
         except ValueError:
             return api_response(400, {'error': f"order_by non valido: '{order_by_raw}'"})
 
@@ -56,6 +440,30 @@ def lambda_handler(event, context):
         if order_dir not in ('ASC', 'DESC'):
             return api_response(400, {'error': 'order_dir deve essere ASC o DESC'})
 
+        if count_mode not in COUNT_MODES:
+            return api_response(400, {'error': f"count deve essere uno tra: {', '.join(COUNT_MODES)}"})
+
+        if response_format not in RESPONSE_FORMATS:
+            return api_response(400, {'error': f"format deve essere uno tra: {', '.join(RESPONSE_FORMATS)}"})
+
+        # Proiezione e filtri: nomi colonna validati come order_by, valori solo come parametri bind
+        try:
+            columns = parse_columns(params['columns']) if 'columns' in params else None
+            filters = parse_filters(params)
+        except ValueError as e:
+            return api_response(400, {'error': str(e)})
+
+        if cursor_token and 'offset' in params:
+            return api_response(400, {'error': 'Usare cursor oppure offset, non entrambi'})
+        page_state = {}
+        if cursor_token:
+            try:
+                page_state = decode_cursor(cursor_token, order_by, order_dir, filters_key(filters))
+            except ValueError as e:
+                return api_response(400, {'error': str(e)})
+            offset = page_state.get('o', 0)
+        use_offset = 'offset' in params or 'o' in page_state
+
         if not DB_HOST:
             return api_response(500, {'error': 'Credenziali RDS non configurate (DB_HOST vuoto). Impostare create_rds = true.'})
 
@@ -69,48 +477,139 @@ def lambda_handler(event, context):
                 'suggestion': 'Creare un layer con: pip install pymysql -t python/ && zip -r layer.zip python/'
             })
 
-        connection = pymysql.connect(
+        # Letture sulle repliche, tranne subito dopo un import della tabella (read-your-writes)
+        reader_hosts = DB_READER_HOSTS
+        if reader_hosts and READ_YOUR_WRITES_SECONDS > 0 and IMPORTS_TABLE and \
+                table_written_within(IMPORTS_TABLE, table_name, READ_YOUR_WRITES_SECONDS):
+            reader_hosts = []
+
+        # Connessione riusata tra invocazioni calde (ping e riconnessione se scaduta)
+        connection, db_host, db_role = acquire_read_connection(
+            pymysql,
+            reader_hosts,
             host=DB_HOST,
             user=DB_USERNAME,
             password=DB_PASSWORD,
             database=DB_DATABASE,
             port=DB_PORT,
             connect_timeout=10,
+            autocommit=True,
             cursorclass=pymysql.cursors.DictCursor
         )
 
         try:
             cursor = connection.cursor()
+            # Le righe dei dati arrivano come tuple: niente dizionario per riga
+            data_cursor = connection.cursor(pymysql.cursors.Cursor)
 
-            # Verifica che la tabella esista
-            cursor.execute(
-                "SELECT COUNT(*) AS cnt FROM information_schema.tables "
-                "WHERE table_schema = %s AND table_name = %s",
-                (DB_DATABASE, table_name)
-            )
-            if cursor.fetchone()['cnt'] == 0:
+            # Verifica che la tabella esista (metadati in cache)
+            metadata = table_metadata(cursor, table_name)
+            if metadata is None:
                 return api_response(404, {
                     'error': f"Tabella '{table_name}' non trovata nel database '{DB_DATABASE}'"
                 })
 
-            # Conta righe totali
-            cursor.execute(f"SELECT COUNT(*) AS total FROM `{table_name}`")
-            total_rows = cursor.fetchone()['total']
+            # Ordinamento univoco: order_by seguita dalla chiave primaria come spareggio
+            primary_key = metadata['primary_key']
+            key_columns = [order_by] + [c for c in primary_key if c != order_by]
+            if not primary_key:
+                # Senza chiave primaria la paginazione keyset non è possibile
+                use_offset = True
+                key_columns = [order_by]
+
+            # Con una proiezione si leggono comunque le colonne dell'ordinamento,
+            # necessarie per next_cursor, e si tolgono dalla risposta
+            select_clause = '*'
+            if columns:
+                select_columns = columns + [c for c in key_columns if c not in columns]
+                select_clause = ', '.join([f"`{c}`" for c in select_columns])
+
+            # Leggi dati con paginazione — nomi tabella e colonna già validati.
+            # Una riga in più del limite indica se esiste una pagina successiva.
+            order_clause = ', '.join([f"`{c}` {order_dir}" for c in key_columns])
+            filter_sql, filter_params = filter_conditions(filters)
+            conditions = list(filter_sql)
+            query_params = list(filter_params)
+            if use_offset:
+                limit_clause = 'LIMIT %s OFFSET %s'
+                limit_params = [limit + 1, offset]
+            else:
+                limit_clause = 'LIMIT %s'
+                limit_params = [limit + 1]
+                if 'k' in page_state:
+                    if len(page_state['k']) != len(key_columns):
+                        return api_response(400, {'error': 'cursor non valido'})
+                    condition, seek_params = seek_condition(key_columns, order_dir, page_state['k'])
+                    conditions.append(condition)
+                    query_params += seek_params
+            where_clause = f"WHERE {' AND '.join(conditions)} " if conditions else ''
+            query = f"SELECT {select_clause} FROM `{table_name}` {where_clause}ORDER BY {order_clause} {limit_clause}"
+
+            query_params += limit_params
+
+            # Il COUNT(*) esatto scansiona un indice intero: solo se richiesto.
+            # La stima di InnoDB vale per l'intera tabella, non per i filtri.
+            count_query = None
+            if count_mode == 'exact':
+                count_where = f"WHERE {' AND '.join(filter_sql)}" if filters else ''
+                count_query = f"SELECT COUNT(*) AS total FROM `{table_name}` {count_where}"
 
-            # Leggi dati con paginazione — nomi tabella e colonna già validati
-            query = f"SELECT * FROM `{table_name}` ORDER BY `{order_by}` {order_dir} LIMIT %s OFFSET %s"
-            cursor.execute(query, (limit, offset))
-            rows = cursor.fetchall()
+            # Cache solo per le tabelle con una versione, cioè scritte da upload_to_rds
+            version = table_version(cursor, table_name) if RESULT_CACHE_ENTRIES > 0 else None
+            cache_key = None
+            cache_status = 'off'
+            result = None
+            if version is not None:
+                cache_key = result_cache_key(table_name, version, query, query_params, count_query)
+                result, cache_status = cached_result(cache_key)
 
-            # Converti valori non serializzabili in stringhe
-            for row in rows:
-                for key, value in row.items():
-                    if not isinstance(value, (str, int, float, bool, type(None))):
-                        row[key] = str(value)
+            if result is None:
+                exact_total = None
+                try:
+                    if count_query:
+                        cursor.execute(count_query, filter_params)
+                        exact_total = cursor.fetchone()['total']
+                    data_cursor.execute(query, query_params)
+                except pymysql.MySQLError as e:
+                    # Tabella eliminata dopo che i metadati sono stati messi in cache
+                    if e.args and e.args[0] == NO_SUCH_TABLE_ERROR:
+                        _table_metadata.pop(table_name, None)
+                        return api_response(404, {
+                            'error': f"Tabella '{table_name}' non trovata nel database '{DB_DATABASE}'"
+                        })
+                    if e.args and e.args[0] == BAD_FIELD_ERROR:
+                        return api_response(400, {'error': f"Colonna inesistente: {e.args[1] if len(e.args) > 1 else e}"})
+                    raise
+                result = ([column[0] for column in data_cursor.description], data_cursor.fetchall(), exact_total)
+                if cache_key:
+                    store_result(cache_key, table_name, version, result)
+
+            names, rows, total_rows = result
+            if count_mode == 'approx' and not filters:
+                total_rows = metadata['approx_rows']
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            next_cursor = None
+            if has_more and rows:
+                state = {'ob': order_by, 'd': order_dir}
+                if filters:
+                    state['f'] = filters_key(filters)
+                if use_offset:
+                    state['o'] = offset + limit
+                else:
+                    state['k'] = [encode_cursor_value(rows[-1][names.index(c)]) for c in key_columns]
+                next_cursor = encode_cursor(state)
 
         finally:
             cursor.close()
-            connection.close()
+            data_cursor.close()
+            release_mysql_connection(connection)
+
+        # Valori per colonna (una sola trasposizione), limitati alla proiezione richiesta
+        output_names = columns or names
+        values = list(zip(*rows)) if rows else [()] * len(names)
+        output_values = [values[names.index(c)] for c in output_names]
 
         log_operation(
             LOGS_TABLE,
@@ -120,18 +619,47 @@ def lambda_handler(event, context):
                 'rows_returned': len(rows),
                 'total_rows': total_rows,
                 'limit': limit,
-                'offset': offset
+                'offset': offset if use_offset else None,
+                'keyset': not use_offset,
+                'format': response_format,
+                'columns': len(output_names),
+                'filters': len(filters),
+                'result_cache': cache_status,
+                'db_role': db_role,
+                'db_host': db_host,
+                'connection_pool': mysql_pool_stats()
             }
         )
 
+        if response_format == 'csv':
+            headers = {
+                'Content-Encoding': 'gzip',
+                'X-Row-Count': str(len(rows)),
+                'X-Has-More': str(has_more).lower()
+            }
+            if total_rows is not None:
+                headers['X-Total-Rows'] = str(total_rows)
+            if next_cursor:
+                headers['X-Next-Cursor'] = next_cursor
+            return api_binary_response(200, gzip_csv(output_names, zip(*output_values)),
+                                       'text/csv; charset=utf-8', headers)
+
+        output_values = json_columns(output_values)
+        if response_format == 'columns':
+            data = dict(zip(output_names, output_values))
+        else:
+            data = [dict(zip(output_names, row)) for row in zip(*output_values)]
+
         return api_response(200, {
             'table_name': table_name,
-            'data': rows,
+            'data': data,
             'count': len(rows),
             'total_rows': total_rows,
+            'total_rows_approximate': count_mode == 'approx' and total_rows is not None,
             'limit': limit,
-            'offset': offset,
-            'has_more': (offset + limit) < total_rows
+            'offset': offset if use_offset else None,
+            'has_more': has_more,
+            'next_cursor': next_cursor
         })
 
     except Exception as e:
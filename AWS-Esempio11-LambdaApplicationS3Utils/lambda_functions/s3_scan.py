@@ -1,70 +1,261 @@
 import json
 import boto3
 import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from utils import log_operation, api_response
+from botocore.config import Config
 
-s3_client = boto3.client('s3')
+from utils import log_operation, api_response
 
 BUCKET_NAME = os.environ['BUCKET_NAME']
 SCAN_TABLE = os.environ['DYNAMODB_SCAN_TABLE']
 LOGS_TABLE = os.environ['DYNAMODB_LOGS_TABLE']
 
+# Listing parallelo: i prefissi scoperti con Delimiter nei primi LIST_PREFIX_DEPTH livelli
+# diventano partizioni indipendenti, listate da LIST_WORKERS thread (1 = listing sequenziale).
+# Una partizione con più di una pagina viene divisa in range di key (StartAfter) su
+# LIST_RANGE_SPLIT_LEVELS livelli di carattere: copre bucket piatti o con un solo prefisso
+LIST_WORKERS = int(os.environ.get('S3_SCAN_LIST_WORKERS', '16'))
+LIST_PREFIX_DEPTH = int(os.environ.get('S3_SCAN_PREFIX_DEPTH', '2'))
+LIST_DELIMITER = '/'
+LIST_QUEUE_DEPTH = 4 * LIST_WORKERS
+LIST_RANGE_SPLIT_LEVELS = 3
+
+# Il pool di connessioni HTTP deve coprire tutti i worker (default botocore: 10)
+s3_client = boto3.client('s3', config=Config(max_pool_connections=max(LIST_WORKERS, 10)))
+
+# full (default): riscrive ogni oggetto con la data del giorno, scan_date = ultima scansione
+# incremental: confronto con lo snapshot precedente, scrive solo le differenze
+# (scan_date = ultima modifica rilevata) e rimuove i file cancellati
+SCAN_MODES = ('full', 'incremental')
+SCAN_MODE = os.environ.get('S3_SCAN_MODE', 'full')
+
+
+def load_snapshot(scan_table) -> dict:
+    """
+    Legge lo snapshot della scansione precedente dalla tabella Scan.
+
+    Returns:
+        Dizionario file_key -> (etag, size), solo gli attributi usati nel confronto
+    """
+    snapshot = {}
+    scan_kwargs = {
+        'ProjectionExpression': 'file_key, etag, #size',
+        'ExpressionAttributeNames': {'#size': 'size'}
+    }
+    while True:
+        response = scan_table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            snapshot[item['file_key']] = (item.get('etag', ''), int(item.get('size', 0)))
+        if 'LastEvaluatedKey' not in response:
+            return snapshot
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def put_page(pages: queue.Queue, item, stop: threading.Event) -> bool:
+    """Mette in coda item aspettando spazio; False se il consumer si è fermato."""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def split_range(prefix: str, contents: list, upto) -> list:
+    """
+    Divide il resto di una partizione, le key dopo l'ultima della pagina fino a upto
+    (None = fine del prefisso), in range contigui (after, upto].
+
+    I punti di divisione sono l'ultima key troncata alla posizione in cui le key della
+    pagina iniziano a differire (e ai LIST_RANGE_SPLIT_LEVELS - 1 caratteri precedenti),
+    seguita da ogni carattere maggiore di quello della key tra quelli osservati nelle
+    posizioni variabili della pagina (es. le cifre di un contatore): i range crescono di
+    un ordine di grandezza per livello e ognuno si divide di nuovo se serve. I range
+    coprono sempre tutto l'intervallo, anche con caratteri mai osservati.
+    """
+    first_key, last_key = contents[0]['Key'], contents[-1]['Key']
+    varying = min(len(os.path.commonprefix([first_key, last_key])), len(last_key) - 1)
+    charset = sorted({
+        char for obj in contents for char in obj['Key'][varying:varying + LIST_RANGE_SPLIT_LEVELS]
+    })
+    points = []
+    for position in range(varying, max(varying - LIST_RANGE_SPLIT_LEVELS, len(prefix) - 1), -1):
+        for char in charset:
+            if char <= last_key[position]:
+                continue
+            point = last_key[:position] + char
+            if upto is not None and point >= upto:
+                break
+            points.append(point)
+    bounds = [last_key] + points + [upto]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def list_partition(prefix: str, depth: int, after, upto, pages: queue.Queue, stop: threading.Event) -> None:
+    """
+    Worker: lista una partizione del bucket e mette in coda le pagine di oggetti.
+
+    Sotto LIST_PREFIX_DEPTH la partizione è listata con Delimiter: contiene solo le key
+    al suo livello e i sotto-prefissi diventano nuove partizioni. All'ultimo livello
+    vengono listate tutte le key sotto il prefisso, limitate al range (after, upto]
+    (None = senza limite).
+
+    Se dopo una pagina restano altre key e la pagina termina con una key (non con un
+    sotto-prefisso, il cui contenuto verrebbe listato due volte) il resto viene diviso
+    con split_range in partizioni a range senza Delimiter. A fine partizione mette in
+    coda la tupla delle nuove partizioni (prefix, depth, after, upto); un errore viene
+    passato al consumer nella coda.
+    """
+    kwargs = {'Bucket': BUCKET_NAME, 'Prefix': prefix}
+    if after is not None:
+        kwargs['StartAfter'] = after
+    delimited = depth < LIST_PREFIX_DEPTH
+    if delimited:
+        kwargs['Delimiter'] = LIST_DELIMITER
+    partitions = []
+    try:
+        for page in s3_client.get_paginator('list_objects_v2').paginate(**kwargs):
+            common_prefixes = page.get('CommonPrefixes', [])
+            partitions.extend((common['Prefix'], depth + 1, None, None) for common in common_prefixes)
+            contents = page.get('Contents', [])
+            if upto is not None and contents and contents[-1]['Key'] > upto:
+                # Fine del range: le key successive appartengono a un'altra partizione
+                contents = [obj for obj in contents if obj['Key'] <= upto]
+                if contents:
+                    put_page(pages, contents, stop)
+                break
+            if contents and not put_page(pages, contents, stop):
+                return
+            if (page.get('IsTruncated') and contents and LIST_WORKERS > 1
+                    and (not common_prefixes or common_prefixes[-1]['Prefix'] < contents[-1]['Key'])):
+                partitions.extend(
+                    (prefix, LIST_PREFIX_DEPTH, range_after, range_upto)
+                    for range_after, range_upto in split_range(prefix, contents, upto)
+                )
+                break
+        put_page(pages, tuple(partitions), stop)
+    except Exception as e:
+        put_page(pages, e, stop)
+
+
+def iter_bucket_pages(stats: dict):
+    """
+    Consumer: restituisce le pagine di oggetti del bucket listate in parallelo, partendo
+    dalla radice e aggiungendo le partizioni (prefissi e range di key) restituite dai
+    worker. Le pagine arrivano in ordine sparso; la coda limitata applica backpressure
+    ai worker.
+    stats['partitions'] conta le partizioni listate.
+    """
+    pages = queue.Queue(maxsize=LIST_QUEUE_DEPTH)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(LIST_WORKERS, 1))
+    executor.submit(list_partition, '', 0, None, None, pages, stop)
+    outstanding = 1
+    try:
+        while outstanding:
+            item = pages.get()
+            if isinstance(item, Exception):
+                raise item
+            if isinstance(item, tuple):
+                outstanding -= 1
+                stats['partitions'] += 1
+                for partition in item:
+                    executor.submit(list_partition, *partition, pages, stop)
+                    outstanding += 1
+                continue
+            yield item
+    finally:
+        # Consumer interrotto (errore S3 o DynamoDB): sblocca e ferma i worker
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
 
 def lambda_handler(event, context):
     """
     Scansiona il bucket S3 e salva la lista dei file su DynamoDB.
     Invocata da EventBridge scheduler (default: giornaliera alle 02:00 UTC).
+
+    In modalità incremental (S3_SCAN_MODE o {"mode": ...} nell'evento, default full) il
+    listing viene confrontato con lo snapshot precedente per key, ETag e dimensione:
+    si scrivono solo i file nuovi o modificati e si cancellano quelli non più nel bucket.
     """
     try:
+        mode = (event or {}).get('mode', SCAN_MODE)
+        if mode not in SCAN_MODES:
+            return api_response(400, {'error': f"mode deve essere uno tra: {', '.join(SCAN_MODES)}"}, cors=False)
+
         dynamodb = boto3.resource('dynamodb')
         scan_table = dynamodb.Table(SCAN_TABLE)
         scan_date = datetime.now().strftime('%Y-%m-%d')
 
-        # Lista tutti i file nel bucket con paginazione
-        paginator = s3_client.get_paginator('list_objects_v2')
-        pages = paginator.paginate(Bucket=BUCKET_NAME)
+        # Snapshot letto prima del listing: le key rimaste alla fine sono i file cancellati
+        previous = load_snapshot(scan_table) if mode == 'incremental' else None
+
+        # Lista tutti i file nel bucket: partizioni per prefisso listate in parallelo,
+        # pagine unite qui in un unico flusso verso il batch_writer (non thread-safe)
+        list_stats = {'partitions': 0}
+        pages = iter_bucket_pages(list_stats)
 
         files_processed = 0
         total_size = 0
+        files_added = 0
+        files_changed = 0
 
         # batch_writer gestisce automaticamente:
         # - batching a gruppi di 25 (limite DynamoDB)
         # - retry degli UnprocessedItems
         with scan_table.batch_writer() as batch:
             for page in pages:
-                if 'Contents' not in page:
-                    continue
+                for obj in page:
+                    etag = obj.get('ETag', '').strip('"')
+                    files_processed += 1
+                    total_size += obj['Size']
+
+                    if previous is not None:
+                        known = previous.pop(obj['Key'], None)
+                        if known == (etag, obj['Size']):
+                            continue
+                        if known is None:
+                            files_added += 1
+                        else:
+                            files_changed += 1
 
-                for obj in page['Contents']:
                     batch.put_item(Item={
                         'file_key': obj['Key'],
                         'scan_date': scan_date,
                         'size': obj['Size'],
                         'last_modified': obj['LastModified'].isoformat(),
-                        'etag': obj.get('ETag', '').strip('"')
+                        'etag': etag
                     })
 
-                    files_processed += 1
-                    total_size += obj['Size']
+            # Cancellazioni solo a listing completo: un errore a metà non rimuove nulla
+            for file_key in previous or ():
+                batch.delete_item(Key={'file_key': file_key})
 
-        log_operation(
-            LOGS_TABLE,
-            's3_scan',
-            {
-                'scan_date': scan_date,
-                'files_processed': files_processed,
-                'total_size': total_size
-            }
-        )
-
-        return api_response(200, {
-            'message': 'Scansione S3 completata con successo',
+        summary = {
             'scan_date': scan_date,
+            'mode': mode,
             'files_processed': files_processed,
-            'total_size': total_size
-        }, cors=False)
+            'total_size': total_size,
+            'list_partitions': list_stats['partitions'],
+            'list_workers': LIST_WORKERS
+        }
+        if previous is not None:
+            summary.update({
+                'files_added': files_added,
+                'files_changed': files_changed,
+                'files_removed': len(previous),
+                'files_unchanged': files_processed - files_added - files_changed
+            })
+
+        log_operation(LOGS_TABLE, 's3_scan', summary)
+
+        return api_response(200, dict(summary, message='Scansione S3 completata con successo'), cors=False)
 
     except Exception as e:
         log_operation(LOGS_TABLE, 's3_scan', {'error': str(e)}, 'error')
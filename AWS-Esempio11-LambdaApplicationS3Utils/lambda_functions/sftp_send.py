@@ -3,13 +3,14 @@ import boto3
 import os
 import io
 
-from utils import log_operation, api_response
+from utils import log_operation, api_response, enqueue_job, is_job_queue_event, run_queued_jobs
 
 s3_client = boto3.client('s3')
 ssm_client = boto3.client('ssm')
 
 BUCKET_NAME = os.environ['BUCKET_NAME']
 LOGS_TABLE = os.environ['DYNAMODB_LOGS_TABLE']
+JOBS_TABLE = os.environ.get('DYNAMODB_JOBS_TABLE', '')
 SFTP_PRIVATE_KEY_PARAM = os.environ['SFTP_PRIVATE_KEY_PARAM']
 
 # Cache chiave privata per riuso tra invocazioni warm
@@ -50,9 +51,13 @@ def lambda_handler(event, context):
         "sftp_port": 22,              # opzionale, default 22
         "sftp_username": "user",
         "sftp_remote_path": "/upload/file.txt",
-        "sftp_host_key": "ssh-rsa AAAA..."  # opzionale ma consigliato per verifica host
+        "sftp_host_key": "ssh-rsa AAAA...",  # opzionale ma consigliato per verifica host
+        "async": false                       # opzionale, esegue come job e risponde 202 con job_id
     }
     """
+    if is_job_queue_event(event):
+        return run_queued_jobs(event, context, JOBS_TABLE, lambda_handler)
+
     try:
         body = json.loads(event.get('body', '{}'))
         s3_key = body.get('s3_key')
@@ -68,6 +73,9 @@ def lambda_handler(event, context):
                 'required': ['s3_key', 'sftp_host', 'sftp_username', 'sftp_remote_path']
             })
 
+        if body.get('async') and JOBS_TABLE:
+            return enqueue_job(JOBS_TABLE, 'sftp_send', body)
+
         # Scarica file da S3
         s3_obj = s3_client.get_object(Bucket=BUCKET_NAME, Key=s3_key)
         file_content = s3_obj['Body'].read()
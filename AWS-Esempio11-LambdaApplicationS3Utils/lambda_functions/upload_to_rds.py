@@ -2,14 +2,34 @@ import json
 import boto3
 import os
 import csv
-import io
+import codecs
+import hashlib
+import itertools
+import queue
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date, datetime, timedelta
 
-from utils import log_operation, api_response, validate_table_name, validate_column_name
+from botocore.exceptions import ClientError
+
+from utils import (
+    log_operation, api_response, validate_table_name, validate_column_name,
+    enqueue_job, is_job_queue_event, run_queued_jobs, current_job_id, JobRetry,
+    acquire_mysql_connection, release_mysql_connection, mysql_pool_stats,
+    ensure_table_versions, bump_table_version, record_table_write
+)
 
 s3_client = boto3.client('s3')
+dynamodb = boto3.resource('dynamodb')
 
 BUCKET_NAME = os.environ['BUCKET_NAME']
 LOGS_TABLE = os.environ['DYNAMODB_LOGS_TABLE']
+JOBS_TABLE = os.environ.get('DYNAMODB_JOBS_TABLE', '')
+IMPORTS_TABLE = os.environ.get('DYNAMODB_IMPORTS_TABLE', '')
 
 # Credenziali RDS passate come variabili d'ambiente Lambda (criptate at-rest)
 # Questo evita la necessità di un VPC Endpoint Interface per Secrets Manager
@@ -19,6 +39,1212 @@ DB_PASSWORD = os.environ.get('DB_PASSWORD', '')
 DB_DATABASE = os.environ.get('DB_DATABASE', '')
 DB_PORT = int(os.environ.get('DB_PORT', '3306'))
 
+# Streaming del CSV: dimensione dei chunk letti da S3, righe per INSERT e numero di
+# batch già parsati in attesa di inserimento (memoria costante anche per CSV da GB)
+CSV_READ_CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 100
+CSV_QUEUE_DEPTH = 8
+
+# Marcatore di fine stream nella coda producer → consumer
+_END_OF_CSV = object()
+
+# Bulk load: dimensione dei file locali passati a LOAD DATA LOCAL INFILE (/tmp) e limite
+# del client pymysql per un singolo pacchetto (default di pymysql.connect)
+BULK_CHUNK_BYTES = int(os.environ.get('RDS_BULK_CHUNK_MB', '64')) * 1024 * 1024
+CLIENT_MAX_PACKET = 16 * 1024 * 1024
+PACKET_SAFETY_MARGIN = 64 * 1024
+SPOOL_DIR = os.environ.get('RDS_SPOOL_DIR', tempfile.gettempdir())
+
+# Errori MySQL che indicano LOAD DATA LOCAL disabilitato (server o client)
+LOAD_DATA_DISABLED_ERRORS = (1148, 2068, 3948)
+
+# Import parallelo: chunk a range di byte, connessioni in parallelo, tempo minimo
+# residuo per avviare un nuovo chunk e giorni di conservazione dei checkpoint
+IMPORT_CHUNK_BYTES = int(os.environ.get('RDS_IMPORT_CHUNK_MB', '64')) * 1024 * 1024
+IMPORT_WORKERS = int(os.environ.get('RDS_IMPORT_WORKERS', '4'))
+IMPORT_MIN_REMAINING_MS = int(os.environ.get('RDS_IMPORT_MIN_REMAINING_MS', '120000'))
+IMPORT_TTL_DAYS = 7
+BOUNDARY_SCAN_BYTES = 64 * 1024
+# import_id del client: finisce nel nome della staging e in _upload_chunks.import_id VARCHAR(64)
+IMPORT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Tabella MySQL dei chunk committati: la riga viene inserita nella stessa transazione
+# dei dati, quindi un chunk non può essere caricato due volte
+CHUNKS_TABLE = '_upload_chunks'
+DUPLICATE_KEY_ERROR = 1062
+
+# Inferenza dello schema: default per le richieste senza infer_schema (false = tutte
+# VARCHAR(255) come in origine), righe campionate dall'inizio del CSV e limiti MySQL
+# (VARCHAR e indici misurati in caratteri utf8mb4, 4 byte ciascuno)
+INFER_SCHEMA_DEFAULT = os.environ.get('RDS_INFER_SCHEMA', 'false').lower() == 'true'
+SCHEMA_SAMPLE_ROWS = int(os.environ.get('RDS_SCHEMA_SAMPLE_ROWS', '10000'))
+INT_RANGE = (-2 ** 31, 2 ** 31 - 1)
+BIGINT_RANGE = (-2 ** 63, 2 ** 63 - 1)
+MAX_VARCHAR_LENGTH = 16383
+MAX_ROW_VARCHAR_BYTES = 60000
+INDEX_MAX_CHARS = 768
+MAX_INDEXES = 16
+IMPORT_MODES = ('append', 'upsert', 'replace')
+TEXT_TYPES = ('char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext', 'enum', 'set')
+
+INTEGER_PATTERN = re.compile(r'[+-]?(0|[1-9]\d*)')
+DECIMAL_PATTERN = re.compile(r'[+-]?(0|[1-9]\d*)?\.(\d+)')
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+DATETIME_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d{1,6})?')
+
+
+def iter_text_lines(body, chunk_size: int = CSV_READ_CHUNK_SIZE):
+    """
+    Decodifica in streaming il body S3 (UTF-8) e restituisce le righe con il
+    terminatore incluso, come richiesto da csv.reader per i campi multilinea.
+
+    Il decoder incrementale gestisce i caratteri multibyte spezzati tra due chunk.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    for chunk in body.iter_chunks(chunk_size):
+        pending += decoder.decode(chunk)
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def batch_rows(csv_reader, width: int):
+    """
+    Raggruppa le righe in batch da BATCH_SIZE e per ultimo restituisce un dict con il
+    numero di righe scartate perché con un numero di campi diverso dall'header.
+    """
+    skipped = 0
+    batch = []
+    for row in csv_reader:
+        if len(row) != width:
+            skipped += 1  # Salta righe malformate
+            continue
+        batch.append(tuple(row))
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+    yield {'skipped': skipped}
+
+
+def produce_csv_batches(body, batches: queue.Queue, stop: threading.Event) -> None:
+    """
+    Producer: legge e parsa il CSV, mette in coda l'header e poi batch di righe.
+    Le righe con numero di campi diverso dall'header vengono scartate e contate.
+    Un errore viene passato al consumer come eccezione nella coda.
+    """
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        csv_reader = csv.reader(iter_text_lines(body))
+        headers = next(csv_reader, None)
+        if headers is None or not put(headers):
+            put(_END_OF_CSV)
+            return
+        for item in batch_rows(csv_reader, len(headers)):
+            if not put(item):
+                return
+        put(_END_OF_CSV)
+    except Exception as e:
+        put(e)
+    finally:
+        body.close()
+
+
+def stream_csv_batches(body):
+    """
+    Consumer: restituisce l'header del CSV, poi i batch di righe e infine un dict
+    con il conteggio delle righe scartate. Parsing (thread producer) e INSERT
+    (chiamante) procedono in parallelo; la coda limitata applica backpressure.
+    """
+    batches = queue.Queue(maxsize=CSV_QUEUE_DEPTH)
+    stop = threading.Event()
+    producer = threading.Thread(target=produce_csv_batches, args=(body, batches, stop), daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = batches.get()
+            if item is _END_OF_CSV:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Consumer interrotto (errore SQL, header non valido): sblocca il producer
+        stop.set()
+        producer.join()
+
+
+class ColumnProfile:
+    """
+    Tipi MySQL compatibili con tutti i valori non vuoti visti per una colonna.
+    I numeri con zeri iniziali (es. CAP, codici) restano stringhe.
+    """
+
+    def __init__(self):
+        self.kinds = {'int', 'decimal', 'date', 'datetime'}
+        self.non_empty = 0
+        self.max_length = 0
+        self.min_int = 0
+        self.max_int = 0
+        self.int_digits = 1
+        self.scale = 0
+        self.fraction = False
+
+    def observe(self, value: str) -> None:
+        if value == '':
+            return
+        self.non_empty += 1
+        self.max_length = max(self.max_length, len(value))
+        if self.kinds & {'int', 'decimal'}:
+            self._observe_number(value)
+        if self.kinds & {'date', 'datetime'}:
+            self._observe_temporal(value)
+
+    def _observe_number(self, value: str) -> None:
+        match = INTEGER_PATTERN.fullmatch(value)
+        if match:
+            number = int(value)
+            self.min_int = min(self.min_int, number)
+            self.max_int = max(self.max_int, number)
+            self.int_digits = max(self.int_digits, len(match.group(1)))
+            return
+        self.kinds.discard('int')
+        match = DECIMAL_PATTERN.fullmatch(value)
+        if match:
+            self.int_digits = max(self.int_digits, len(match.group(1) or '0'))
+            self.scale = max(self.scale, len(match.group(2)))
+        else:
+            self.kinds.discard('decimal')
+
+    def _observe_temporal(self, value: str) -> None:
+        try:
+            if DATE_PATTERN.fullmatch(value):
+                date.fromisoformat(value)
+                return
+            if DATETIME_PATTERN.fullmatch(value):
+                datetime.fromisoformat(value)
+                self.kinds.discard('date')
+                self.fraction = self.fraction or '.' in value
+                return
+        except ValueError:
+            pass
+        self.kinds -= {'date', 'datetime'}
+
+    def column_type(self) -> str:
+        if not self.non_empty:
+            return 'VARCHAR(255)'
+        if 'int' in self.kinds:
+            if INT_RANGE[0] <= self.min_int and self.max_int <= INT_RANGE[1]:
+                return 'INT'
+            if BIGINT_RANGE[0] <= self.min_int and self.max_int <= BIGINT_RANGE[1]:
+                return 'BIGINT'
+        if 'decimal' in self.kinds:
+            # Due cifre intere di margine rispetto al campione
+            precision = self.int_digits + 2 + self.scale
+            if precision <= 65 and self.scale <= 30:
+                return f'DECIMAL({precision},{self.scale})'
+        if 'date' in self.kinds:
+            return 'DATE'
+        if 'datetime' in self.kinds:
+            return 'DATETIME(6)' if self.fraction else 'DATETIME'
+        length = 16
+        while length < self.max_length:
+            length *= 2
+        return f'VARCHAR({length})' if length <= MAX_VARCHAR_LENGTH else 'MEDIUMTEXT'
+
+
+def infer_column_types(headers: list, rows) -> dict:
+    """
+    Deduce il tipo di ogni colonna dalle righe campione: INT, BIGINT, DECIMAL, DATE,
+    DATETIME o VARCHAR dimensionato alla potenza di 2 successiva alla lunghezza massima.
+    Se i VARCHAR superano il limite di riga di MySQL i più larghi diventano TEXT.
+
+    Returns:
+        Dizionario nome colonna → tipo SQL
+    """
+    profiles = [ColumnProfile() for _ in headers]
+    for row in rows:
+        for profile, value in zip(profiles, row):
+            profile.observe(value)
+    column_types = {name: profile.column_type() for name, profile in zip(headers, profiles)}
+
+    def varchar_length(name: str) -> int:
+        match = re.fullmatch(r'VARCHAR\((\d+)\)', column_types[name])
+        return int(match.group(1)) if match else 0
+
+    while sum(varchar_length(name) * 4 + 2 for name in headers) > MAX_ROW_VARCHAR_BYTES:
+        widest = max(headers, key=varchar_length)
+        column_types[widest] = 'TEXT'
+    return column_types
+
+
+def sample_rows(batches, limit: int) -> tuple:
+    """
+    Legge dai batch del producer almeno `limit` righe per l'inferenza dello schema.
+
+    Returns:
+        Tupla (batch letti, da reinserire in testa allo stream; righe campione)
+    """
+    consumed = []
+    rows = []
+    for batch in batches:
+        consumed.append(batch)
+        if isinstance(batch, dict):
+            break
+        rows.extend(batch)
+        if len(rows) >= limit:
+            break
+    return consumed, rows
+
+
+def table_columns(cursor, table_name: str) -> dict:
+    """
+    Colonne della tabella da information_schema (dizionario vuoto se non esiste).
+
+    Returns:
+        Dizionario nome colonna → (tipo, lunghezza massima in caratteri o None)
+    """
+    cursor.execute(
+        "SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table_name,)
+    )
+    return {name: (data_type.lower(), max_length) for name, data_type, max_length in cursor.fetchall()}
+
+
+def null_columns(columns: dict) -> set:
+    """Colonne non testuali: un campo CSV vuoto va inserito come NULL, non come ''."""
+    return {name for name, (data_type, _) in columns.items() if data_type not in TEXT_TYPES}
+
+
+def rows_with_nulls(rows, positions: list):
+    """Sostituisce '' con None nelle posizioni indicate."""
+    for row in rows:
+        if any(row[i] == '' for i in positions):
+            row = list(row)
+            for i in positions:
+                if row[i] == '':
+                    row[i] = None
+            row = tuple(row)
+        yield row
+
+
+def batches_with_nulls(batches, headers: list, nullable: set):
+    """Applica rows_with_nulls ai batch del producer (il dict finale passa invariato)."""
+    positions = [i for i, name in enumerate(headers) if name in nullable]
+    for batch in batches:
+        if positions and not isinstance(batch, dict):
+            batch = list(rows_with_nulls(batch, positions))
+        yield batch
+
+
+def parse_indexes(raw_indexes, headers: list) -> list:
+    """
+    Valida gli indici richiesti: ogni elemento è un nome colonna o una lista di
+    colonne (indice composto), tutte presenti nell'header del CSV.
+
+    Raises:
+        ValueError: se il formato non è valido o una colonna non esiste
+    """
+    if raw_indexes is None:
+        return []
+    if not isinstance(raw_indexes, list) or len(raw_indexes) > MAX_INDEXES:
+        raise ValueError(f'indexes deve essere una lista di al massimo {MAX_INDEXES} elementi')
+    indexes = []
+    for raw in raw_indexes:
+        columns = [raw] if isinstance(raw, str) else raw
+        if not isinstance(columns, list) or not columns or not all(isinstance(c, str) for c in columns):
+            raise ValueError('Ogni indice deve essere un nome colonna o una lista di nomi colonna')
+        columns = [validate_column_name(c.strip()) for c in columns]
+        missing = [c for c in columns if c not in headers]
+        if missing:
+            raise ValueError(f"Colonne non presenti nel CSV: {', '.join(missing)}")
+        indexes.append(columns)
+    return indexes
+
+
+def prepare_table(cursor, table_name: str, headers: list, sample=None) -> tuple:
+    """
+    Crea la tabella se non esiste, con i tipi dedotti dalle righe campione
+    (`sample`, funzione senza argomenti chiamata solo se serve) o VARCHAR(255).
+
+    Returns:
+        Tupla (colonne nullabili per i campi vuoti, tipi dedotti o None se la tabella esisteva)
+    """
+    columns = table_columns(cursor, table_name)
+    column_types = None
+    if not columns:
+        if sample is not None:
+            column_types = infer_column_types(headers, sample())
+        create_table(cursor, table_name, headers, column_types)
+        columns = table_columns(cursor, table_name)
+    return null_columns(columns), column_types
+
+
+def index_name(prefix: str, columns: list) -> str:
+    """Nome indice <prefix><colonne>, sostituito da un hash oltre i 64 caratteri di MySQL."""
+    name = prefix + '_'.join(columns)
+    if len(name) > 64:
+        name = prefix + hashlib.sha1(name.encode('utf-8')).hexdigest()[:16]
+    return name
+
+
+def create_indexes(cursor, table_name: str, indexes: list) -> list:
+    """
+    Crea gli indici mancanti (nome ix_<colonne>, idempotente). Le colonne testuali
+    più lunghe di INDEX_MAX_CHARS caratteri vengono indicizzate per prefisso.
+
+    Returns:
+        Nomi degli indici creati
+    """
+    if not indexes:
+        return []
+    columns = table_columns(cursor, table_name)
+    cursor.execute(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table_name,)
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    created = []
+    for index_columns in indexes:
+        name = index_name('ix_', index_columns)
+        if name in existing:
+            continue
+        parts = []
+        for column in index_columns:
+            data_type, max_length = columns[column]
+            if data_type in TEXT_TYPES and (max_length is None or max_length > INDEX_MAX_CHARS):
+                parts.append(f"`{column}`({INDEX_MAX_CHARS})")
+            else:
+                parts.append(f"`{column}`")
+        cursor.execute(f"CREATE INDEX `{name}` ON `{table_name}` ({', '.join(parts)})")
+        existing.add(name)
+        created.append(name)
+    return created
+
+
+def parse_key(raw_key, headers: list) -> list:
+    """
+    Valida la chiave dell'upsert: un nome colonna o una lista di colonne dell'header.
+
+    Raises:
+        ValueError: se la chiave manca o contiene colonne non presenti nel CSV
+    """
+    if not raw_key:
+        raise ValueError('key è obbligatoria con mode "upsert"')
+    return parse_indexes([raw_key], headers)[0]
+
+
+def staging_table_name(table_name: str, token: str) -> str:
+    """Nome della tabella di appoggio di un import (≤ 64 caratteri)."""
+    return f"_stg_{table_name[:40]}_{token[:16]}"
+
+
+def ensure_unique_key(cursor, table_name: str, key: list) -> None:
+    """
+    Garantisce un indice UNIQUE esattamente sulle colonne chiave, necessario per
+    ON DUPLICATE KEY UPDATE. Fallisce se la tabella contiene già duplicati.
+
+    Raises:
+        ValueError: se una colonna chiave è testuale e troppo lunga per un indice univoco
+    """
+    cursor.execute(
+        "SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0",
+        (table_name,)
+    )
+    unique_indexes = {}
+    for name, column in cursor.fetchall():
+        unique_indexes.setdefault(name, set()).add(column)
+    if set(key) in unique_indexes.values():
+        return
+    columns = table_columns(cursor, table_name)
+    for column in key:
+        data_type, max_length = columns[column]
+        if data_type in TEXT_TYPES and (max_length is None or max_length > INDEX_MAX_CHARS):
+            raise ValueError(f"La colonna chiave {column} è troppo lunga per un indice UNIQUE")
+    key_list = ', '.join([f"`{c}`" for c in key])
+    cursor.execute(f"ALTER TABLE `{table_name}` ADD UNIQUE INDEX `{index_name('ux_', key)}` ({key_list})")
+
+
+def prepare_load_table(cursor, mode: str, table_name: str, load_table: str,
+                       headers: list, key: list, sample=None) -> tuple:
+    """
+    Prepara la tabella in cui caricare il CSV:
+    - append: la tabella di destinazione (creata se non esiste)
+    - upsert: destinazione con indice UNIQUE sulla chiave e staging con le sole
+      colonne del CSV, più _stg_row per conservare l'ordine delle righe
+    - replace: staging con lo schema completo, che prenderà il posto della destinazione
+
+    Idempotente: una staging già esistente (import ripreso) viene riusata.
+
+    Returns:
+        Tupla (colonne nullabili della tabella di caricamento, tipi dedotti o None)
+    """
+    if mode == 'replace':
+        return prepare_table(cursor, load_table, headers, sample)
+    nullable, column_types = prepare_table(cursor, table_name, headers, sample)
+    if mode == 'upsert':
+        ensure_unique_key(cursor, table_name, key)
+        col_list = ', '.join([f"`{h}`" for h in headers])
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS `{load_table}` (_stg_row BIGINT AUTO_INCREMENT PRIMARY KEY) "
+            f"SELECT {col_list} FROM `{table_name}` LIMIT 0"
+        )
+    return nullable, column_types
+
+
+def finish_load(cursor, mode: str, table_name: str, load_table: str, headers: list, key: list):
+    """
+    Rende visibili ai lettori i dati caricati nella staging, poi la elimina:
+    - upsert: un solo INSERT ... SELECT ... ON DUPLICATE KEY UPDATE (una transazione,
+      a parità di chiave vince l'ultima riga del CSV)
+    - replace: RENAME TABLE atomico di destinazione e staging, poi DROP della vecchia
+
+    La versione della tabella (chiave della cache di read_from_rds) viene incrementata
+    insieme ai dati. Idempotente: se la staging non esiste più il passaggio è già stato
+    eseguito e la versione viene solo incrementata di nuovo (innocuo, copre un'esecuzione
+    interrotta tra il RENAME e l'incremento).
+
+    Returns:
+        Righe modificate dall'upsert (conteggio MySQL: 1 per inserimento, 2 per
+        aggiornamento) o None
+    """
+    if mode == 'append':
+        return None
+    if not table_columns(cursor, load_table):
+        bump_table_version(cursor, table_name)
+        return None
+    if mode == 'upsert':
+        col_list = ', '.join([f"`{h}`" for h in headers])
+        updates = ', '.join([f"`{h}` = VALUES(`{h}`)" for h in headers if h not in key])
+        cursor.execute(
+            f"INSERT INTO `{table_name}` ({col_list}) SELECT {col_list} FROM `{load_table}` "
+            f"ORDER BY _stg_row ON DUPLICATE KEY UPDATE {updates or f'`{key[0]}` = `{key[0]}`'}"
+        )
+        rows_affected = cursor.rowcount
+        bump_table_version(cursor, table_name)
+        cursor.connection.commit()
+        cursor.execute(f"DROP TABLE IF EXISTS `{load_table}`")
+        return rows_affected
+
+    if table_columns(cursor, table_name):
+        old_table = '_old_' + load_table[len('_stg_'):]
+        cursor.execute(f"RENAME TABLE `{table_name}` TO `{old_table}`, `{load_table}` TO `{table_name}`")
+        bump_table_version(cursor, table_name)
+        cursor.connection.commit()
+        cursor.execute(f"DROP TABLE IF EXISTS `{old_table}`")
+    else:
+        cursor.execute(f"RENAME TABLE `{load_table}` TO `{table_name}`")
+        bump_table_version(cursor, table_name)
+        cursor.connection.commit()
+    return None
+
+
+def insert_batches(cursor, batches, insert_sql: str) -> tuple:
+    """
+    Inserimento classico: un executemany per ogni batch del producer.
+
+    Returns:
+        Tupla (righe inserite, righe scartate)
+    """
+    rows_inserted = 0
+    rows_skipped = 0
+    for batch in batches:
+        if isinstance(batch, dict):
+            rows_skipped = batch['skipped']
+            continue
+        cursor.executemany(insert_sql, batch)
+        rows_inserted += len(batch)
+    return rows_inserted, rows_skipped
+
+
+class MultiRowInserter:
+    """
+    Accumula righe già convertite in letterali SQL (cursor.mogrify) in un unico
+    INSERT ... VALUES (...), (...) ed esegue lo statement appena la riga successiva
+    farebbe superare max_statement_bytes.
+    """
+
+    def __init__(self, cursor, table_name: str, headers: list, max_statement_bytes: int):
+        self.cursor = cursor
+        col_list = ', '.join([f"`{h}`" for h in headers])
+        self.prefix = f"INSERT INTO `{table_name}` ({col_list}) VALUES "
+        self.row_template = '(' + ', '.join(['%s'] * len(headers)) + ')'
+        self.max_statement_bytes = max_statement_bytes
+        self.values = []
+        self.size = len(self.prefix)
+        self.rows_inserted = 0
+        self.statements = 0
+
+    def add(self, rows) -> None:
+        for row in rows:
+            value = self.cursor.mogrify(self.row_template, row)
+            value_size = len(value.encode('utf-8')) + 1
+            if self.values and self.size + value_size > self.max_statement_bytes:
+                self.flush()
+            self.values.append(value)
+            self.size += value_size
+
+    def flush(self) -> None:
+        if not self.values:
+            return
+        self.cursor.execute(self.prefix + ','.join(self.values))
+        self.rows_inserted += len(self.values)
+        self.statements += 1
+        self.values = []
+        self.size = len(self.prefix)
+
+
+def load_data_chunk(cursor, path: str, table_name: str, headers: list, nullable: set = frozenset()) -> int:
+    """
+    Carica un file CSV locale (tutti i campi tra virgolette) con LOAD DATA LOCAL INFILE.
+    Con tutti i campi quotati la stringa "NULL" resta una stringa; per le colonne in
+    `nullable` un campo vuoto diventa NULL (NULLIF su una variabile utente).
+
+    Returns:
+        Numero di righe caricate
+    """
+    targets = []
+    assignments = []
+    for i, name in enumerate(headers):
+        if name in nullable:
+            targets.append(f"@v{i}")
+            assignments.append(f"`{name}` = NULLIF(@v{i}, '')")
+        else:
+            targets.append(f"`{name}`")
+    set_clause = f" SET {', '.join(assignments)}" if assignments else ''
+    cursor.execute(
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table_name}` CHARACTER SET utf8mb4 "
+        f"FIELDS TERMINATED BY ',' ENCLOSED BY '\"' ESCAPED BY '' "
+        f"LINES TERMINATED BY '\\n' ({', '.join(targets)}){set_clause}",
+        (path,)
+    )
+    return cursor.rowcount
+
+
+def bulk_load(cursor, batches, table_name: str, headers: list, nullable: set = frozenset()) -> dict:
+    """
+    Bulk load dei batch del producer.
+
+    Se il server ha local_infile abilitato le righe vengono scritte in file locali da
+    BULK_CHUNK_BYTES e caricate con LOAD DATA LOCAL INFILE; altrimenti (o se il primo
+    LOAD DATA viene rifiutato) si usano INSERT multi-riga dimensionati su
+    max_allowed_packet del server.
+
+    Returns:
+        Dizionario con rows_inserted, rows_skipped, load_method e statements
+    """
+    cursor.execute("SELECT @@max_allowed_packet, @@GLOBAL.local_infile")
+    max_allowed_packet, local_infile = cursor.fetchone()
+    max_statement_bytes = min(int(max_allowed_packet), CLIENT_MAX_PACKET) - PACKET_SAFETY_MARGIN
+    inserter = MultiRowInserter(cursor, table_name, headers, max_statement_bytes)
+    use_load_data = str(local_infile).upper() in ('1', 'ON')
+    # Negli INSERT i campi vuoti delle colonne non testuali diventano NULL (come in LOAD DATA)
+    positions = [i for i, name in enumerate(headers) if name in nullable]
+
+    report = {'rows_loaded': 0, 'load_statements': 0}
+    rows_skipped = 0
+    spool = None
+
+    def load_spool(path: str) -> bool:
+        """Carica il file con LOAD DATA; False se LOAD DATA LOCAL è stato rifiutato."""
+        try:
+            report['rows_loaded'] += load_data_chunk(cursor, path, table_name, headers, nullable)
+            report['load_statements'] += 1
+            return True
+        except Exception as e:
+            if not (e.args and e.args[0] in LOAD_DATA_DISABLED_ERRORS):
+                raise
+            # LOAD DATA rifiutato: il chunk e il resto del CSV passano agli INSERT
+            print(f"LOAD DATA LOCAL non disponibile ({e}), uso INSERT multi-riga")
+            with open(path, encoding='utf-8', newline='') as f:
+                inserter.add(rows_with_nulls(csv.reader(f), positions))
+            return False
+
+    try:
+        for batch in batches:
+            if isinstance(batch, dict):
+                rows_skipped = batch['skipped']
+                continue
+            if not use_load_data:
+                inserter.add(rows_with_nulls(batch, positions) if positions else batch)
+                continue
+            if spool is None:
+                spool = tempfile.NamedTemporaryFile(
+                    'w', dir=SPOOL_DIR, suffix='.csv', encoding='utf-8', newline='', delete=False
+                )
+                writer = csv.writer(spool, quoting=csv.QUOTE_ALL, lineterminator='\n')
+            writer.writerows(batch)
+            if spool.tell() >= BULK_CHUNK_BYTES:
+                spool.close()
+                use_load_data = load_spool(spool.name)
+                os.remove(spool.name)
+                spool = None
+
+        if spool is not None:
+            spool.close()
+            load_spool(spool.name)
+        inserter.flush()
+    finally:
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+
+    load_statements = report['load_statements']
+    if load_statements and inserter.statements:
+        load_method = 'load_data+insert'
+    elif load_statements:
+        load_method = 'load_data'
+    else:
+        load_method = 'multi_row_insert'
+    return {
+        'rows_inserted': report['rows_loaded'] + inserter.rows_inserted,
+        'rows_skipped': rows_skipped,
+        'load_method': load_method,
+        'statements': load_statements + inserter.statements
+    }
+
+
+def connect_db(pymysql, local_infile: bool = False):
+    """
+    Connessione Aurora MySQL con autocommit disabilitato, riusata tra invocazioni
+    calde: va restituita con release_mysql_connection().
+    """
+    return acquire_mysql_connection(
+        pymysql,
+        host=DB_HOST,
+        user=DB_USERNAME,
+        password=DB_PASSWORD,
+        database=DB_DATABASE,
+        port=DB_PORT,
+        connect_timeout=10,
+        autocommit=False,
+        local_infile=local_infile
+    )
+
+
+def create_table(cursor, table_name: str, headers: list, column_types: dict = None) -> None:
+    """
+    Crea la tabella se non esiste — nomi già validati, sicuri da usare direttamente.
+    Senza column_types tutte le colonne sono VARCHAR(255).
+    """
+    column_types = column_types or {}
+    columns_def = ', '.join([f"`{col}` {column_types.get(col, 'VARCHAR(255)')}" for col in headers])
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS `{table_name}` ("
+        f"  id INT AUTO_INCREMENT PRIMARY KEY,"
+        f"  {columns_def},"
+        f"  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+        f")"
+    )
+
+
+def next_record_end(block: bytes, index: int, in_quotes: bool) -> tuple:
+    """
+    Cerca in block, da index, il primo '\n' fuori da un campo tra virgolette.
+
+    Basta la parità dei doppi apici: in un CSV RFC 4180 gli apici dentro un campo
+    quotato sono raddoppiati, quindi ogni apice inverte lo stato dentro/fuori.
+
+    Returns:
+        Tupla (offset nel blocco dopo il '\n' o -1 se non trovato, stato in_quotes
+        in quel punto o a fine blocco)
+    """
+    while True:
+        quote = block.find(b'"', index)
+        if not in_quotes:
+            newline = block.find(b'\n', index)
+            if newline >= 0 and (quote < 0 or newline < quote):
+                return newline + 1, False
+        if quote < 0:
+            return -1, in_quotes
+        in_quotes = not in_quotes
+        index = quote + 1
+
+
+def find_line_end(csv_key: str, offset: int, size: int) -> int:
+    """
+    Restituisce l'offset del byte successivo al primo fine record a partire da offset,
+    che deve essere l'inizio di un record (size se il file termina prima), leggendo
+    blocchi ranged da BOUNDARY_SCAN_BYTES. I '\n' dentro campi quotati vengono saltati.
+    """
+    in_quotes = False
+    while offset < size:
+        end = min(offset + BOUNDARY_SCAN_BYTES, size) - 1
+        data = s3_client.get_object(
+            Bucket=BUCKET_NAME, Key=csv_key, Range=f"bytes={offset}-{end}"
+        )['Body'].read()
+        record_end, in_quotes = next_record_end(data, 0, in_quotes)
+        if record_end >= 0:
+            return offset + record_end
+        offset = end + 1
+    return size
+
+
+def plan_chunks(csv_key: str, etag: str, data_start: int, size: int) -> list:
+    """
+    Divide il corpo del CSV (dopo l'header) in range di byte da circa
+    IMPORT_CHUNK_BYTES, ciascuno allineato all'inizio di un record.
+
+    Il corpo viene letto una volta in streaming tenendo la parità dei doppi apici da
+    data_start: un confine cade solo su un '\n' fuori dalle virgolette, quindi i campi
+    quotati con a capo non vengono mai spezzati. Se a fine file la parità è dispari
+    (apici non conformi a RFC 4180) il confine non è affidabile e il file diventa un
+    unico chunk, caricato come un import sequenziale.
+
+    Returns:
+        Lista di offset: il chunk i va da boundaries[i] a boundaries[i + 1] - 1
+    """
+    boundaries = [data_start]
+    nominal = data_start + IMPORT_CHUNK_BYTES
+    in_quotes = False
+    block_start = data_start
+    body = s3_client.get_object(
+        Bucket=BUCKET_NAME, Key=csv_key, Range=f"bytes={data_start}-", IfMatch=etag
+    )['Body']
+    try:
+        for block in body.iter_chunks(BOUNDARY_SCAN_BYTES):
+            index = 0
+            # Confini nel blocco: dal byte nominal - 1 al primo fine record
+            while nominal < size and block_start + len(block) >= nominal:
+                target = max(nominal - 1 - block_start, index)
+                in_quotes ^= bool(block.count(b'"', index, target) % 2)
+                record_end, in_quotes = next_record_end(block, target, in_quotes)
+                if record_end < 0:
+                    index = len(block)
+                    break
+                boundary = block_start + record_end
+                if boundary < size:
+                    boundaries.append(boundary)
+                nominal = boundary + IMPORT_CHUNK_BYTES
+                index = record_end
+            in_quotes ^= bool(block.count(b'"', index) % 2)
+            block_start += len(block)
+    finally:
+        body.close()
+    if in_quotes:
+        print(f"{csv_key}: virgolette non bilanciate, import in un unico chunk")
+        return [data_start, size]
+    if boundaries[-1] < size:
+        boundaries.append(size)
+    return boundaries
+
+
+def load_checkpoint(import_id: str, csv_key: str, etag: str, table_name: str,
+                    data_start: int, size: int) -> dict:
+    """
+    Legge il checkpoint dell'import da DynamoDB o lo crea con il piano dei chunk.
+    Il piano resta fisso per tutti i tentativi dello stesso import.
+    """
+    table = dynamodb.Table(IMPORTS_TABLE)
+    checkpoint = table.get_item(Key={'import_id': import_id}, ConsistentRead=True).get('Item')
+    if checkpoint:
+        return checkpoint
+    now = datetime.now()
+    checkpoint = {
+        'import_id': import_id,
+        'csv_key': csv_key,
+        'etag': etag,
+        'table_name': table_name,
+        'boundaries': plan_chunks(csv_key, etag, data_start, size),
+        'status': 'RUNNING',
+        'rows_inserted': 0,
+        'created_at': now.isoformat(),
+        'expires_at': int((now + timedelta(days=IMPORT_TTL_DAYS)).timestamp())
+    }
+    try:
+        table.put_item(Item=checkpoint, ConditionExpression='attribute_not_exists(import_id)')
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # Un'invocazione concorrente ha creato il checkpoint: si usa il suo piano
+        checkpoint = table.get_item(Key={'import_id': import_id}, ConsistentRead=True)['Item']
+    return checkpoint
+
+
+def mark_chunk_done(import_id: str, chunk_index: int, rows: int) -> None:
+    """Registra il chunk nel checkpoint DynamoDB (idempotente)."""
+    try:
+        dynamodb.Table(IMPORTS_TABLE).update_item(
+            Key={'import_id': import_id},
+            UpdateExpression='ADD completed_chunks :chunk, rows_inserted :rows SET updated_at = :now',
+            ConditionExpression='NOT contains(completed_chunks, :chunk_index)',
+            ExpressionAttributeValues={
+                ':chunk': {chunk_index},
+                ':chunk_index': chunk_index,
+                ':rows': rows,
+                ':now': datetime.now().isoformat()
+            }
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+
+def sample_csv_rows(csv_key: str, etag: str, data_start: int, width: int, limit: int) -> list:
+    """Legge in streaming le prime `limit` righe dati del CSV (dopo l'header)."""
+    csv_obj = s3_client.get_object(
+        Bucket=BUCKET_NAME, Key=csv_key, Range=f"bytes={data_start}-", IfMatch=etag
+    )
+    try:
+        rows = []
+        for batch in batch_rows(csv.reader(iter_text_lines(csv_obj['Body'])), width):
+            if isinstance(batch, dict):
+                break
+            rows.extend(batch)
+            if len(rows) >= limit:
+                break
+        return rows[:limit]
+    finally:
+        csv_obj['Body'].close()
+
+
+def purge_chunk_rows(pymysql, import_id: str) -> None:
+    """
+    Cancella da CHUNKS_TABLE le righe dell'import completato e quelle degli import
+    abbandonati più vecchie di IMPORT_TTL_DAYS (checkpoint DynamoDB già scaduto).
+    Dopo COMPLETED le righe non servono più: un nuovo tentativo si ferma al checkpoint.
+    """
+    try:
+        connection = connect_db(pymysql)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM `{CHUNKS_TABLE}` WHERE import_id = %s"
+                    f" OR committed_at < NOW() - INTERVAL {IMPORT_TTL_DAYS} DAY",
+                    (import_id,)
+                )
+            connection.commit()
+        finally:
+            release_mysql_connection(connection)
+    except Exception as e:
+        print(f"Pulizia di {CHUNKS_TABLE} fallita per {import_id}: {e}")
+
+
+def import_chunk(pymysql, import_id: str, chunk_index: int, start: int, end: int,
+                 csv_key: str, etag: str, table_name: str, headers: list, bulk: bool,
+                 nullable: set = frozenset(), bump_version: bool = False) -> dict:
+    """
+    Carica un chunk (range di byte end esclusivo) su una connessione dedicata e lo
+    committa insieme alla sua riga in CHUNKS_TABLE. Se la riga esiste già il chunk è
+    stato committato da un tentativo precedente: nessuna riga viene reinserita.
+    Con bump_version (append diretto sulla destinazione) il commit incrementa anche
+    la versione della tabella.
+
+    Returns:
+        Dizionario con chunk, rows_inserted, rows_skipped, load_method, resumed
+    """
+    connection = connect_db(pymysql, local_infile=bulk)
+    cursor = connection.cursor()
+    try:
+        try:
+            cursor.execute(
+                f"INSERT INTO `{CHUNKS_TABLE}` (import_id, chunk_index, rows_inserted) VALUES (%s, %s, 0)",
+                (import_id, chunk_index)
+            )
+        except Exception as e:
+            if not (e.args and e.args[0] == DUPLICATE_KEY_ERROR):
+                raise
+            connection.rollback()
+            cursor.execute(
+                f"SELECT rows_inserted FROM `{CHUNKS_TABLE}` WHERE import_id = %s AND chunk_index = %s",
+                (import_id, chunk_index)
+            )
+            rows = cursor.fetchone()[0]
+            mark_chunk_done(import_id, chunk_index, rows)
+            return {'chunk': chunk_index, 'rows_inserted': 0, 'rows_skipped': 0,
+                    'load_method': None, 'resumed': True}
+
+        csv_obj = s3_client.get_object(
+            Bucket=BUCKET_NAME, Key=csv_key, Range=f"bytes={start}-{end - 1}", IfMatch=etag
+        )
+        try:
+            batches = batch_rows(csv.reader(iter_text_lines(csv_obj['Body'])), len(headers))
+            if bulk:
+                load = bulk_load(cursor, batches, table_name, headers, nullable)
+            else:
+                col_list = ', '.join([f"`{h}`" for h in headers])
+                placeholders = ', '.join(['%s'] * len(headers))
+                rows_inserted, rows_skipped = insert_batches(
+                    cursor, batches_with_nulls(batches, headers, nullable), f"INSERT INTO `{table_name}` ({col_list}) VALUES ({placeholders})"
+                )
+                load = {'rows_inserted': rows_inserted, 'rows_skipped': rows_skipped,
+                        'load_method': 'executemany'}
+        finally:
+            csv_obj['Body'].close()
+
+        cursor.execute(
+            f"UPDATE `{CHUNKS_TABLE}` SET rows_inserted = %s WHERE import_id = %s AND chunk_index = %s",
+            (load['rows_inserted'], import_id, chunk_index)
+        )
+        if bump_version:
+            bump_table_version(cursor, table_name)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+        release_mysql_connection(connection)
+    if bump_version and IMPORTS_TABLE:
+        record_table_write(IMPORTS_TABLE, table_name)
+
+    mark_chunk_done(import_id, chunk_index, load['rows_inserted'])
+    return {'chunk': chunk_index, 'rows_inserted': load['rows_inserted'],
+            'rows_skipped': load['rows_skipped'], 'load_method': load['load_method'], 'resumed': False}
+
+
+def header_only_import(pymysql, import_id: str, csv_key: str, table_name: str,
+                       headers: list, mode: str, key: list) -> dict:
+    """
+    CSV con il solo header: non ci sono byte da pianificare o campionare (un GET con
+    Range oltre la fine del file fallisce con InvalidRange). La tabella viene creata
+    se non esiste; con replace viene sostituita da una tabella vuota, come nell'import
+    sequenziale.
+    """
+    load_table = table_name if mode == 'append' else staging_table_name(table_name, import_id)
+    connection = connect_db(pymysql)
+    try:
+        with connection.cursor() as cursor:
+            ensure_table_versions(cursor)
+            prepare_load_table(cursor, mode, table_name, load_table, headers, key)
+            rows_affected = finish_load(cursor, mode, table_name, load_table, headers, key)
+        connection.commit()
+    finally:
+        release_mysql_connection(connection)
+    record_table_write(IMPORTS_TABLE, table_name)
+    summary = {
+        'import_id': import_id,
+        'table_name': table_name,
+        'mode': mode,
+        'rows_inserted': 0,
+        'rows_skipped': 0,
+        'chunks_total': 0
+    }
+    if rows_affected is not None:
+        summary['rows_affected'] = rows_affected
+    log_operation(LOGS_TABLE, 'upload_to_rds', dict(summary, csv_key=csv_key, parallel=True))
+    return api_response(200, dict(summary, message='Dati caricati su RDS con successo'))
+
+
+def parallel_import(pymysql, context, csv_key: str, table_name: str, bulk: bool,
+                    workers: int, import_id: str = None, sample_limit: int = SCHEMA_SAMPLE_ROWS,
+                    raw_indexes: list = None, mode: str = 'append', raw_key=None) -> dict:
+    """
+    Import parallelo e riprendibile: il CSV viene diviso in chunk a range di byte
+    allineati alle righe, caricati su `workers` connessioni con un commit per chunk.
+
+    Il checkpoint in DynamoDB (IMPORTS_TABLE) fissa il piano dei chunk e registra quelli
+    completati: un nuovo tentativo con lo stesso import_id (job asincrono, import_id
+    esplicito o stesso file/ETag/tabella) carica solo i chunk mancanti. Se il tempo
+    residuo della Lambda non basta per un altro chunk l'import si ferma e va ripreso.
+
+    Lo schema viene dedotto dalle prime `sample_limit` righe (0 = tutte VARCHAR(255)),
+    gli indici richiesti vengono creati solo a import completato.
+
+    Con upsert e replace i chunk vengono caricati in una staging legata all'import_id,
+    fusa o scambiata con la destinazione solo quando tutti i chunk sono completati.
+
+    I confini dei chunk cadono solo su '\n' fuori dalle virgolette (plan_chunks): i campi
+    quotati possono contenere a capo come nell'import sequenziale.
+    """
+    head = s3_client.head_object(Bucket=BUCKET_NAME, Key=csv_key)
+    size = head['ContentLength']
+    etag = head['ETag']
+    if not size:
+        return api_response(400, {'error': 'CSV vuoto'})
+    identity = f"{BUCKET_NAME}|{csv_key}|{etag}|{table_name}" + (f"|{mode}" if mode != 'append' else '')
+    import_id = import_id or current_job_id() or hashlib.sha256(identity.encode('utf-8')).hexdigest()[:32]
+
+    data_start = find_line_end(csv_key, 0, size)
+    header_data = s3_client.get_object(
+        Bucket=BUCKET_NAME, Key=csv_key, Range=f"bytes=0-{max(data_start - 1, 0)}", IfMatch=etag
+    )['Body'].read()
+    raw_headers = next(csv.reader([header_data.decode('utf-8')]), None)
+    if not raw_headers:
+        return api_response(400, {'error': 'CSV vuoto'})
+    try:
+        headers = [validate_column_name(h.strip()) for h in raw_headers]
+    except ValueError as e:
+        return api_response(400, {'error': f'Header CSV non valido: {e}'})
+    try:
+        indexes = parse_indexes(raw_indexes, headers)
+        key = parse_key(raw_key, headers) if mode == 'upsert' else []
+    except ValueError as e:
+        return api_response(400, {'error': str(e)})
+
+    if data_start >= size:
+        return header_only_import(pymysql, import_id, csv_key, table_name, headers, mode, key)
+
+    checkpoint = load_checkpoint(import_id, csv_key, etag, table_name, data_start, size)
+    if checkpoint['etag'] != etag:
+        return api_response(409, {
+            'error': 'Il file CSV è cambiato dall\'inizio dell\'import: usare un nuovo import_id',
+            'import_id': import_id
+        })
+    boundaries = [int(b) for b in checkpoint['boundaries']]
+    chunks_total = len(boundaries) - 1
+    completed = {int(c) for c in checkpoint.get('completed_chunks', set())}
+    if checkpoint.get('status') == 'COMPLETED':
+        return api_response(200, {
+            'message': 'Import già completato',
+            'import_id': import_id,
+            'table_name': table_name,
+            'rows_inserted': 0,
+            'rows_total': checkpoint.get('rows_inserted', 0),
+            'chunks_total': chunks_total,
+            'already_imported': True
+        })
+
+    # FINALIZING: tutti i chunk caricati, merge/swap della staging forse già eseguito
+    finalizing = checkpoint.get('status') == 'FINALIZING'
+    load_table = table_name if mode == 'append' else staging_table_name(table_name, import_id)
+    nullable, column_types = frozenset(), None
+    connection = connect_db(pymysql)
+    try:
+        with connection.cursor() as cursor:
+            sample = None
+            if sample_limit:
+                def sample():
+                    return sample_csv_rows(csv_key, etag, data_start, len(headers), sample_limit)
+            if not finalizing:
+                nullable, column_types = prepare_load_table(
+                    cursor, mode, table_name, load_table, headers, key, sample
+                )
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS `{CHUNKS_TABLE}` ("
+                f"  import_id VARCHAR(64) NOT NULL,"
+                f"  chunk_index INT NOT NULL,"
+                f"  rows_inserted BIGINT NOT NULL DEFAULT 0,"
+                f"  committed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,"
+                f"  PRIMARY KEY (import_id, chunk_index)"
+                f")"
+            )
+            ensure_table_versions(cursor)
+        connection.commit()
+    finally:
+        release_mysql_connection(connection)
+
+    pending = iter([i for i in range(chunks_total) if i not in completed])
+    results = []
+    errors = []
+    stopped_early = False
+    started = time.monotonic()
+
+    def time_left() -> bool:
+        return context is None or context.get_remaining_time_in_millis() > IMPORT_MIN_REMAINING_MS
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+
+        def submit_next() -> None:
+            nonlocal stopped_early
+            if errors:
+                return
+            chunk_index = next(pending, None)
+            if chunk_index is None:
+                return
+            if not time_left():
+                stopped_early = True
+                return
+            running[executor.submit(
+                import_chunk, pymysql, import_id, chunk_index, boundaries[chunk_index],
+                boundaries[chunk_index + 1], csv_key, etag, load_table, headers, bulk, nullable,
+                mode == 'append'
+            )] = chunk_index
+
+        for _ in range(workers):
+            submit_next()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk_index = running.pop(future)
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"Chunk {chunk_index} fallito: {e}")
+                    errors.append(e)
+                submit_next()
+
+    elapsed = time.monotonic() - started
+    rows_inserted = sum(r['rows_inserted'] for r in results)
+    rows_skipped = sum(r['rows_skipped'] for r in results)
+    if errors:
+        # I chunk già committati restano nel checkpoint: un nuovo tentativo riprende da lì
+        raise errors[0]
+
+    chunks_done = len(completed) + len(results)
+    summary = {
+        'import_id': import_id,
+        'table_name': table_name,
+        'rows_inserted': rows_inserted,
+        'rows_skipped': rows_skipped,
+        'chunks_total': chunks_total,
+        'chunks_done': chunks_done,
+        'chunks_resumed': len(completed) + sum(1 for r in results if r['resumed']),
+        'workers': workers,
+        'load_method': next((r['load_method'] for r in results if r['load_method']), None),
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(rows_inserted / elapsed) if elapsed > 0 else rows_inserted
+    }
+    if stopped_early or chunks_done < chunks_total:
+        if current_job_id():
+            raise JobRetry(f"import {import_id}: {chunks_done}/{chunks_total} chunk completati")
+        return api_response(202, dict(summary, message='Import parziale: ripetere la richiesta per riprendere'))
+
+    dynamodb.Table(IMPORTS_TABLE).update_item(
+        Key={'import_id': import_id},
+        UpdateExpression='SET #status = :finalizing',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={':finalizing': 'FINALIZING'}
+    )
+    connection = connect_db(pymysql)
+    try:
+        with connection.cursor() as cursor:
+            # Con replace gli indici vanno sulla staging finché non è stata scambiata
+            index_table = load_table if mode == 'replace' and table_columns(cursor, load_table) else table_name
+            summary['indexes_created'] = create_indexes(cursor, index_table, indexes)
+            rows_affected = finish_load(cursor, mode, table_name, load_table, headers, key)
+        connection.commit()
+    finally:
+        release_mysql_connection(connection)
+    record_table_write(IMPORTS_TABLE, table_name)
+    summary['mode'] = mode
+    if rows_affected is not None:
+        summary['rows_affected'] = rows_affected
+    if column_types:
+        summary['column_types'] = column_types
+
+    checkpoint = dynamodb.Table(IMPORTS_TABLE).update_item(
+        Key={'import_id': import_id},
+        UpdateExpression='SET #status = :completed, completed_at = :now',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={':completed': 'COMPLETED', ':now': datetime.now().isoformat()},
+        ReturnValues='ALL_NEW'
+    )['Attributes']
+    summary['rows_total'] = checkpoint.get('rows_inserted', rows_inserted)
+    purge_chunk_rows(pymysql, import_id)
+    log_operation(LOGS_TABLE, 'upload_to_rds', dict(
+        summary, csv_key=csv_key, parallel=True, connection_pool=mysql_pool_stats()
+    ))
+    return api_response(200, dict(summary, message='Dati caricati su RDS con successo'))
+
 
 def lambda_handler(event, context):
     """
@@ -30,13 +1256,45 @@ def lambda_handler(event, context):
     Input (body JSON):
     {
         "csv_key": "path/to/file.csv",
-        "table_name": "target_table"  # solo lettere, cifre, underscore
+        "table_name": "target_table",  # solo lettere, cifre, underscore
+        "mode": "append",              # opzionale, append | upsert | replace
+        "key": ["col"],                # obbligatoria con upsert, colonna o colonne chiave
+        "bulk": false,                 # opzionale, LOAD DATA LOCAL INFILE o INSERT multi-riga (default true con upsert/replace)
+        "parallel": false,             # opzionale, chunk in parallelo con checkpoint (riprendibile)
+        "workers": 4,                  # opzionale, connessioni in parallelo (solo con parallel)
+        "import_id": "...",            # opzionale, id del checkpoint (lettere, cifre, _ e -, max 64; default: file + ETag + tabella)
+        "infer_schema": false,         # opzionale, tipi colonna dedotti da un campione (default RDS_INFER_SCHEMA)
+        "sample_rows": 10000,          # opzionale, righe campionate per l'inferenza
+        "indexes": ["col", ["a", "b"]],  # opzionale, indici (semplici o composti) creati dopo il caricamento
+        "async": false                 # opzionale, esegue come job e risponde 202 con job_id
     }
+
+    Con upsert e replace il CSV viene caricato in una tabella di staging: upsert la
+    fonde nella destinazione con INSERT ... ON DUPLICATE KEY UPDATE sulla chiave,
+    replace la sostituisce alla destinazione con un RENAME TABLE atomico. In entrambi
+    i casi i lettori vedono la tabella prima o dopo l'import, mai a metà.
+
+    Lo schema viene dedotto solo quando la tabella non esiste ancora. Valori successivi
+    al campione non compatibili con il tipo dedotto fanno fallire l'import: in quel
+    caso aumentare sample_rows o usare infer_schema: false.
+
+    La risposta riporta il metodo di caricamento e il throughput (rows_per_second).
     """
+    if is_job_queue_event(event):
+        return run_queued_jobs(event, context, JOBS_TABLE, lambda_handler)
+
     try:
         body = json.loads(event.get('body', '{}'))
         csv_key = body.get('csv_key')
         table_name_raw = body.get('table_name', 'imported_data')
+        mode = body.get('mode', 'append')
+        raw_key = body.get('key')
+        bulk = bool(body.get('bulk', mode != 'append'))
+        parallel = bool(body.get('parallel', False))
+        workers = body.get('workers', IMPORT_WORKERS)
+        sample_limit = body.get('sample_rows', SCHEMA_SAMPLE_ROWS)
+        raw_indexes = body.get('indexes')
+        import_id = body.get('import_id')
 
         if not csv_key:
             return api_response(400, {'error': 'csv_key is required'})
@@ -50,9 +1308,26 @@ def lambda_handler(event, context):
         if not DB_HOST:
             return api_response(500, {'error': 'Credenziali RDS non configurate (DB_HOST vuoto)'})
 
-        # Scarica CSV da S3
-        csv_obj = s3_client.get_object(Bucket=BUCKET_NAME, Key=csv_key)
-        csv_content = csv_obj['Body'].read().decode('utf-8')
+        if mode not in IMPORT_MODES:
+            return api_response(400, {'error': f"mode deve essere uno tra: {', '.join(IMPORT_MODES)}"})
+        if mode == 'upsert' and not raw_key:
+            return api_response(400, {'error': 'key è obbligatoria con mode "upsert"'})
+
+        if isinstance(sample_limit, bool) or not isinstance(sample_limit, int) or sample_limit < 1:
+            return api_response(400, {'error': 'sample_rows deve essere un intero positivo'})
+        if not body.get('infer_schema', INFER_SCHEMA_DEFAULT):
+            sample_limit = 0
+
+        if parallel:
+            if not IMPORTS_TABLE:
+                return api_response(500, {'error': 'Tabella checkpoint non configurata (DYNAMODB_IMPORTS_TABLE vuoto)'})
+            if isinstance(workers, bool) or not isinstance(workers, int) or workers < 1 or workers > 16:
+                return api_response(400, {'error': 'workers deve essere un intero tra 1 e 16'})
+            if import_id is not None and not (isinstance(import_id, str) and IMPORT_ID_PATTERN.match(import_id)):
+                return api_response(400, {'error': 'import_id non valido: solo lettere, cifre, _ e - (max 64 caratteri)'})
+
+        if body.get('async') and JOBS_TABLE:
+            return enqueue_job(JOBS_TABLE, 'upload_to_rds', body)
 
         try:
             import pymysql
@@ -64,68 +1339,94 @@ def lambda_handler(event, context):
                 'suggestion': 'Creare un layer con: pip install pymysql -t python/ && zip -r layer.zip python/'
             })
 
-        connection = pymysql.connect(
-            host=DB_HOST,
-            user=DB_USERNAME,
-            password=DB_PASSWORD,
-            database=DB_DATABASE,
-            port=DB_PORT,
-            connect_timeout=10,
-            autocommit=False
-        )
+        if parallel:
+            return parallel_import(
+                pymysql, context, csv_key, table_name, bulk, workers,
+                import_id=import_id, sample_limit=sample_limit,
+                raw_indexes=raw_indexes, mode=mode, raw_key=raw_key
+            )
 
-        try:
-            cursor = connection.cursor()
-            csv_reader = csv.reader(io.StringIO(csv_content))
+        # Il CSV viene letto da S3 in streaming, senza scaricarlo per intero
+        csv_obj = s3_client.get_object(Bucket=BUCKET_NAME, Key=csv_key)
+
+        connection = connect_db(pymysql, local_infile=bulk)
 
+        cursor = connection.cursor()
+        csv_batches = stream_csv_batches(csv_obj['Body'])
+        load_table = table_name
+        try:
             # Leggi header e valida ogni nome colonna
-            raw_headers = next(csv_reader)
+            raw_headers = next(csv_batches, None)
+            if raw_headers is None:
+                return api_response(400, {'error': 'CSV vuoto'})
             try:
                 headers = [validate_column_name(h.strip()) for h in raw_headers]
             except ValueError as e:
                 return api_response(400, {'error': f'Header CSV non valido: {e}'})
+            try:
+                indexes = parse_indexes(raw_indexes, headers)
+                key = parse_key(raw_key, headers) if mode == 'upsert' else []
+            except ValueError as e:
+                return api_response(400, {'error': str(e)})
 
-            # Crea tabella se non esiste — nomi già validati, sicuri da usare direttamente
-            columns_def = ', '.join([f"`{col}` VARCHAR(255)" for col in headers])
-            create_table_sql = (
-                f"CREATE TABLE IF NOT EXISTS `{table_name}` ("
-                f"  id INT AUTO_INCREMENT PRIMARY KEY,"
-                f"  {columns_def},"
-                f"  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
-                f")"
-            )
-            cursor.execute(create_table_sql)
+            # Le righe campione lette per l'inferenza tornano in testa allo stream
+            batches = csv_batches
+            sample = None
+            if sample_limit:
+                def sample():
+                    nonlocal batches
+                    consumed, rows = sample_rows(csv_batches, sample_limit)
+                    batches = itertools.chain(consumed, csv_batches)
+                    return rows
+            if mode != 'append':
+                load_table = staging_table_name(table_name, uuid.uuid4().hex)
+            nullable, column_types = prepare_load_table(cursor, mode, table_name, load_table, headers, key, sample)
+            ensure_table_versions(cursor)
 
             # Insert con parametri bind (sicuro da SQL injection sui valori)
             col_list = ', '.join([f"`{h}`" for h in headers])
             placeholders = ', '.join(['%s'] * len(headers))
-            insert_sql = f"INSERT INTO `{table_name}` ({col_list}) VALUES ({placeholders})"
+            insert_sql = f"INSERT INTO `{load_table}` ({col_list}) VALUES ({placeholders})"
 
-            rows_inserted = 0
-            batch = []
-            BATCH_SIZE = 100
-
-            for row in csv_reader:
-                if len(row) != len(headers):
-                    continue  # Salta righe malformate
-                batch.append(tuple(row))
-                if len(batch) >= BATCH_SIZE:
-                    cursor.executemany(insert_sql, batch)
-                    rows_inserted += len(batch)
-                    batch = []
-
-            if batch:
-                cursor.executemany(insert_sql, batch)
-                rows_inserted += len(batch)
+            started = time.monotonic()
+            if bulk:
+                load = bulk_load(cursor, batches, load_table, headers, nullable)
+                rows_inserted = load['rows_inserted']
+                rows_skipped = load['rows_skipped']
+                load_method = load['load_method']
+            else:
+                rows_inserted, rows_skipped = insert_batches(
+                    cursor, batches_with_nulls(batches, headers, nullable), insert_sql
+                )
+                load_method = 'executemany'
 
+            if mode == 'append':
+                bump_table_version(cursor, table_name)
             connection.commit()
+            # Con replace gli indici vanno creati prima che la staging diventi visibile
+            indexes_created = create_indexes(cursor, load_table if mode == 'replace' else table_name, indexes)
+            rows_affected = finish_load(cursor, mode, table_name, load_table, headers, key)
+            connection.commit()
+            elapsed = time.monotonic() - started
+            rows_per_second = round(rows_inserted / elapsed) if elapsed > 0 else rows_inserted
 
         except Exception:
-            connection.rollback()
+            # Un errore nella pulizia (es. connessione persa) non deve sostituire quello originale
+            try:
+                connection.rollback()
+                if load_table != table_name:
+                    cursor.execute(f"DROP TABLE IF EXISTS `{load_table}`")
+            except Exception as cleanup_error:
+                print(f"Pulizia della staging {load_table} fallita: {cleanup_error}")
             raise
         finally:
+            csv_batches.close()
             cursor.close()
-            connection.close()
+            release_mysql_connection(connection)
+
+        # Per qualche secondo le letture di questa tabella vanno al writer (read-your-writes)
+        if IMPORTS_TABLE:
+            record_table_write(IMPORTS_TABLE, table_name)
 
         log_operation(
             LOGS_TABLE,
@@ -133,16 +1434,34 @@ def lambda_handler(event, context):
             {
                 'csv_key': csv_key,
                 'table_name': table_name,
-                'rows_inserted': rows_inserted
+                'mode': mode,
+                'rows_inserted': rows_inserted,
+                'rows_skipped': rows_skipped,
+                'load_method': load_method,
+                'rows_per_second': rows_per_second,
+                'connection_pool': mysql_pool_stats()
             }
         )
 
-        return api_response(200, {
+        response = {
             'message': 'Dati caricati su RDS con successo',
             'table_name': table_name,
-            'rows_inserted': rows_inserted
-        })
+            'mode': mode,
+            'rows_inserted': rows_inserted,
+            'rows_skipped': rows_skipped,
+            'load_method': load_method,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': rows_per_second,
+            'indexes_created': indexes_created
+        }
+        if rows_affected is not None:
+            response['rows_affected'] = rows_affected
+        if column_types:
+            response['column_types'] = column_types
+        return api_response(200, response)
 
+    except JobRetry:
+        raise
     except Exception as e:
         log_operation(LOGS_TABLE, 'upload_to_rds', {'error': str(e)}, 'error')
         return api_response(500, {'error': str(e)})
@@ -2,16 +2,67 @@
 Modulo condiviso per le Lambda functions.
 Contiene utility comuni per evitare duplicazione di codice.
 """
+import base64
+import io
 import json
 import os
 import re
+import threading
+import time
 import uuid
 import boto3
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from decimal import Decimal
 
+from botocore.exceptions import ClientError
+
 dynamodb = boto3.resource('dynamodb')
 
+# Job asincroni: giorni di conservazione e dimensione massima del risultato salvato
+# (un item DynamoDB è limitato a 400 KB)
+JOB_TTL_DAYS = 7
+JOB_RESULT_MAX_BYTES = 300 * 1024
+
+# Job in esecuzione nell'invocazione corrente (None se la Lambda risponde ad API Gateway)
+_current_job = None
+
+# Pool di connessioni MySQL riusate tra invocazioni "calde" della stessa istanza Lambda:
+# connessioni inattive tenute per parametri di connessione, scartate prima che il server
+# le chiuda per wait_timeout (margine di sicurezza in secondi)
+MYSQL_POOL_SIZE = int(os.environ.get('RDS_POOL_SIZE', '4'))
+MYSQL_IDLE_MARGIN_SECONDS = 30
+_mysql_pool = {}
+_mysql_wait_timeouts = {}
+_mysql_pool_lock = threading.Lock()
+_mysql_pool_stats = {'hits': 0, 'misses': 0, 'reconnects': 0, 'expired': 0}
+
+# Repliche Aurora in lettura: round-robin sugli host sani. Un host che non accetta la
+# connessione entro MYSQL_READER_CONNECT_TIMEOUT secondi resta escluso per
+# MYSQL_READER_COOLDOWN_SECONDS; senza repliche disponibili si legge dal writer
+MYSQL_READER_CONNECT_TIMEOUT = 3
+MYSQL_READER_COOLDOWN_SECONDS = 30
+_reader_next = 0
+_reader_down_until = {}
+
+# Read-your-writes: istante dell'ultimo import di ogni tabella, item "table#<tabella>"
+# nella tabella DynamoDB degli import
+TABLE_WRITE_KEY_PREFIX = 'table#'
+
+# Versione dei dati di ogni tabella: contatore in MySQL incrementato da upload_to_rds
+# quando rende visibili nuovi dati, usato come chiave dalla cache dei risultati di read_from_rds
+TABLE_VERSIONS_TABLE = '_table_versions'
+MYSQL_NO_SUCH_TABLE_ERROR = 1146
+_table_versions_ready = False
+
+
+# Header CORS delle risposte API (i preflight OPTIONS sono gestiti da API Gateway)
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+    'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+}
+
 
 def log_operation(logs_table_name: str, operation: str, details: dict, status: str = 'success') -> None:
     """
@@ -56,14 +107,15 @@ def api_response(status_code: int, body: dict, cors: bool = True) -> dict:
 
     Returns:
         Dizionario compatibile con API Gateway proxy integration
+
+    Quando la Lambda sta eseguendo un job asincrono (run_queued_jobs) la risposta
+    non ha un client in attesa: status e body vengono registrati nella tabella dei job.
     """
+    if _current_job is not None:
+        record_job_result(status_code, body)
     headers = {'Content-Type': 'application/json'}
     if cors:
-        headers.update({
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
-        })
+        headers.update(CORS_HEADERS)
     return {
         'statusCode': status_code,
         'headers': headers,
@@ -71,6 +123,390 @@ def api_response(status_code: int, body: dict, cors: bool = True) -> dict:
     }
 
 
+def api_binary_response(status_code: int, data: bytes, content_type: str,
+                        headers: dict = None) -> dict:
+    """
+    Risposta binaria per API Gateway: il body viaggia in base64 e API Gateway lo
+    restituisce come byte se l'header Accept della richiesta è tra i binary_media_types
+    della REST API.
+
+    Args:
+        status_code: Codice HTTP di risposta
+        data: Contenuto del body
+        content_type: Content-Type della risposta
+        headers: Header aggiuntivi (es. Content-Encoding); resi leggibili via CORS
+    """
+    response_headers = dict(CORS_HEADERS, **{'Content-Type': content_type})
+    if headers:
+        response_headers.update(headers)
+        response_headers['Access-Control-Expose-Headers'] = ','.join(headers)
+    return {
+        'statusCode': status_code,
+        'headers': response_headers,
+        'body': base64.b64encode(data).decode('ascii'),
+        'isBase64Encoded': True
+    }
+
+
+def current_job_id():
+    """Restituisce il job_id del job asincrono in esecuzione, None in modalità sincrona."""
+    return _current_job['job_id'] if _current_job is not None else None
+
+
+class JobRetry(Exception):
+    """
+    Sollevata da un handler in esecuzione come job asincrono per chiedere un nuovo
+    tentativo (es. import fermato prima del timeout, da riprendere dal checkpoint):
+    il messaggio SQS torna visibile dopo il visibility timeout e il job resta RUNNING.
+    """
+
+
+def is_job_queue_event(event: dict) -> bool:
+    """True se l'evento arriva dalla coda SQS dei job asincroni (event source mapping)."""
+    records = event.get('Records') or [{}]
+    return records[0].get('eventSource') == 'aws:sqs'
+
+
+def enqueue_job(jobs_table_name: str, operation: str, request: dict) -> dict:
+    """
+    Accoda una richiesta come job asincrono e risponde subito con 202.
+
+    L'inserimento dell'item (status QUEUED) nella tabella dei job è anche l'accodamento:
+    una EventBridge Pipe legge lo stream della tabella e inoltra il job_id alla coda SQS
+    dell'operazione, da cui la stessa Lambda lo esegue (run_queued_jobs). Così anche le
+    Lambda in VPC accodano i job tramite il Gateway Endpoint DynamoDB, senza Interface
+    Endpoint per SQS.
+
+    Args:
+        jobs_table_name: Nome della tabella DynamoDB dei job
+        operation: Nome dell'operazione (es. 'excel_to_csv'), usato per instradare il job
+        request: Body della richiesta da eseguire (il flag 'async' viene rimosso)
+
+    Returns:
+        Risposta API Gateway 202 con job_id
+    """
+    request = {key: value for key, value in request.items() if key != 'async'}
+    job_id = uuid.uuid4().hex
+    now = datetime.now()
+    dynamodb.Table(jobs_table_name).put_item(
+        Item={
+            'job_id': job_id,
+            'operation': operation,
+            'status': 'QUEUED',
+            'request': json.dumps(request),
+            'attempts': 0,
+            'created_at': now.isoformat(),
+            'updated_at': now.isoformat(),
+            'expires_at': int((now + timedelta(days=JOB_TTL_DAYS)).timestamp())
+        }
+    )
+    return api_response(202, {
+        'message': 'Job accodato',
+        'job_id': job_id,
+        'status': 'QUEUED',
+        'status_url': f"/jobs/{job_id}"
+    })
+
+
+def record_job_result(status_code: int, body: dict) -> None:
+    """
+    Registra nella tabella dei job l'esito del job in esecuzione.
+
+    202 lascia il job in RUNNING (es. extract_zip in modalità distribuita, completato
+    dall'ultimo shard); < 400 → COMPLETED; altrimenti FAILED. Se il risultato supera
+    JOB_RESULT_MAX_BYTES vengono salvati solo i campi scalari (es. contatori).
+    """
+    job = _current_job
+    status = 'RUNNING' if status_code == 202 else ('COMPLETED' if status_code < 400 else 'FAILED')
+    result = json.dumps(body, default=decimal_default)
+    if len(result) > JOB_RESULT_MAX_BYTES:
+        summary = {key: value for key, value in body.items() if not isinstance(value, (list, dict))}
+        summary['result_truncated'] = True
+        result = json.dumps(summary, default=decimal_default)
+    update = {
+        'Key': {'job_id': job['job_id']},
+        'UpdateExpression': 'SET #status = :status, status_code = :code, #result = :result, updated_at = :now',
+        'ExpressionAttributeNames': {'#status': 'status', '#result': 'result'},
+        'ExpressionAttributeValues': {
+            ':status': status, ':code': status_code, ':result': result, ':now': datetime.now().isoformat()
+        }
+    }
+    if status == 'RUNNING':
+        # Gli shard potrebbero aver già completato il job: non riportarlo in RUNNING
+        update['ConditionExpression'] = '#status <> :completed'
+        update['ExpressionAttributeValues'][':completed'] = 'COMPLETED'
+    try:
+        dynamodb.Table(job['table']).update_item(**update)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            print(f"Errore aggiornamento job {job['job_id']}: {e}")
+
+
+def run_queued_jobs(event: dict, context, jobs_table_name: str, handler) -> dict:
+    """
+    Esegue i job ricevuti dalla coda SQS con lo stesso handler usato da API Gateway.
+
+    Per ogni messaggio il job passa a RUNNING (solo se QUEUED o RUNNING: un retry dopo
+    un timeout riparte, un job già concluso non viene rieseguito), poi l'handler riceve
+    un evento con il body originale e la sua api_response registra l'esito.
+
+    Returns:
+        Risposta per l'event source mapping con i messaggi da ritentare (batchItemFailures)
+    """
+    global _current_job
+    table = dynamodb.Table(jobs_table_name)
+    failures = []
+    for record in event['Records']:
+        job_id = json.loads(record['body'])['job_id']
+        try:
+            job = table.update_item(
+                Key={'job_id': job_id},
+                UpdateExpression='SET #status = :running, updated_at = :now ADD attempts :one',
+                ConditionExpression='#status IN (:queued, :running)',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={
+                    ':running': 'RUNNING', ':queued': 'QUEUED', ':one': 1,
+                    ':now': datetime.now().isoformat()
+                },
+                ReturnValues='ALL_NEW'
+            )['Attributes']
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                print(f"Job {job_id} già concluso, messaggio ignorato")
+            else:
+                print(f"Errore avvio job {job_id}: {e}")
+                failures.append({'itemIdentifier': record['messageId']})
+            continue
+
+        _current_job = {'table': jobs_table_name, 'job_id': job_id}
+        try:
+            handler({'body': job['request'], 'job_id': job_id}, context)
+        except JobRetry as e:
+            print(f"Job {job_id} da riprendere: {e}")
+            failures.append({'itemIdentifier': record['messageId']})
+        except Exception as e:
+            print(f"Errore esecuzione job {job_id}: {e}")
+            record_job_result(500, {'error': str(e)})
+        finally:
+            _current_job = None
+    return {'batchItemFailures': failures}
+
+
+def acquire_mysql_connection(pymysql, **connect_kwargs):
+    """
+    Restituisce una connessione MySQL dal pool del processo, o ne apre una nuova.
+
+    Una connessione riusata viene verificata con ping (riconnessa se il server l'ha
+    chiusa); quelle inattive da più di wait_timeout - MYSQL_IDLE_MARGIN_SECONDS
+    vengono chiuse senza tentare il riuso. Va sempre restituita con
+    release_mysql_connection() al posto di close().
+
+    Args:
+        pymysql: Modulo pymysql (importato dal chiamante, dipendenza opzionale)
+        connect_kwargs: Parametri di pymysql.connect, usati anche come chiave del pool
+    """
+    key = tuple(sorted(connect_kwargs.items(), key=lambda item: item[0]))
+    connection = None
+    with _mysql_pool_lock:
+        idle = _mysql_pool.get(key, [])
+        max_idle = _mysql_wait_timeouts.get(key, 0) - MYSQL_IDLE_MARGIN_SECONDS
+        while idle and connection is None:
+            candidate, released_at = idle.pop()
+            if time.monotonic() - released_at < max_idle:
+                connection = candidate
+            else:
+                _mysql_pool_stats['expired'] += 1
+                _close_quietly(candidate)
+
+    if connection is not None:
+        try:
+            connection.ping(reconnect=False)
+            _count_pool_event('hits')
+        except Exception:
+            connection.ping(reconnect=True)
+            _count_pool_event('reconnects')
+    else:
+        connection = pymysql.connect(**connect_kwargs)
+        _count_pool_event('misses')
+
+    if key not in _mysql_wait_timeouts:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT @@SESSION.wait_timeout")
+            row = cursor.fetchone()
+        wait_timeout = int(list(row.values())[0] if isinstance(row, dict) else row[0])
+        with _mysql_pool_lock:
+            _mysql_wait_timeouts[key] = wait_timeout
+    connection._pool_key = key
+    return connection
+
+
+def release_mysql_connection(connection) -> None:
+    """
+    Restituisce al pool una connessione di acquire_mysql_connection(). Eventuali
+    transazioni aperte vengono annullate: la prossima invocazione non vede uno
+    snapshot vecchio. Oltre MYSQL_POOL_SIZE connessioni inattive la connessione è chiusa.
+    """
+    key = getattr(connection, '_pool_key', None)
+    try:
+        if key is None or not connection.open:
+            _close_quietly(connection)
+            return
+        if not connection.get_autocommit():
+            connection.rollback()
+    except Exception:
+        _close_quietly(connection)
+        return
+    with _mysql_pool_lock:
+        idle = _mysql_pool.setdefault(key, [])
+        if len(idle) < MYSQL_POOL_SIZE:
+            idle.append((connection, time.monotonic()))
+            return
+    _close_quietly(connection)
+
+
+def mysql_pool_stats() -> dict:
+    """Contatori del pool dall'avvio dell'istanza Lambda (hits, misses, reconnects, expired, idle)."""
+    with _mysql_pool_lock:
+        stats = dict(_mysql_pool_stats)
+        stats['idle'] = sum(len(idle) for idle in _mysql_pool.values())
+    return stats
+
+
+def _count_pool_event(name: str) -> None:
+    with _mysql_pool_lock:
+        _mysql_pool_stats[name] += 1
+
+
+def _close_quietly(connection) -> None:
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def acquire_read_connection(pymysql, reader_hosts: list, **connect_kwargs) -> tuple:
+    """
+    Connessione per sola lettura: una replica scelta in round-robin tra quelle sane, con
+    fallback sul writer (connect_kwargs['host']) se non ci sono repliche configurate o
+    raggiungibili. Le connessioni vengono dal pool di acquire_mysql_connection(), che le
+    verifica con ping; una replica che non risponde viene esclusa per
+    MYSQL_READER_COOLDOWN_SECONDS e poi ritentata.
+
+    Returns:
+        Tupla (connessione, host, ruolo: 'reader' o 'writer')
+    """
+    global _reader_next
+    if reader_hosts:
+        with _mysql_pool_lock:
+            start = _reader_next % len(reader_hosts)
+            _reader_next = start + 1
+        reader_kwargs = dict(connect_kwargs, connect_timeout=min(
+            connect_kwargs.get('connect_timeout', MYSQL_READER_CONNECT_TIMEOUT), MYSQL_READER_CONNECT_TIMEOUT
+        ))
+        for host in reader_hosts[start:] + reader_hosts[:start]:
+            if _reader_down_until.get(host, 0) > time.monotonic():
+                continue
+            reader_kwargs['host'] = host
+            try:
+                return acquire_mysql_connection(pymysql, **reader_kwargs), host, 'reader'
+            except Exception as e:
+                print(f"Replica {host} non raggiungibile, esclusa per {MYSQL_READER_COOLDOWN_SECONDS}s: {e}")
+                mark_reader_down(host)
+    return acquire_mysql_connection(pymysql, **connect_kwargs), connect_kwargs.get('host'), 'writer'
+
+
+def mark_reader_down(host: str) -> None:
+    """Esclude una replica dal round-robin per MYSQL_READER_COOLDOWN_SECONDS."""
+    _reader_down_until[host] = time.monotonic() + MYSQL_READER_COOLDOWN_SECONDS
+
+
+def record_table_write(imports_table_name: str, table_name: str) -> None:
+    """
+    Registra l'istante dell'ultimo import in table_name: per qualche secondo le letture
+    di quella tabella vanno al writer (table_written_within) invece che alle repliche.
+    """
+    now = time.time()
+    try:
+        dynamodb.Table(imports_table_name).put_item(
+            Item={
+                'import_id': f"{TABLE_WRITE_KEY_PREFIX}{table_name}",
+                'table_name': table_name,
+                'written_at': Decimal(str(round(now, 3))),
+                'expires_at': int(now) + JOB_TTL_DAYS * 86400
+            }
+        )
+    except Exception as e:
+        print(f"Errore registrazione import di {table_name}: {e}")
+
+
+def table_written_within(imports_table_name: str, table_name: str, seconds: int) -> bool:
+    """
+    True se table_name è stata importata negli ultimi `seconds` secondi (lettura
+    consistente). In caso di errore True: meglio il writer che dati non aggiornati.
+    """
+    try:
+        item = dynamodb.Table(imports_table_name).get_item(
+            Key={'import_id': f"{TABLE_WRITE_KEY_PREFIX}{table_name}"}, ConsistentRead=True
+        ).get('Item')
+    except Exception as e:
+        print(f"Errore lettura ultimo import di {table_name}: {e}")
+        return True
+    return item is not None and time.time() - float(item['written_at']) < seconds
+
+
+def ensure_table_versions(cursor) -> None:
+    """
+    Crea la tabella delle versioni se non esiste (una volta per istanza Lambda).
+    CREATE TABLE esegue un commit implicito: chiamarla fuori dalle transazioni dei dati.
+    """
+    global _table_versions_ready
+    if _table_versions_ready:
+        return
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS `{TABLE_VERSIONS_TABLE}` ("
+        f"  table_name VARCHAR(64) NOT NULL PRIMARY KEY,"
+        f"  version BIGINT UNSIGNED NOT NULL,"
+        f"  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+        f")"
+    )
+    _table_versions_ready = True
+
+
+def bump_table_version(cursor, table_name: str) -> None:
+    """
+    Incrementa la versione dei dati di table_name nella transazione corrente: va eseguita
+    prima del commit che rende visibili i dati (o subito dopo, per le DDL). Una versione
+    non diventa mai visibile prima dei suoi dati, quindi un risultato messo in cache con
+    quella versione non può essere più vecchio di lei.
+    """
+    ensure_table_versions(cursor)
+    cursor.execute(
+        f"INSERT INTO `{TABLE_VERSIONS_TABLE}` (table_name, version) VALUES (%s, 1) "
+        f"ON DUPLICATE KEY UPDATE version = version + 1",
+        (table_name,)
+    )
+
+
+def table_version(cursor, table_name: str):
+    """
+    Versione corrente dei dati di table_name.
+
+    Returns:
+        Intero, o None se la tabella non è mai stata scritta da upload_to_rds
+        (i suoi dati possono cambiare senza preavviso: non vanno messi in cache)
+    """
+    try:
+        cursor.execute(f"SELECT version FROM `{TABLE_VERSIONS_TABLE}` WHERE table_name = %s", (table_name,))
+    except Exception as e:
+        if e.args and e.args[0] == MYSQL_NO_SUCH_TABLE_ERROR:
+            return None
+        raise
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return int(row['version'] if isinstance(row, dict) else row[0])
+
+
 def validate_s3_key(filename: str) -> str:
     """
     Valida e sanitizza un nome file/key S3 per prevenire path traversal.
@@ -112,7 +548,9 @@ def validate_s3_key(filename: str) -> str:
 def validate_table_name(name: str) -> str:
     """
     Valida e sanitizza un nome di tabella SQL.
-    Accetta solo caratteri alfanumerici e underscore.
+    Accetta solo caratteri alfanumerici e underscore e deve iniziare con una lettera:
+    i nomi con _ iniziale sono riservati alle tabelle interne (_table_versions,
+    _upload_chunks, tabelle di staging _stg_ e _old_).
 
     Args:
         name: Nome tabella da validare
@@ -123,10 +561,12 @@ def validate_table_name(name: str) -> str:
     Raises:
         ValueError: Se il nome contiene caratteri non consentiti
     """
-    if not re.match(r'^[a-zA-Z_][a-zA-Z0-9_]{0,63}$', name):
+    if name.startswith('_'):
+        raise ValueError(f"Nome tabella riservato: '{name}'. I nomi che iniziano con _ sono usati dalle tabelle interne.")
+    if not re.match(r'^[a-zA-Z][a-zA-Z0-9_]{0,63}$', name):
         raise ValueError(
             f"Nome tabella non valido: '{name}'. "
-            "Sono consentiti solo lettere, cifre e underscore (max 64 caratteri, deve iniziare con lettera o _)."
+            "Sono consentiti solo lettere, cifre e underscore (max 64 caratteri, deve iniziare con una lettera)."
         )
     return name
 
@@ -152,6 +592,155 @@ def validate_column_name(name: str) -> str:
     return name
 
 
+# Limiti S3 per il multipart upload
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+S3_MAX_PARTS = 10000
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Writer file-like che scrive su S3 tramite multipart upload.
+
+    I dati scritti vengono accumulati fino a part_size e ogni parte viene caricata
+    in parallelo (max_concurrency parti in volo), quindi la memoria usata è al massimo
+    part_size * (max_concurrency + 1) indipendentemente dalla dimensione dell'oggetto.
+    Se il totale scritto non raggiunge una parte si usa un semplice put_object.
+
+    Usato come context manager completa l'upload all'uscita, oppure lo annulla con
+    abort_multipart_upload in caso di eccezione (nessuna parte orfana nel bucket).
+
+    Args:
+        client: Client boto3 S3
+        bucket: Bucket di destinazione
+        key: Key dell'oggetto
+        part_size: Dimensione delle parti (min 5 MB)
+        max_concurrency: Parti caricate in parallelo
+        expected_size: Dimensione attesa, se nota: aumenta part_size per restare entro 10000 parti
+        **extra_args: Parametri aggiuntivi per create_multipart_upload/put_object (ContentType, Metadata, ...)
+
+    Dopo la chiusura l'attributo etag contiene l'ETag dell'oggetto creato.
+    """
+
+    def __init__(self, client, bucket: str, key: str, part_size: int = 8 * 1024 * 1024,
+                 max_concurrency: int = 4, expected_size: int = None, **extra_args):
+        super().__init__()
+        if expected_size:
+            part_size = max(part_size, -(-expected_size // (S3_MAX_PARTS - 1)))
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._part_size = max(part_size, S3_MIN_PART_SIZE)
+        self._max_concurrency = max_concurrency
+        self._extra_args = extra_args
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._executor = None
+        self._pending = []
+        self._parts = []
+        self.bytes_written = 0
+        self.etag = None
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        # Lo stream non è seekable: la posizione coincide con i byte scritti (usata da pyarrow)
+        return self.bytes_written
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("Scrittura su S3MultipartWriter già chiuso")
+        self._buffer.extend(data)
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self._part_size:
+            part = bytes(self._buffer[:self._part_size])
+            del self._buffer[:self._part_size]
+            self._submit_part(part)
+        return len(data)
+
+    def _submit_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            response = self._client.create_multipart_upload(
+                Bucket=self._bucket, Key=self._key, **self._extra_args
+            )
+            self._upload_id = response['UploadId']
+            self._executor = ThreadPoolExecutor(max_workers=self._max_concurrency)
+        if len(self._parts) + len(self._pending) >= S3_MAX_PARTS:
+            raise ValueError(f"Superato il limite di {S3_MAX_PARTS} parti per '{self._key}'")
+        # Limita le parti in volo: attende la più vecchia prima di accodarne un'altra
+        while len(self._pending) >= self._max_concurrency:
+            self._parts.append(self._pending.pop(0).result())
+        part_number = len(self._parts) + len(self._pending) + 1
+        self._pending.append(self._executor.submit(self._upload_part, part_number, data))
+
+    def _upload_part(self, part_number: int, data: bytes) -> dict:
+        response = self._client.upload_part(
+            Bucket=self._bucket, Key=self._key, UploadId=self._upload_id,
+            PartNumber=part_number, Body=data
+        )
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    def close(self) -> None:
+        """Carica l'ultima parte e completa l'upload (put_object se l'oggetto è piccolo)."""
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                response = self._client.put_object(
+                    Bucket=self._bucket, Key=self._key, Body=bytes(self._buffer), **self._extra_args
+                )
+            else:
+                if self._buffer:
+                    self._submit_part(bytes(self._buffer))
+                for future in self._pending:
+                    self._parts.append(future.result())
+                self._pending = []
+                response = self._client.complete_multipart_upload(
+                    Bucket=self._bucket, Key=self._key, UploadId=self._upload_id,
+                    MultipartUpload={'Parts': sorted(self._parts, key=lambda p: p['PartNumber'])}
+                )
+            # ETag dell'oggetto completato (es. per verificarlo in una cache)
+            self.etag = response.get('ETag')
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._buffer = bytearray()
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            super().close()
+
+    def abort(self) -> None:
+        """Annulla l'upload e rimuove le parti già caricate."""
+        if self._executor is not None:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+        self._pending = []
+        if self._upload_id is not None:
+            try:
+                self._client.abort_multipart_upload(
+                    Bucket=self._bucket, Key=self._key, UploadId=self._upload_id
+                )
+            except Exception as e:
+                print(f"Errore abort multipart upload per {self._key}: {e}")
+            self._upload_id = None
+        self._buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+        return False
+
+    def __del__(self):
+        # Un writer mai chiuso esplicitamente viene annullato, non completato con dati parziali
+        if not self.closed:
+            self.abort()
+
+
 def safe_zip_extract_path(base_dir: str, file_name: str) -> str:
     """
     Costruisce un path sicuro per l'estrazione di file ZIP (protezione da Zip Slip).
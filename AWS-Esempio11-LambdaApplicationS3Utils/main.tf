@@ -29,6 +29,20 @@ locals {
   )
   
   dynamodb_scan_table_name = "${var.project_name}-${var.dynamodb_scan_suffix}"
+  dynamodb_jobs_table_name = "${var.project_name}-${var.dynamodb_jobs_suffix}"
+
+  dynamodb_conversions_table_name = "${var.project_name}-${var.dynamodb_conversions_suffix}"
+  dynamodb_imports_table_name     = "${var.project_name}-${var.dynamodb_imports_suffix}"
+  dynamodb_results_table_name     = "${var.project_name}-${var.dynamodb_results_suffix}"
+
+  # Operazioni eseguibili come job asincroni ("async": true) → Lambda che le esegue
+  async_job_functions = {
+    extract_zip     = aws_lambda_function.extract_zip
+    excel_to_csv    = aws_lambda_function.excel_to_csv
+    upload_to_rds   = aws_lambda_function.upload_to_rds
+    export_from_rds = aws_lambda_function.export_from_rds
+    sftp_send       = aws_lambda_function.sftp_send
+  }
 }
 
 # ====================================
@@ -65,6 +79,12 @@ resource "aws_cloudwatch_log_group" "lambda_read_from_rds" {
   tags              = local.common_tags
 }
 
+resource "aws_cloudwatch_log_group" "lambda_export_from_rds" {
+  name              = "/aws/lambda/${var.project_name}-export-from-rds"
+  retention_in_days = var.log_retention_days
+  tags              = local.common_tags
+}
+
 resource "aws_cloudwatch_log_group" "lambda_sftp_send" {
   name              = "/aws/lambda/${var.project_name}-sftp-send"
   retention_in_days = var.log_retention_days
@@ -89,6 +109,12 @@ resource "aws_cloudwatch_log_group" "lambda_search_files" {
   tags              = local.common_tags
 }
 
+resource "aws_cloudwatch_log_group" "lambda_get_job" {
+  name              = "/aws/lambda/${var.project_name}-get-job"
+  retention_in_days = var.log_retention_days
+  tags              = local.common_tags
+}
+
 resource "aws_cloudwatch_log_group" "api_gateway" {
   name              = "/aws/apigateway/${var.api_name}"
   retention_in_days = var.log_retention_days
@@ -18,11 +18,31 @@ output "dynamodb_scan_table_name" {
   value       = aws_dynamodb_table.scan.name
 }
 
+output "dynamodb_jobs_table_name" {
+  description = "Nome tabella DynamoDB per lo stato dei job (es. extract_zip distribuito)"
+  value       = aws_dynamodb_table.jobs.name
+}
+
+output "dynamodb_conversions_table_name" {
+  description = "Nome tabella DynamoDB per la cache delle conversioni Excel"
+  value       = aws_dynamodb_table.conversions.name
+}
+
+output "dynamodb_imports_table_name" {
+  description = "Nome tabella DynamoDB per i checkpoint degli import paralleli su RDS"
+  value       = aws_dynamodb_table.imports.name
+}
+
 output "rds_cluster_endpoint" {
   description = "Endpoint del cluster RDS"
   value       = var.create_rds ? aws_rds_cluster.main[0].endpoint : "RDS not created"
 }
 
+output "rds_reader_endpoints" {
+  description = "Endpoint delle repliche Aurora in lettura usate da read_from_rds ed export_from_rds"
+  value       = aws_rds_cluster_instance.reader[*].endpoint
+}
+
 output "rds_database_name" {
   description = "Nome del database RDS"
   value       = var.create_rds ? aws_rds_cluster.main[0].database_name : "RDS not created"
@@ -42,32 +62,46 @@ output "api_gateway_url" {
 output "api_endpoints" {
   description = "Endpoint API disponibili"
   value = {
-    presigned_url = "${aws_api_gateway_stage.main.invoke_url}/presigned-url"
-    extract_zip   = "${aws_api_gateway_stage.main.invoke_url}/extract-zip"
-    excel_to_csv  = "${aws_api_gateway_stage.main.invoke_url}/excel-to-csv"
-    upload_to_rds  = "${aws_api_gateway_stage.main.invoke_url}/upload-to-rds"
-    read_from_rds = "${aws_api_gateway_stage.main.invoke_url}/read-from-rds"
-    sftp_send     = "${aws_api_gateway_stage.main.invoke_url}/sftp-send"
-    list_files    = "${aws_api_gateway_stage.main.invoke_url}/files"
-    search_files  = "${aws_api_gateway_stage.main.invoke_url}/files/search"
+    presigned_url   = "${aws_api_gateway_stage.main.invoke_url}/presigned-url"
+    extract_zip     = "${aws_api_gateway_stage.main.invoke_url}/extract-zip"
+    excel_to_csv    = "${aws_api_gateway_stage.main.invoke_url}/excel-to-csv"
+    upload_to_rds   = "${aws_api_gateway_stage.main.invoke_url}/upload-to-rds"
+    read_from_rds   = "${aws_api_gateway_stage.main.invoke_url}/read-from-rds"
+    export_from_rds = "${aws_api_gateway_stage.main.invoke_url}/export-from-rds"
+    sftp_send       = "${aws_api_gateway_stage.main.invoke_url}/sftp-send"
+    list_files      = "${aws_api_gateway_stage.main.invoke_url}/files"
+    search_files    = "${aws_api_gateway_stage.main.invoke_url}/files/search"
+    get_job         = "${aws_api_gateway_stage.main.invoke_url}/jobs/{job_id}"
   }
 }
 
 output "lambda_functions" {
   description = "Nome delle Lambda functions create"
   value = {
-    presigned_url = aws_lambda_function.presigned_url.function_name
-    extract_zip   = aws_lambda_function.extract_zip.function_name
-    excel_to_csv  = aws_lambda_function.excel_to_csv.function_name
-    upload_to_rds  = aws_lambda_function.upload_to_rds.function_name
-    read_from_rds = aws_lambda_function.read_from_rds.function_name
-    sftp_send     = aws_lambda_function.sftp_send.function_name
-    s3_scan       = aws_lambda_function.s3_scan.function_name
-    list_files    = aws_lambda_function.list_files.function_name
-    search_files  = aws_lambda_function.search_files.function_name
+    presigned_url   = aws_lambda_function.presigned_url.function_name
+    extract_zip     = aws_lambda_function.extract_zip.function_name
+    excel_to_csv    = aws_lambda_function.excel_to_csv.function_name
+    upload_to_rds   = aws_lambda_function.upload_to_rds.function_name
+    read_from_rds   = aws_lambda_function.read_from_rds.function_name
+    export_from_rds = aws_lambda_function.export_from_rds.function_name
+    sftp_send       = aws_lambda_function.sftp_send.function_name
+    s3_scan         = aws_lambda_function.s3_scan.function_name
+    list_files      = aws_lambda_function.list_files.function_name
+    search_files    = aws_lambda_function.search_files.function_name
+    get_job         = aws_lambda_function.get_job.function_name
   }
 }
 
+output "async_job_queues" {
+  description = "URL delle code SQS dei job asincroni per operazione"
+  value       = { for operation, queue in aws_sqs_queue.jobs : operation => queue.url }
+}
+
+output "async_job_dlq_url" {
+  description = "URL della dead-letter queue dei job asincroni"
+  value       = aws_sqs_queue.jobs_dlq.url
+}
+
 output "sftp_private_key_parameter" {
   description = "Nome del parametro SSM per la chiave privata SFTP"
   value       = var.sftp_private_key_ssm_parameter
@@ -147,6 +147,29 @@ resource "aws_db_subnet_group" "main" {
   tags       = local.common_tags
 }
 
+# Parametri per il bulk load di upload_to_rds ("bulk": true):
+# LOAD DATA LOCAL INFILE e pacchetti grandi per gli INSERT multi-riga
+resource "aws_rds_cluster_parameter_group" "main" {
+  count       = var.create_rds && var.rds_engine == "aurora-mysql" ? 1 : 0
+  name        = "${var.project_name}-aurora-mysql"
+  family      = "aurora-mysql8.0"
+  description = "Parametri cluster ${var.project_name} (bulk load)"
+
+  parameter {
+    name         = "local_infile"
+    value        = var.rds_local_infile ? "1" : "0"
+    apply_method = "immediate"
+  }
+
+  parameter {
+    name         = "max_allowed_packet"
+    value        = tostring(var.rds_max_allowed_packet_mb * 1024 * 1024)
+    apply_method = "immediate"
+  }
+
+  tags = local.common_tags
+}
+
 resource "aws_rds_cluster" "main" {
   count              = var.create_rds ? 1 : 0
   cluster_identifier = "${var.project_name}-aurora"
@@ -159,6 +182,8 @@ resource "aws_rds_cluster" "main" {
   db_subnet_group_name   = aws_db_subnet_group.main[0].name
   vpc_security_group_ids = [aws_security_group.rds[0].id]
 
+  db_cluster_parameter_group_name = var.rds_engine == "aurora-mysql" ? aws_rds_cluster_parameter_group.main[0].name : null
+
   backup_retention_period      = 7
   preferred_backup_window      = "03:00-04:00"
   preferred_maintenance_window = "mon:04:00-mon:05:00"
@@ -179,3 +204,17 @@ resource "aws_rds_cluster_instance" "main" {
 
   tags = local.common_tags
 }
+
+# Repliche in lettura: read_from_rds ed export_from_rds le usano a rotazione tramite
+# gli endpoint di istanza, lasciando il writer agli import di upload_to_rds
+resource "aws_rds_cluster_instance" "reader" {
+  count              = var.create_rds ? var.rds_reader_count : 0
+  identifier         = "${var.project_name}-aurora-reader-${count.index + 1}"
+  cluster_identifier = aws_rds_cluster.main[0].id
+  instance_class     = var.rds_instance_class
+  engine             = aws_rds_cluster.main[0].engine
+  engine_version     = aws_rds_cluster.main[0].engine_version
+
+  tags       = local.common_tags
+  depends_on = [aws_rds_cluster_instance.main]
+}
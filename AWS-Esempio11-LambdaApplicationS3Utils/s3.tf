@@ -49,6 +49,23 @@ resource "aws_s3_bucket_versioning" "main" {
   }
 }
 
+# Pulizia dei multipart upload rimasti incompleti (es. Lambda andata in timeout
+# durante l'estrazione di un file grande): le parti orfane vengono rimosse dopo 1 giorno
+resource "aws_s3_bucket_lifecycle_configuration" "main" {
+  bucket = aws_s3_bucket.main.id
+
+  rule {
+    id     = "abort-incomplete-multipart-upload"
+    status = "Enabled"
+
+    filter {}
+
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 1
+    }
+  }
+}
+
 # EventBridge notification
 resource "aws_s3_bucket_notification" "main" {
   bucket      = aws_s3_bucket.main.id
@@ -0,0 +1,128 @@
+# ====================================
+# JOB ASINCRONI
+# Richieste con "async": true → item QUEUED nella tabella jobs → stream DynamoDB →
+# EventBridge Pipe (filtro per operazione) → coda SQS → Lambda (event source mapping).
+# L'accodamento passa da DynamoDB, quindi anche upload_to_rds in VPC usa solo il
+# Gateway Endpoint DynamoDB, senza Interface Endpoint SQS.
+# ====================================
+
+# Dead-letter queue comune: job falliti dopo async_job_max_receive_count tentativi
+resource "aws_sqs_queue" "jobs_dlq" {
+  name                      = "${var.project_name}-jobs-dlq"
+  message_retention_seconds = 1209600
+  sqs_managed_sse_enabled   = true
+
+  tags = local.common_tags
+}
+
+# Una coda per operazione: la visibilità copre l'esecuzione della Lambda con margine
+resource "aws_sqs_queue" "jobs" {
+  for_each = local.async_job_functions
+
+  name                       = "${var.project_name}-jobs-${replace(each.key, "_", "-")}"
+  visibility_timeout_seconds = min(each.value.timeout * 6, 43200)
+  message_retention_seconds  = 345600
+  sqs_managed_sse_enabled    = true
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.jobs_dlq.arn
+    maxReceiveCount     = var.async_job_max_receive_count
+  })
+
+  tags = local.common_tags
+}
+
+resource "aws_lambda_event_source_mapping" "jobs" {
+  for_each = local.async_job_functions
+
+  event_source_arn        = aws_sqs_queue.jobs[each.key].arn
+  function_name           = each.value.arn
+  batch_size              = 1
+  function_response_types = ["ReportBatchItemFailures"]
+
+  depends_on = [aws_iam_role_policy.lambda_sqs_jobs]
+}
+
+# Ruolo delle EventBridge Pipes: lettura dello stream jobs, invio alle code
+resource "aws_iam_role" "jobs_pipe" {
+  name = "${var.project_name}-jobs-pipe-role"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Action = "sts:AssumeRole"
+      Effect = "Allow"
+      Principal = {
+        Service = "pipes.amazonaws.com"
+      }
+    }]
+  })
+
+  tags = local.common_tags
+}
+
+resource "aws_iam_role_policy" "jobs_pipe" {
+  name = "jobs-pipe-access"
+  role = aws_iam_role.jobs_pipe.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ]
+        Resource = aws_dynamodb_table.jobs.stream_arn
+      },
+      {
+        Effect   = "Allow"
+        Action   = ["sqs:SendMessage"]
+        Resource = [for queue in aws_sqs_queue.jobs : queue.arn]
+      }
+    ]
+  })
+}
+
+# Solo gli INSERT con status QUEUED: gli aggiornamenti di stato (RUNNING, shard del
+# fan-out, COMPLETED) non generano messaggi
+resource "aws_pipes_pipe" "jobs" {
+  for_each = local.async_job_functions
+
+  name     = "${var.project_name}-jobs-${replace(each.key, "_", "-")}"
+  role_arn = aws_iam_role.jobs_pipe.arn
+  source   = aws_dynamodb_table.jobs.stream_arn
+  target   = aws_sqs_queue.jobs[each.key].arn
+
+  source_parameters {
+    dynamodb_stream_parameters {
+      starting_position = "LATEST"
+      batch_size        = 1
+    }
+
+    filter_criteria {
+      filter {
+        pattern = jsonencode({
+          eventName = ["INSERT"]
+          dynamodb = {
+            NewImage = {
+              operation = { S = [each.key] }
+              status    = { S = ["QUEUED"] }
+            }
+          }
+        })
+      }
+    }
+  }
+
+  target_parameters {
+    input_template = "{\"job_id\": \"<$.dynamodb.NewImage.job_id.S>\"}"
+  }
+
+  tags = local.common_tags
+
+  depends_on = [aws_iam_role_policy.jobs_pipe]
+}
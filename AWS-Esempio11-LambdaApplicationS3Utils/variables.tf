@@ -48,6 +48,102 @@ variable "dynamodb_scan_suffix" {
   default     = "scan"
 }
 
+variable "dynamodb_jobs_suffix" {
+  description = "Suffisso per tabella jobs (formato: <project_name>-<suffix>)"
+  type        = string
+  default     = "jobs"
+}
+
+variable "dynamodb_conversions_suffix" {
+  description = "Suffisso per tabella cache conversioni di excel_to_csv (formato: <project_name>-<suffix>)"
+  type        = string
+  default     = "conversions"
+}
+
+variable "dynamodb_imports_suffix" {
+  description = "Suffisso per tabella checkpoint degli import paralleli di upload_to_rds (formato: <project_name>-<suffix>)"
+  type        = string
+  default     = "imports"
+}
+
+variable "dynamodb_results_suffix" {
+  description = "Suffisso per tabella della cache condivisa dei risultati di read_from_rds (formato: <project_name>-<suffix>)"
+  type        = string
+  default     = "results"
+}
+
+variable "excel_to_csv_cache_ttl_days" {
+  description = "Giorni di validità delle voci nella cache conversioni di excel_to_csv"
+  type        = number
+  default     = 30
+}
+
+variable "upload_to_rds_bulk_chunk_mb" {
+  description = "Dimensione in MB dei file in /tmp caricati con LOAD DATA LOCAL INFILE da upload_to_rds"
+  type        = number
+  default     = 64
+}
+
+variable "upload_to_rds_import_workers" {
+  description = "Connessioni in parallelo di default per upload_to_rds con \"parallel\": true"
+  type        = number
+  default     = 4
+}
+
+variable "upload_to_rds_import_chunk_mb" {
+  description = "Dimensione in MB dei chunk (range di byte) degli import paralleli di upload_to_rds"
+  type        = number
+  default     = 64
+}
+
+variable "upload_to_rds_infer_schema" {
+  description = "Deduce i tipi delle colonne delle tabelle create da upload_to_rds quando la richiesta non specifica infer_schema (false: tutte VARCHAR(255))"
+  type        = bool
+  default     = false
+}
+
+variable "upload_to_rds_schema_sample_rows" {
+  description = "Righe del CSV campionate da upload_to_rds per dedurre i tipi delle colonne"
+  type        = number
+  default     = 10000
+}
+
+variable "read_from_rds_metadata_ttl_seconds" {
+  description = "Secondi di cache dei metadati tabella (esistenza, chiave primaria, righe stimate) in read_from_rds"
+  type        = number
+  default     = 300
+}
+
+variable "read_from_rds_result_cache_entries" {
+  description = "Pagine di risultati tenute nella cache LRU in memoria di ogni istanza di read_from_rds (0 disattiva la cache)"
+  type        = number
+  default     = 64
+}
+
+variable "read_from_rds_shared_cache" {
+  description = "Crea la tabella DynamoDB della cache dei risultati di read_from_rds condivisa tra le istanze Lambda"
+  type        = bool
+  default     = false
+}
+
+variable "export_from_rds_fetch_rows" {
+  description = "Righe lette per ogni fetch dal cursore lato server di export_from_rds"
+  type        = number
+  default     = 10000
+}
+
+variable "export_from_rds_part_mb" {
+  description = "Dimensione in MB delle parti del multipart upload su S3 di export_from_rds"
+  type        = number
+  default     = 16
+}
+
+variable "async_job_max_receive_count" {
+  description = "Tentativi di esecuzione di un job asincrono prima dello spostamento nella DLQ"
+  type        = number
+  default     = 3
+}
+
 variable "dynamodb_billing_mode" {
   description = "Billing mode per DynamoDB (PROVISIONED o PAY_PER_REQUEST)"
   type        = string
@@ -67,6 +163,18 @@ variable "rds_engine" {
   default     = "aurora-mysql"
 }
 
+variable "rds_local_infile" {
+  description = "Abilita LOAD DATA LOCAL INFILE sul cluster (bulk load di upload_to_rds)"
+  type        = bool
+  default     = true
+}
+
+variable "rds_max_allowed_packet_mb" {
+  description = "max_allowed_packet del cluster in MB (dimensione massima degli INSERT multi-riga)"
+  type        = number
+  default     = 64
+}
+
 variable "rds_engine_version" {
   description = "Versione engine RDS"
   type        = string
@@ -79,6 +187,18 @@ variable "rds_instance_class" {
   default     = "db.t3.medium"
 }
 
+variable "rds_reader_count" {
+  description = "Numero di repliche Aurora in lettura per read_from_rds ed export_from_rds (0 = tutte le letture sul writer)"
+  type        = number
+  default     = 0
+}
+
+variable "rds_read_your_writes_seconds" {
+  description = "Secondi dopo un import in cui le letture della tabella importata vanno al writer invece che alle repliche (0 disattiva)"
+  type        = number
+  default     = 10
+}
+
 variable "rds_database_name" {
   description = "Nome database RDS"
   type        = string
@@ -110,6 +230,42 @@ variable "lambda_memory_size" {
   default     = 512
 }
 
+variable "extract_zip_upload_workers" {
+  description = "Numero di worker paralleli per l'upload dei file estratti da extract_zip"
+  type        = number
+  default     = 16
+}
+
+variable "extract_zip_max_inflight_mb" {
+  description = "MB massimi di dati estratti in attesa di upload (limita la memoria usata da extract_zip)"
+  type        = number
+  default     = 64
+}
+
+variable "extract_zip_fanout_min_entries" {
+  description = "Numero di file oltre il quale extract_zip passa alla modalità distribuita (fan-out su più invocazioni)"
+  type        = number
+  default     = 50000
+}
+
+variable "extract_zip_shard_max_entries" {
+  description = "Numero massimo di file per shard nella modalità distribuita di extract_zip"
+  type        = number
+  default     = 10000
+}
+
+variable "excel_to_csv_ephemeral_storage_mb" {
+  description = "Storage effimero (/tmp) in MB per excel_to_csv: il file Excel viene scaricato su disco prima della conversione"
+  type        = number
+  default     = 2048
+}
+
+variable "lambda_layer_arns_extract" {
+  description = "Lista ARN dei Lambda Layer per extract_zip (zstandard, necessario solo per archivi .tar.zst). Lasciare vuoto se non disponibile."
+  type        = list(string)
+  default     = []
+}
+
 variable "lambda_layer_arns_excel" {
   description = "Lista ARN dei Lambda Layer per excel_to_csv (deve contenere openpyxl). Lasciare vuoto se non disponibile."
   type        = list(string)
@@ -154,6 +310,24 @@ variable "s3_scan_schedule_expression" {
   default     = "cron(0 2 * * ? *)"
 }
 
+variable "s3_scan_mode" {
+  description = "Modalità di s3_scan: full (riscrive tutto, scan_date = ultima scansione) o incremental (scrive solo file nuovi/modificati e cancella quelli rimossi; scan_date = ultima modifica)"
+  type        = string
+  default     = "full"
+}
+
+variable "s3_scan_list_workers" {
+  description = "Thread di s3_scan che listano in parallelo le partizioni (prefissi e range di key) del bucket (1 = listing sequenziale)"
+  type        = number
+  default     = 16
+}
+
+variable "s3_scan_prefix_depth" {
+  description = "Livelli di prefissi (separatore /) esplorati da s3_scan per partizionare il listing (0 = un'unica partizione)"
+  type        = number
+  default     = 2
+}
+
 # SFTP Configuration
 variable "sftp_private_key_ssm_parameter" {
   description = "Nome del parametro SSM per la chiave privata SFTP (formato RSA)"
@@ -47,22 +47,42 @@ logger.info(
 )
 
 if numero_righe > 0:
-    content = spark.read.options(header=True, delimiter=";").csv(
-        "s3://" + bucket + "/" + file_name
-    )
+    if file_name.endswith(".parquet"):
+        # Parquet tipizzato: i filtri sulle colonne originali vengono spinti nello scan
+        # (PushedFilters) e i row group esclusi dalle statistiche min/max non vengono letti
+        content = spark.read.parquet("s3://" + bucket + "/" + file_name)
+        normalized_columns = [c.lower().replace(" ", "_") for c in content.columns]
+        content = content.toDF(*normalized_columns)
 
-    normalized_columns = [c.lower().replace(" ", "_") for c in content.columns]
-    content = content.toDF(*normalized_columns)
+        content_filtered = content.filter(
+            col("nome").isNotNull()
+            & (col("nome") != "")
+            & col("cognome").isNotNull()
+            & (col("eta") > 18)
+            & (col("eta") < 42)
+        )
+    else:
+        content = spark.read.options(header=True, delimiter=";").csv(
+            "s3://" + bucket + "/" + file_name
+        )
 
-    content_filtered = (
-        content.filter((length(col("nome")) > 0) & (col("cognome").isNotNull()))
-        .filter("eta < 42")
-        .filter(col("eta").cast("int") > 18)
-    )
+        normalized_columns = [c.lower().replace(" ", "_") for c in content.columns]
+        content = content.toDF(*normalized_columns)
+
+        content_filtered = (
+            content.filter((length(col("nome")) > 0) & (col("cognome").isNotNull()))
+            .filter("eta < 42")
+            .filter(col("eta").cast("int") > 18)
+        )
+
+    # L'esito resta un CSV con separatore ';' anche quando l'input è Parquet
+    output_file = file_name.replace(source_path, dest_path)
+    if output_file.endswith(".parquet"):
+        output_file = output_file[: -len(".parquet")] + ".csv"
 
-    logger.info("Scrivo il file " + bucket + "/" + file_name.replace(source_path, dest_path))
+    logger.info("Scrivo il file " + bucket + "/" + output_file)
     content_filtered.select("*").toPandas().to_csv(
-        "s3://" + bucket + "/" + file_name.replace(source_path, dest_path),
+        "s3://" + bucket + "/" + output_file,
         index=False,
         header=True,
         sep=";",
@@ -1,4 +1,5 @@
 import csv
+import datetime
 import fnmatch
 import os
 
@@ -10,6 +11,10 @@ source_path = os.environ["SourcePath"]
 source_pattern = os.environ["SourceFilePattern"]
 dest_bucket = os.environ["DestBucket"]
 dest_path = os.environ["DestPath"]
+# "csv" (default) oppure "parquet" (richiede pyarrow nel layer)
+output_format = os.environ.get("OutputFormat", "csv").lower()
+parquet_row_group_rows = int(os.environ.get("ParquetRowGroupRows", "100000"))
+parquet_compression = os.environ.get("ParquetCompression", "snappy")
 
 C_LOCAL_PATH = "/tmp/"
 s3 = boto3.resource("s3")
@@ -40,7 +45,10 @@ def lambda_handler(event, context):
 
     if fnmatch.fnmatch(file_name, source_pattern):
         print("File matched")
-        converted_file_name, numero_righe = convert_excel_to_csv(s3_key, file_name)
+        if output_format == "parquet":
+            converted_file_name, numero_righe = convert_excel_to_parquet(s3_key, file_name)
+        else:
+            converted_file_name, numero_righe = convert_excel_to_csv(s3_key, file_name)
         return {
             "statusCode": 200,
             "file_name": converted_file_name,
@@ -78,7 +86,133 @@ def convert_excel_to_csv(s3_key, file_name):
             row_data = [cell.value for cell in row]
             writer.writerow(row_data)
             numero_righe += 1
+    # La prima riga è l'intestazione: come per il Parquet si contano solo le righe dati
+    numero_righe = max(numero_righe - 1, 0)
 
     destination_key = dest_path + "/" + csv_filename
     s3_client.upload_file(csv_local_path, dest_bucket, destination_key)
     return destination_key, numero_righe
+
+
+# infer_columns, parquet_column_type e parquet_value sono replicate in
+# AWS-Esempio11-LambdaApplicationS3Utils/lambda_functions/excel_to_csv.py: ogni esempio si installa da solo
+def infer_columns(ws):
+    # Prima lettura del foglio: nomi dalla riga di intestazione e tipi dei valori per colonna
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return [], []
+    kinds = [set() for _ in header]
+    for row in rows:
+        if len(row) > len(kinds):
+            kinds.extend(set() for _ in range(len(row) - len(kinds)))
+        for index, value in enumerate(row):
+            if value is None or value == "":
+                continue
+            if isinstance(value, bool):
+                kinds[index].add("bool")
+            elif isinstance(value, int):
+                kinds[index].add("int")
+            elif isinstance(value, float):
+                kinds[index].add("float")
+            elif isinstance(value, datetime.datetime):
+                kinds[index].add("date" if value.time() == datetime.time(0) else "datetime")
+            else:
+                kinds[index].add("str")
+
+    names = []
+    for index in range(len(kinds)):
+        name = header[index] if index < len(header) else None
+        name = str(name).strip() if name is not None else ""
+        name = name or "col_" + str(index + 1)
+        while name in names:
+            name = name + "_" + str(index + 1)
+        names.append(name)
+    return names, kinds
+
+
+def parquet_column_type(pa, kinds):
+    # Colonne con tipi misti diventano stringa
+    if not kinds or "str" in kinds:
+        return pa.string()
+    if kinds == {"bool"}:
+        return pa.bool_()
+    if kinds == {"int"}:
+        return pa.int64()
+    if kinds <= {"int", "float"}:
+        return pa.float64()
+    if kinds == {"date"}:
+        return pa.date32()
+    if kinds <= {"date", "datetime"}:
+        return pa.timestamp("ms")
+    return pa.string()
+
+
+def parquet_value(value, column_type):
+    if value is None or value == "":
+        return None
+    if column_type == "string":
+        return value if isinstance(value, str) else str(value)
+    if column_type == "double":
+        return float(value)
+    if column_type == "date32[day]":
+        return value.date()
+    return value
+
+
+def convert_excel_to_parquet(s3_key, file_name):
+    # Parquet tipizzato e compresso, scritto a row group: Spark legge solo le colonne
+    # selezionate e salta i row group esclusi dai filtri grazie alle statistiche min/max
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    print("convert_excel_to_parquet: " + s3_key)
+    numero_righe = 0
+
+    file_local_path = C_LOCAL_PATH + file_name
+    source_bucket_obj = s3.Bucket(source_bucket)
+    source_bucket_obj.download_file(s3_key, file_local_path)
+
+    wb = openpyxl.load_workbook(file_local_path, read_only=True, data_only=True)
+    ws = wb.worksheets[0]
+
+    names, kinds = infer_columns(ws)
+    schema = pa.schema(
+        [pa.field(name, parquet_column_type(pa, k)) for name, k in zip(names, kinds)]
+    )
+    type_names = [str(field.type) for field in schema]
+
+    parquet_filename = os.path.splitext(file_name)[0] + ".parquet"
+    if "DestFileName" in os.environ and os.environ["DestFileName"] != "":
+        parquet_filename = os.path.splitext(os.environ["DestFileName"])[0] + ".parquet"
+
+    parquet_local_path = C_LOCAL_PATH + parquet_filename
+    columns = [[] for _ in names]
+    with pq.ParquetWriter(parquet_local_path, schema, compression=parquet_compression) as writer:
+
+        def write_row_group():
+            if columns and columns[0]:
+                writer.write_table(
+                    pa.Table.from_arrays(
+                        [pa.array(v, type=f.type) for v, f in zip(columns, schema)],
+                        schema=schema,
+                    )
+                )
+                for values in columns:
+                    values.clear()
+
+        rows = ws.iter_rows(values_only=True)
+        next(rows, None)
+        for row in rows:
+            for index, values in enumerate(columns):
+                value = row[index] if index < len(row) else None
+                values.append(parquet_value(value, type_names[index]))
+            numero_righe += 1
+            if numero_righe % parquet_row_group_rows == 0:
+                write_row_group()
+        write_row_group()
+    wb.close()
+
+    destination_key = dest_path + "/" + parquet_filename
+    s3_client.upload_file(parquet_local_path, dest_bucket, destination_key)
+    return destination_key, numero_righe
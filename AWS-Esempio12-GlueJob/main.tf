@@ -215,6 +215,7 @@ resource "aws_lambda_function" "excel2csv" {
       DestBucket        = aws_s3_bucket.main.id
       DestPath          = var.dest_csv_path
       DestFileName      = var.csv_file_pattern
+      OutputFormat      = var.output_format
     }
   }
 
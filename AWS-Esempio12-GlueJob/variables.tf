@@ -46,6 +46,17 @@ variable "csv_file_pattern" {
   default     = "lista.csv"
 }
 
+variable "output_format" {
+  description = "Formato prodotto dalla Lambda excel2csv: csv oppure parquet (richiede pyarrow nel layer)"
+  type        = string
+  default     = "csv"
+
+  validation {
+    condition     = contains(["csv", "parquet"], var.output_format)
+    error_message = "output_format deve essere csv oppure parquet."
+  }
+}
+
 variable "source_path" {
   description = "Path S3 input excel"
   type        = string
@@ -101,7 +112,7 @@ variable "log_retention_days" {
 }
 
 variable "lambda_layer_arns_excel2csv" {
-  description = "ARN dei layer Lambda necessari a excel2csv (openpyxl)"
+  description = "ARN dei layer Lambda necessari a excel2csv (openpyxl; pyarrow se output_format = parquet)"
   type        = list(string)
   default     = []
 }